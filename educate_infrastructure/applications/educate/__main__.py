@@ -1,25 +1,65 @@
 """ Open edX native deployment on AWS"""
 
+import json
+
 from pulumi import (
+    ROOT_STACK_RESOURCE,
+    Alias,
     Config,
     get_stack,
     get_project,
     export,
-    StackReference,
     ResourceOptions,
+    create_urn,
 )
 from pulumi_aws import ec2, iam, lb, route53
 
-from educate_infrastructure.applications.educate.ec2 import DTEc2, DTEducateConfig
+from educate_infrastructure.applications.educate.autoscaling import (
+    DTEducateASG,
+    DTEducateASGConfig,
+)
+from educate_infrastructure.applications.educate.cdn import (
+    DTEducateCDN,
+    DTEducateCDNConfig,
+)
+from educate_infrastructure.applications.educate.ec2 import (
+    EDUCATE_AMI_ID,
+    DTEc2,
+    DTEducateConfig,
+)
+from educate_infrastructure.applications.educate.load_balancer import (
+    DTLoadBalancer,
+    DTLoadBalancerConfig,
+    DTTargetGroupConfig,
+)
+from educate_infrastructure.applications.educate.workers import (
+    DTCeleryWorkerConfig,
+    DTCeleryWorkerFleet,
+)
+from educate_infrastructure.lib.component import export_component_report
+from educate_infrastructure.lib.lookups import lookup_hosted_zone
+from educate_infrastructure.lib.monitoring import (
+    attach_monitoring,
+    stack_monitoring_config,
+)
+from educate_infrastructure.lib.stack_references import (
+    databases_outputs,
+    networking_outputs,
+)
 
 env = get_stack()
 proj = get_project()
 
-networking_stack = StackReference("BbrSofiane/networking/prod")
+educate_config = Config("educate")
+autoscaling_enabled = educate_config.get_bool("autoscaling") or False
+workers_config = Config("workers")
+workers_enabled = workers_config.get_bool("enabled") or False
+
+networking = networking_outputs()
 
-apps_vpc_id = networking_stack.get_output("apps_vpc_id")
-apps_public_subnet_ids = networking_stack.get_output("apps_public_subnet_ids")
-apps_private_subnet_ids = networking_stack.get_output("apps_private_subnet_ids")
+apps_vpc_id = networking.apps_vpc_id
+apps_public_subnet_ids = networking.apps_public_subnet_ids
+apps_private_subnet_ids = networking.apps_private_subnet_ids
 
 tags = {
     "pulumi_managed": "true",
@@ -100,84 +140,248 @@ security_group = ec2.SecurityGroup(
     tags={**tags, "Name": "Educate Security Group"},
 )
 
-instance_config = DTEducateConfig(
-    name=f"{proj}-{env}",
-    app_vpc_id=apps_vpc_id,
-    app_subnet_id=apps_private_subnet_ids[0],
-    iam_instance_profile_id=educate_app_profile.id,
-    security_group_id=security_group.id,
-    instance_type=ec2.InstanceType.T3A_LARGE,
-)
-
-educate_app_instance = DTEc2(instance_config)
-
-# TODO Add access_logs
-educate_app_alb = lb.LoadBalancer(
-    f"{proj}-alb-{env}",
-    load_balancer_type="application",
-    security_groups=[security_group.id],
-    subnets=apps_public_subnet_ids,
-    enable_deletion_protection=True,
-    tags=tags,
-    opts=ResourceOptions(parent=educate_app_instance),
+if not autoscaling_enabled:
+    instance_config = DTEducateConfig(
+        name=f"{proj}-{env}",
+        app_vpc_id=apps_vpc_id,
+        app_subnet_id=apps_private_subnet_ids[0],
+        iam_instance_profile_id=educate_app_profile.id,
+        security_group_id=security_group.id,
+        instance_type=ec2.InstanceType.T3A_LARGE,
+        commands=educate_config.get("commands"),
+        attach_user_data=educate_config.get_bool("attach_user_data") or False,
+    )
+
+    educate_app_instance = DTEc2(instance_config)
+
+# TODO Move Route53 setup to its own project
+# https://www.pulumi.com/docs/reference/pkg/aws/route53/record/#alias-record
+zone = lookup_hosted_zone(name="diceytech.co.uk")
+records = []
+
+# LMS is the default route, Studio and preview get their own target groups so that
+# they can be health checked and scaled on their own
+lms_host = f"learn.{zone.name}"
+studio_host = educate_config.get("studio_host") or f"studio.{zone.name}"
+preview_host = educate_config.get("preview_host") or f"preview.{zone.name}"
+
+# The load balancer resources used to be declared directly in this program, under the
+# DTEc2 instance, keep their previous identities so that they are adopted rather than
+# replaced, whether the instance still exists or the autoscaling groups took over
+legacy_alb_parent = create_urn(
+    f"{proj}-{env}-instance", "diceytech:infrastructure:aws:EC2"
 )
+legacy_alb_urn = create_urn(
+    f"{proj}-alb-{env}", "aws:lb/loadBalancer:LoadBalancer", parent=legacy_alb_parent
+)
+legacy_tg_urn = create_urn(f"{proj}-tg-{env}", "aws:lb/targetGroup:TargetGroup")
 
-educate_app_tg = lb.TargetGroup(
-    f"{proj}-tg-{env}",
-    port=80,
-    protocol="HTTP",
+lb_config = DTLoadBalancerConfig(
+    name=f"{proj}-{env}",
     vpc_id=apps_vpc_id,
+    subnet_ids=apps_public_subnet_ids,
+    security_group_ids=[security_group.id],
+    certificate_arn="arn:aws:acm:eu-west-2:198538058567:certificate/964f24fa-cc5b-45be-a741-1e468f4b259b",
+    target_groups=[
+        DTTargetGroupConfig(
+            name="lms",
+            hosts=[lms_host],
+            slow_start=educate_config.get_int("lms_slow_start") or 0,
+            stickiness_duration=educate_config.get_int("lms_stickiness_duration"),
+        ),
+        DTTargetGroupConfig(
+            name="studio",
+            hosts=[studio_host],
+            slow_start=educate_config.get_int("studio_slow_start") or 0,
+            stickiness_duration=educate_config.get_int("studio_stickiness_duration"),
+        ),
+        DTTargetGroupConfig(name="preview", hosts=[preview_host]),
+    ],
     tags=tags,
+    resource_aliases={
+        "alb": [Alias(name=f"{proj}-alb-{env}", parent=legacy_alb_parent)],
+        "http_listener": [
+            Alias(name=f"{proj}-http-listener-{env}", parent=legacy_alb_urn)
+        ],
+        "https_listener": [
+            Alias(name=f"{proj}-https-listener-{env}", parent=legacy_alb_urn)
+        ],
+        "lms": [Alias(name=f"{proj}-tg-{env}", parent=ROOT_STACK_RESOURCE)],
+    },
 )
 
-http_lb_listener = lb.Listener(
-    f"{proj}-http-listener-{env}",
-    load_balancer_arn=educate_app_alb.arn,
-    port=80,
-    default_actions=[
-        lb.ListenerDefaultActionArgs(
-            type="redirect",
-            redirect=lb.ListenerDefaultActionRedirectArgs(
-                port="443",
-                protocol="HTTPS",
-                status_code="HTTP_301",
-            ),
-        )
-    ],
-    opts=ResourceOptions(parent=educate_app_alb),
+educate_lb = DTLoadBalancer(lb_config)
+educate_lb_monitoring = attach_monitoring(
+    educate_lb, stack_monitoring_config(f"{proj}-alb-{env}", "alb")
 )
+educate_app_alb = educate_lb.load_balancer
+lms_tg = educate_lb.get_target_group("lms")
+studio_tg = educate_lb.get_target_group("studio")
+preview_tg = educate_lb.get_target_group("preview")
 
-https_lb_listener = lb.Listener(
-    f"{proj}-https-listener-{env}",
-    load_balancer_arn=educate_app_alb.arn,
-    port=443,
-    protocol="HTTPS",
-    ssl_policy="ELBSecurityPolicy-2016-08",
-    certificate_arn="arn:aws:acm:eu-west-2:198538058567:certificate/964f24fa-cc5b-45be-a741-1e468f4b259b",
-    default_actions=[{"type": "forward", "target_group_arn": educate_app_tg.arn}],
-    opts=ResourceOptions(parent=educate_app_alb),
-)
+if autoscaling_enabled:
+    # The LMS fleet also serves the preview site
+    asg_config = DTEducateASGConfig(
+        name=f"{proj}-{env}",
+        app_subnet_ids=apps_private_subnet_ids,
+        iam_instance_profile_id=educate_app_profile.id,
+        security_group_id=security_group.id,
+        load_balancer=educate_app_alb,
+        target_group=lms_tg,
+        additional_target_groups=[preview_tg],
+        instance_type=educate_config.get("instance_type") or ec2.InstanceType.T3A_LARGE,
+        ami_id=educate_config.get("ami_id") or EDUCATE_AMI_ID,
+        commands=educate_config.get("commands"),
+        min_size=educate_config.get_int("min_size") or 1,
+        max_size=educate_config.get_int("max_size") or 4,
+        desired_capacity=educate_config.get_int("desired_capacity"),
+        requests_per_target=educate_config.get_int("requests_per_target") or 1000,
+        cpu_utilization=educate_config.get_float("cpu_utilization") or 60,
+    )
 
-educate_target_group_attachment = lb.TargetGroupAttachment(
-    f"{proj}-tg-attachement-{env}",
-    target_group_arn=educate_app_tg.arn,
-    target_id=educate_app_instance.get_instance_id(),
-    port=80,
-    opts=ResourceOptions(
-        parent=educate_app_tg,
-    ),
-)
+    educate_app_asg = DTEducateASG(asg_config)
 
-# TODO Move Route53 setup to its own project
-# https://www.pulumi.com/docs/reference/pkg/aws/route53/record/#alias-record
-zone = route53.get_zone(name="diceytech.co.uk")
-records = []
+    studio_asg_config = DTEducateASGConfig(
+        name=f"{proj}-studio-{env}",
+        app_subnet_ids=apps_private_subnet_ids,
+        iam_instance_profile_id=educate_app_profile.id,
+        security_group_id=security_group.id,
+        load_balancer=educate_app_alb,
+        target_group=studio_tg,
+        instance_type=educate_config.get("studio_instance_type")
+        or ec2.InstanceType.T3A_LARGE,
+        ami_id=educate_config.get("ami_id") or EDUCATE_AMI_ID,
+        commands=educate_config.get("commands"),
+        min_size=educate_config.get_int("studio_min_size") or 1,
+        max_size=educate_config.get_int("studio_max_size") or 2,
+        requests_per_target=educate_config.get_int("studio_requests_per_target")
+        or 1000,
+        cpu_utilization=educate_config.get_float("cpu_utilization") or 60,
+    )
 
-lms_record_alias = route53.RecordAliasArgs(
-    name=educate_app_alb.dns_name,
-    zone_id=educate_app_alb.zone_id,
-    evaluate_target_health=True,
-)
+    studio_asg = DTEducateASG(studio_asg_config)
+else:
+    educate_target_group_attachment = lb.TargetGroupAttachment(
+        f"{proj}-tg-attachement-{env}",
+        target_group_arn=lms_tg.arn,
+        target_id=educate_app_instance.get_instance_id(),
+        port=80,
+        opts=ResourceOptions(
+            parent=lms_tg,
+            aliases=[Alias(parent=legacy_tg_urn)],
+        ),
+    )
+
+    for service, target_group in (("studio", studio_tg), ("preview", preview_tg)):
+        lb.TargetGroupAttachment(
+            f"{proj}-{service}-tg-attachment-{env}",
+            target_group_arn=target_group.arn,
+            target_id=educate_app_instance.get_instance_id(),
+            port=80,
+            opts=ResourceOptions(parent=target_group),
+        )
+
+# Celery workers on their own fleet, scaled on the depth of the queues they consume
+if workers_enabled:
+    workers_role_policy = iam.RolePolicy(
+        f"workers-{proj}-policy",
+        role=educate_app_role.id,
+        policy=iam.get_policy_document(
+            statements=[
+                iam.GetPolicyDocumentStatementArgs(
+                    actions=[
+                        "cloudwatch:PutMetricData",
+                        "autoscaling:DescribeAutoScalingInstances",
+                        "autoscaling:CompleteLifecycleAction",
+                    ],
+                    resources=["*"],
+                )
+            ],
+        ).json,
+        opts=ResourceOptions(
+            parent=educate_app_role,
+        ),
+    )
+
+    # The workers consume the cache of the databases stack, over TLS with its AUTH token
+    databases = databases_outputs()
+    broker_secret_policy = iam.RolePolicy(
+        f"workers-{proj}-broker-secret-policy",
+        role=educate_app_role.id,
+        policy=databases.cache_auth_token_secret_arn.apply(
+            lambda arn: json.dumps(
+                {
+                    "Version": "2012-10-17",
+                    "Statement": [
+                        {
+                            "Effect": "Allow",
+                            "Action": ["secretsmanager:GetSecretValue"],
+                            "Resource": [arn],
+                        }
+                    ],
+                }
+            )
+        ),
+        opts=ResourceOptions(
+            parent=educate_app_role,
+        ),
+    )
+
+    # The Spot mix and scale out steps default to the component ones
+    worker_overrides = {
+        key: workers_config.get_object(key)
+        for key in (
+            "instance_types",
+            "on_demand_base_capacity",
+            "on_demand_percentage_above_base_capacity",
+            "scale_out_steps",
+        )
+        if workers_config.get_object(key) is not None
+    }
+    worker_config = DTCeleryWorkerConfig(
+        name=f"{proj}-workers-{env}",
+        vpc_id=apps_vpc_id,
+        app_subnet_ids=apps_private_subnet_ids,
+        iam_instance_profile_id=educate_app_profile.id,
+        ami_id=educate_config.get("ami_id") or EDUCATE_AMI_ID,
+        user_data=workers_config.get("commands"),
+        broker_host=databases.cache_primary_endpoint,
+        broker_auth_secret_arn=databases.cache_auth_token_secret_arn,
+        alarm_actions=Config("monitoring").get_object("alarm_actions") or [],
+        min_size=workers_config.get_int("min_size") or 1,
+        max_size=workers_config.get_int("max_size") or 6,
+        tags=tags,
+        **worker_overrides,
+    )
+
+    educate_workers = DTCeleryWorkerFleet(worker_config)
+
+# Serve the learners through CloudFront once a us-east-1 certificate is configured
+cdn_certificate_arn = educate_config.get("cdn_certificate_arn")
+if cdn_certificate_arn:
+    cdn_config = DTEducateCDNConfig(
+        name=f"{proj}-cdn-{env}",
+        load_balancer=educate_app_alb,
+        aliases=educate_config.get_object("cdn_aliases")
+        or [f"learn.{zone.name}", f"*.{zone.name}"],
+        certificate_arn=cdn_certificate_arn,
+        price_class=educate_config.get("cdn_price_class") or "PriceClass_All",
+        tags=tags,
+    )
+
+    educate_cdn = DTEducateCDN(cdn_config)
+
+    lms_record_alias = route53.RecordAliasArgs(
+        name=educate_cdn.get_domain_name(),
+        zone_id=educate_cdn.get_hosted_zone_id(),
+        evaluate_target_health=False,
+    )
+else:
+    lms_record_alias = route53.RecordAliasArgs(
+        name=educate_app_alb.dns_name,
+        zone_id=educate_app_alb.zone_id,
+        evaluate_target_health=True,
+    )
 
 services_record_alias = route53.RecordAliasArgs(
     name=f"learn.{zone.name}",
@@ -202,6 +406,16 @@ record_services = route53.Record(
     records=[f"learn.{zone.name}"],
 )
 
-export("instanceId", educate_app_instance.get_instance_id())
+if autoscaling_enabled:
+    export("autoscalingGroupName", educate_app_asg.get_asg_name())
+    export("studioAutoscalingGroupName", studio_asg.get_asg_name())
+else:
+    export("instanceId", educate_app_instance.get_instance_id())
+if workers_enabled:
+    export("workersAutoscalingGroupName", educate_workers.get_asg_name())
 export("loadBalancerDnsName", educate_app_alb.dns_name)
+if cdn_certificate_arn:
+    export("cdnDomainName", educate_cdn.get_domain_name())
 export("fullDomainName", record_lms.fqdn)
+
+export_component_report()
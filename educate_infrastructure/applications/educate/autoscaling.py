@@ -0,0 +1,212 @@
+"""
+This module defines a Pulumi component resource for encapsulating our best practices for
+building an autoscaled fleet of Educate instances behind the application load balancer.
+
+This includes:
+- Create a launch template for the Educate instances
+- Create an Auto Scaling Group registered with the load balancer target group
+- Create target tracking policies on ALB request count per target and CPU
+"""
+from typing import List, Optional, Text
+
+from pulumi import Output, ResourceOptions, info
+from pulumi_aws import autoscaling, ec2, lb
+from pydantic import BaseModel, PositiveInt, confloat, conint, validator
+
+from educate_infrastructure.applications.educate.ec2 import (
+    EDUCATE_AMI_ID,
+    educate_user_data,
+)
+from educate_infrastructure.lib.component import DTComponent
+
+
+class DTEducateASGConfig(BaseModel):
+    """
+    Configuration object for defining configuration needed to create an autoscaled
+    fleet of native Open edX instances.
+    """
+
+    name: Text
+    app_subnet_ids: Output
+    iam_instance_profile_id: Output
+    security_group_id: Output
+    load_balancer: lb.LoadBalancer
+    target_group: lb.TargetGroup  # Also the source of the request count metric
+    additional_target_groups: List[lb.TargetGroup] = []
+    instance_type: ec2.InstanceType
+    ami_id: Text = EDUCATE_AMI_ID  # Same image as the single Educate instance
+    volume_size: Optional[PositiveInt] = 50
+    commands: Optional[Text]  # Run after the boot script, as on the single instance
+    min_size: conint(ge=0) = 1  # type: ignore
+    max_size: PositiveInt = 4
+    desired_capacity: Optional[conint(ge=0)] = None  # type: ignore
+    health_check_grace_period: PositiveInt = 300
+    instance_warmup: PositiveInt = 300
+    # Target tracking values, set to None to disable the matching policy
+    requests_per_target: Optional[PositiveInt] = 1000
+    cpu_utilization: Optional[confloat(gt=0, le=100)] = 60  # type: ignore
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @validator("max_size")
+    def max_above_min(cls, max_size, values):
+        if max_size < values.get("min_size", 0):
+            raise ValueError("max_size must not be below min_size")
+        return max_size
+
+    @validator("desired_capacity")
+    def desired_within_bounds(cls, desired_capacity, values):
+        if desired_capacity is None:
+            return desired_capacity
+        min_size = values.get("min_size", 0)
+        max_size = values.get("max_size", desired_capacity)
+        if not min_size <= desired_capacity <= max_size:
+            raise ValueError("desired_capacity must be between min_size and max_size")
+        return desired_capacity
+
+
+class DTEducateASG(DTComponent):
+    """Pulumi component for building an Auto Scaling Group of Educate instances.
+
+    A component resource that encapsulates all of the standard practices of how the Dicey Tech
+    Engineering team constructs and scales the Educate application fleet in AWS.
+    """
+
+    def __init__(
+        self, instance_config: DTEducateASGConfig, opts: ResourceOptions = None
+    ):
+        """
+        Build an Educate Auto Scaling Group.
+
+        :param instance_config: Config object for customizing the created Educate fleet
+            and associated resources.
+        :type DTEducateASGConfig
+
+        :param opts: Optional resource options to be merged into the defaults.  Useful
+            for handling things like AWS provider overrides.
+        :type opts: Optional[ResourceOptions]
+        """
+        self.name = instance_config.name
+        self.tags = {"pulumi_managed": "true", "Name": self.name}
+        super().__init__("diceytech:infrastructure:aws:ASG", f"{self.name}-asg", opts)
+
+        # The same boot script as the single instance, compressed into the template
+        self.user_data = educate_user_data(instance_config.commands)
+
+        self.launch_template = ec2.LaunchTemplate(
+            f"{self.name}-lt",
+            name_prefix=f"{self.name}-",
+            image_id=instance_config.ami_id,
+            instance_type=instance_config.instance_type,
+            iam_instance_profile=ec2.LaunchTemplateIamInstanceProfileArgs(
+                name=instance_config.iam_instance_profile_id,
+            ),
+            vpc_security_group_ids=[instance_config.security_group_id],
+            user_data=self.user_data.base64(),
+            block_device_mappings=[
+                ec2.LaunchTemplateBlockDeviceMappingArgs(
+                    device_name="/dev/sda1",
+                    ebs=ec2.LaunchTemplateBlockDeviceMappingEbsArgs(
+                        delete_on_termination="true",
+                        volume_size=instance_config.volume_size,
+                        encrypted="true",
+                    ),
+                )
+            ],
+            tag_specifications=[
+                ec2.LaunchTemplateTagSpecificationArgs(
+                    resource_type="instance", tags=self.tags
+                ),
+                ec2.LaunchTemplateTagSpecificationArgs(
+                    resource_type="volume", tags=self.tags
+                ),
+            ],
+            update_default_version=True,
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.asg = autoscaling.Group(
+            f"{self.name}-asg",
+            vpc_zone_identifiers=instance_config.app_subnet_ids,
+            min_size=instance_config.min_size,
+            max_size=instance_config.max_size,
+            desired_capacity=instance_config.desired_capacity,
+            launch_template=autoscaling.GroupLaunchTemplateArgs(
+                id=self.launch_template.id,
+                version=self.launch_template.latest_version.apply(str),
+            ),
+            target_group_arns=[
+                target_group.arn
+                for target_group in [
+                    instance_config.target_group,
+                    *instance_config.additional_target_groups,
+                ]
+            ],
+            health_check_type="ELB",
+            health_check_grace_period=instance_config.health_check_grace_period,
+            tags=[
+                autoscaling.GroupTagArgs(key=key, value=value, propagate_at_launch=True)
+                for key, value in self.tags.items()
+            ],
+            # The scaling policies own the capacity once the group exists
+            opts=ResourceOptions(parent=self, ignore_changes=["desired_capacity"]),
+        )
+
+        self.policies: List[autoscaling.Policy] = []
+        if instance_config.requests_per_target is not None:
+            self.add_target_tracking_policy(
+                "request-count",
+                "ALBRequestCountPerTarget",
+                instance_config.requests_per_target,
+                instance_config.instance_warmup,
+                resource_label=Output.concat(
+                    instance_config.load_balancer.arn_suffix,
+                    "/",
+                    instance_config.target_group.arn_suffix,
+                ),
+            )
+        if instance_config.cpu_utilization is not None:
+            self.add_target_tracking_policy(
+                "cpu",
+                "ASGAverageCPUUtilization",
+                instance_config.cpu_utilization,
+                instance_config.instance_warmup,
+            )
+
+        self.register_outputs(
+            {
+                "asg_name": self.asg.name,
+                "launch_template_id": self.launch_template.id,
+            }
+        )
+
+        info(msg=f"{self.name} created.", resource=self)
+
+    def add_target_tracking_policy(
+        self,
+        suffix: Text,
+        metric_type: Text,
+        target_value: float,
+        instance_warmup: int,
+        resource_label: Optional[Output] = None,
+    ):
+        policy = autoscaling.Policy(
+            f"{self.name}-{suffix}-policy",
+            autoscaling_group_name=self.asg.name,
+            policy_type="TargetTrackingScaling",
+            estimated_instance_warmup=instance_warmup,
+            target_tracking_configuration=autoscaling.PolicyTargetTrackingConfigurationArgs(
+                predefined_metric_specification=autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+                    predefined_metric_type=metric_type,
+                    resource_label=resource_label,
+                ),
+                target_value=target_value,
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+        self.policies.append(policy)
+
+    def get_asg_name(self) -> Text:
+        return self.asg.name
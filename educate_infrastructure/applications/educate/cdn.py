@@ -0,0 +1,169 @@
+"""
+This module defines a Pulumi component resource for encapsulating our best practices for
+serving Educate through a CloudFront distribution in front of the application load
+balancer.
+
+This includes:
+- Create a long TTL, compressed cache policy for the static and media assets
+- Create a distribution caching those assets at the edge
+- Pass every other (dynamic LMS and Studio) request through to the load balancer
+"""
+from typing import Dict, List, Text
+
+from pulumi import Output, ResourceOptions, info
+from pulumi_aws import cloudfront, lb
+from pydantic import BaseModel, conint
+
+from educate_infrastructure.lib.component import DTComponent
+
+# AWS managed policies used for the pass-through behaviour
+# https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/using-managed-cache-policies.html
+CACHING_DISABLED_POLICY_ID = "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+ALL_VIEWER_ORIGIN_REQUEST_POLICY_ID = "216adef6-5c7f-47e4-b989-5492eafa07d3"
+
+ALL_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"]
+CACHED_METHODS = ["GET", "HEAD"]
+
+ONE_DAY = 86400
+ONE_YEAR = 365 * ONE_DAY
+
+
+class DTEducateCDNConfig(BaseModel):
+    """Configuration object for defining the CloudFront distribution serving Educate."""
+
+    name: Text
+    load_balancer: lb.LoadBalancer
+    aliases: List[Text]
+    # CloudFront only accepts certificates issued in us-east-1
+    certificate_arn: Text
+    cached_paths: List[Text] = ["/static/*", "/media/*"]
+    default_ttl: conint(ge=0) = ONE_DAY  # type: ignore
+    max_ttl: conint(ge=0) = ONE_YEAR  # type: ignore
+    price_class: Text = "PriceClass_All"
+    tags: Dict = {"pulumi_managed": "true"}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class DTEducateCDN(DTComponent):
+    """
+    Build a CloudFront distribution caching the Educate assets in front of the ALB
+
+    """
+
+    def __init__(self, cdn_config: DTEducateCDNConfig, opts: ResourceOptions = None):
+        """Create the asset cache policy and the distribution.
+
+        :param cdn_config: Configuration object for customizing the distribution.
+        :type cdn_config: DTEducateCDNConfig
+
+        :returns: The constructed component resource object.
+
+        :rtype: DTEducateCDN
+        """
+        super().__init__(
+            "diceytech:infrastructure:aws:DTEducateCDN",
+            cdn_config.name,
+            opts,
+        )
+
+        origin_id = f"{cdn_config.name}-alb"
+
+        # The Host header is part of the key so that LMS and Studio assets are cached
+        # apart, and it lets the load balancer certificate match the request
+        self.assets_cache_policy = cloudfront.CachePolicy(
+            f"{cdn_config.name}-assets-cache-policy",
+            name=f"{cdn_config.name}-assets",
+            comment="Long lived, compressed Educate static and media assets",
+            min_ttl=0,
+            default_ttl=cdn_config.default_ttl,
+            max_ttl=cdn_config.max_ttl,
+            parameters_in_cache_key_and_forwarded_to_origin=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginArgs(
+                enable_accept_encoding_gzip=True,
+                enable_accept_encoding_brotli=True,
+                cookies_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginCookiesConfigArgs(
+                    cookie_behavior="none",
+                ),
+                headers_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginHeadersConfigArgs(
+                    header_behavior="whitelist",
+                    headers=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginHeadersConfigHeadersArgs(
+                        items=["Host"],
+                    ),
+                ),
+                query_strings_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginQueryStringsConfigArgs(
+                    query_string_behavior="none",
+                ),
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.distribution = cloudfront.Distribution(
+            f"{cdn_config.name}-distribution",
+            enabled=True,
+            comment=f"Educate CDN {cdn_config.name}",
+            aliases=cdn_config.aliases,
+            http_version="http2",
+            is_ipv6_enabled=True,
+            price_class=cdn_config.price_class,
+            origins=[
+                cloudfront.DistributionOriginArgs(
+                    origin_id=origin_id,
+                    domain_name=cdn_config.load_balancer.dns_name,
+                    custom_origin_config=cloudfront.DistributionOriginCustomOriginConfigArgs(
+                        http_port=80,
+                        https_port=443,
+                        origin_protocol_policy="https-only",
+                        origin_ssl_protocols=["TLSv1.2"],
+                    ),
+                )
+            ],
+            default_cache_behavior=cloudfront.DistributionDefaultCacheBehaviorArgs(
+                target_origin_id=origin_id,
+                viewer_protocol_policy="redirect-to-https",
+                allowed_methods=ALL_METHODS,
+                cached_methods=CACHED_METHODS,
+                cache_policy_id=CACHING_DISABLED_POLICY_ID,
+                origin_request_policy_id=ALL_VIEWER_ORIGIN_REQUEST_POLICY_ID,
+                compress=True,
+            ),
+            ordered_cache_behaviors=[
+                cloudfront.DistributionOrderedCacheBehaviorArgs(
+                    path_pattern=path,
+                    target_origin_id=origin_id,
+                    viewer_protocol_policy="redirect-to-https",
+                    allowed_methods=["GET", "HEAD", "OPTIONS"],
+                    cached_methods=CACHED_METHODS,
+                    cache_policy_id=self.assets_cache_policy.id,
+                    compress=True,
+                )
+                for path in cdn_config.cached_paths
+            ],
+            restrictions=cloudfront.DistributionRestrictionsArgs(
+                geo_restriction=cloudfront.DistributionRestrictionsGeoRestrictionArgs(
+                    restriction_type="none",
+                ),
+            ),
+            viewer_certificate=cloudfront.DistributionViewerCertificateArgs(
+                acm_certificate_arn=cdn_config.certificate_arn,
+                ssl_support_method="sni-only",
+                minimum_protocol_version="TLSv1.2_2021",
+            ),
+            tags=cdn_config.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.register_outputs(
+            {
+                "domain_name": self.distribution.domain_name,
+                "hosted_zone_id": self.distribution.hosted_zone_id,
+            }
+        )
+
+        info(msg=f"{cdn_config.name} created.", resource=self)
+
+    def get_domain_name(self) -> Output:
+        return self.distribution.domain_name
+
+    def get_hosted_zone_id(self) -> Output:
+        return self.distribution.hosted_zone_id
@@ -0,0 +1,33 @@
+#!/bin/bash
+# Let the running tasks finish before the Auto Scaling Group terminates the instance
+set -euo pipefail
+
+cat > /usr/local/bin/drain-worker <<'SCRIPT'
+#!/bin/bash
+token=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60")
+metadata() {
+    curl -s -H "X-aws-ec2-metadata-token: $token" "http://169.254.169.254/latest/meta-data/$1"
+}
+
+if [ "$(metadata autoscaling/target-lifecycle-state)" != "Terminated" ]; then
+    exit 0
+fi
+
+instance_id=$(metadata instance-id)
+region=$(metadata placement/region)
+group=$(aws autoscaling describe-auto-scaling-instances --region "$region" \
+    --instance-ids "$instance_id" \
+    --query "AutoScalingInstances[0].AutoScalingGroupName" --output text)
+
+# A warm shutdown stops consuming and waits for the running tasks
+{{ stop_command }}
+
+aws autoscaling complete-lifecycle-action --region "$region" \
+    --auto-scaling-group-name "$group" \
+    --lifecycle-hook-name "{{ lifecycle_hook }}" \
+    --instance-id "$instance_id" \
+    --lifecycle-action-result CONTINUE
+SCRIPT
+chmod +x /usr/local/bin/drain-worker
+
+echo "* * * * * root flock -n /run/drain-worker.lock /usr/local/bin/drain-worker" > /etc/cron.d/drain-worker
@@ -4,13 +4,28 @@ building an Educate Instance.
 
 This includes:
 - Create the named EC2 with appropriate tags
+- Render its boot script (config.sh) and extra commands into compressed user data
 """
+from pathlib import Path
 from typing import List, Text, Optional
 
-from pulumi import ComponentResource, Output, ResourceOptions, info
-from pulumi_aws import ec2, GetAmiFilterArgs, iam
+from pulumi import Output, ResourceOptions, info
+from pulumi_aws import ec2, iam
 from pydantic import BaseModel, PositiveInt
 
+from educate_infrastructure.lib.component import DTComponent
+from educate_infrastructure.lib.lookups import lookup_ami
+from educate_infrastructure.lib.user_data import (
+    DTUserData,
+    DTUserDataPart,
+    build_user_data,
+    load_template,
+)
+
+EDUCATE_BOOT_SCRIPT = Path(__file__).parent / "config.sh"
+# Image baked for the Educate instances
+EDUCATE_AMI_ID = "ami-08616bba875264c0b"
+
 
 class DTEducateConfig(BaseModel):
     """
@@ -25,13 +40,33 @@ class DTEducateConfig(BaseModel):
     security_group_id: Output
     instance_type: ec2.InstanceType
     volume_size: Optional[PositiveInt] = 50
-    commands: Optional[Text]
+    commands: Optional[Text]  # Run after the boot script
+    # Changing the user data of a running instance stops and starts it
+    attach_user_data: bool = False
 
     class Config:
         arbitrary_types_allowed = True
 
 
-class DTEc2(ComponentResource):
+def educate_user_data(commands: Optional[Text] = None) -> DTUserData:
+    """Render the boot script of an Educate instance followed by the extra commands.
+
+    :param commands: Shell script run after the boot script.
+    :type commands: Optional[Text]
+
+    :rtype: DTUserData
+    """
+    parts = [
+        DTUserDataPart(
+            filename="educate.sh", template=load_template(EDUCATE_BOOT_SCRIPT)
+        )
+    ]
+    if commands:
+        parts.append(DTUserDataPart(filename="commands.sh", template=commands))
+    return build_user_data(parts)
+
+
+class DTEc2(DTComponent):
     """Pulumi component for building all of the necessary pieces of an AWS EC2 instnace.
 
     A component resource that encapsulates all of the standard practices of how the Dicey Tech
@@ -59,28 +94,25 @@ class DTEc2(ComponentResource):
         self.size = instance_config.instance_type
 
         # Ubuntu 20.04 LTS - Focal
-        self.ami = ec2.get_ami(
-            most_recent=True,
+        self.ami = lookup_ami(
             owners=["679593333241"],
-            filters=[
-                GetAmiFilterArgs(
-                    name="name",
-                    values=["ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-*"],
-                ),
-            ],
+            filters={
+                "name": ["ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-*"],
+            },
         )
 
-        # TODO Smells bad....
-        with open("config.sh") as f:
-            self.user_data = f.read()
+        self.user_data = self.build_user_data(instance_config)
+        user_data = None
+        if instance_config.attach_user_data:
+            user_data = self.user_data.base64()
 
         self._instance = ec2.Instance(
             f"{self.name}-instance",
             instance_type=self.size,
             subnet_id=instance_config.app_subnet_id,
             vpc_security_group_ids=[instance_config.security_group_id],
-            # user_data=self.user_data,
-            ami="ami-08616bba875264c0b",  # self.ami.id,
+            user_data_base64=user_data,
+            ami=EDUCATE_AMI_ID,  # self.ami.id,
             iam_instance_profile=instance_config.iam_instance_profile_id,
             root_block_device=ec2.InstanceRootBlockDeviceArgs(
                 delete_on_termination=True,
@@ -102,6 +134,9 @@ class DTEc2(ComponentResource):
 
         info(msg=f"{self.name} created.", resource=self)
 
+    def build_user_data(self, instance_config: DTEducateConfig) -> DTUserData:
+        return educate_user_data(instance_config.commands)
+
     def get_public_ip(self) -> Text:
         return self._instance.public_ip
 
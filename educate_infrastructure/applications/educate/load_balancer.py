@@ -0,0 +1,302 @@
+"""
+This module defines a Pulumi component resource for encapsulating our best practices for
+building an application load balancer routing requests to several target groups.
+
+This includes:
+- Create the load balancer with HTTP/2 enabled
+- Create a target group per routing table entry with its own health check, deregistration
+  delay, slow start and stickiness
+- Redirect HTTP to HTTPS and forward HTTPS requests by host header and path pattern
+- Describe the response time, error and traffic metrics to monitor
+"""
+from typing import Dict, List, Optional, Text
+
+from pulumi import Alias, Output, ResourceOptions, info
+from pulumi_aws import lb
+from pydantic import BaseModel, PositiveInt, conint, validator
+
+from educate_infrastructure.lib.component import DTComponent
+from educate_infrastructure.lib.monitoring import DTMetric
+
+DEFAULT_SSL_POLICY = "ELBSecurityPolicy-2016-08"
+
+
+class DTTargetGroupConfig(BaseModel):
+    """
+    A routing table entry: the requests matching the hosts and paths and the target
+    group receiving them.
+    """
+
+    name: Text
+    hosts: List[Text] = []
+    paths: List[Text] = []
+    port: PositiveInt = 80
+    protocol: Text = "HTTP"
+    health_check_path: Text = "/heartbeat"
+    health_check_matcher: Text = "200"
+    health_check_interval: conint(ge=5, le=300) = 30  # type: ignore
+    healthy_threshold: conint(ge=2, le=10) = 3  # type: ignore
+    unhealthy_threshold: conint(ge=2, le=10) = 3  # type: ignore
+    deregistration_delay: conint(ge=0, le=3600) = 30  # type: ignore
+    slow_start: int = 0  # Seconds, 0 disables it
+    stickiness_duration: Optional[conint(ge=1, le=604800)] = None  # type: ignore
+
+    @validator("slow_start")
+    def slow_start_range(cls, slow_start):
+        if slow_start and not 30 <= slow_start <= 900:
+            raise ValueError("slow_start must be 0 or between 30 and 900 seconds")
+        return slow_start
+
+
+class DTLoadBalancerConfig(BaseModel):
+    """
+    Configuration object for defining an application load balancer and its routing table.
+
+    The first target group receives every request not matched by another entry.
+    """
+
+    name: Text
+    vpc_id: Output
+    subnet_ids: Output
+    security_group_ids: List[Output]
+    certificate_arn: Text
+    ssl_policy: Text = DEFAULT_SSL_POLICY
+    target_groups: List[DTTargetGroupConfig]
+    enable_http2: bool = True
+    idle_timeout: PositiveInt = 60
+    deletion_protection: bool = True
+    tags: Dict = {"pulumi_managed": "true"}
+    # Previous identities of the resources, keyed by "alb", "http_listener",
+    # "https_listener" or a target group name, so that they are not replaced
+    resource_aliases: Dict[Text, List[Alias]] = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @validator("target_groups")
+    def routing_table(cls, target_groups):
+        if not target_groups:
+            raise ValueError("At least one target group is required")
+        names = [target_group.name for target_group in target_groups]
+        if len(set(names)) != len(names):
+            raise ValueError("Target group names must be unique")
+        for target_group in target_groups[1:]:
+            if not target_group.hosts and not target_group.paths:
+                raise ValueError(
+                    f"Target group {target_group.name} needs hosts or paths to route to it"
+                )
+        return target_groups
+
+
+class DTLoadBalancer(DTComponent):
+    """
+    Build an application load balancer routing by host and path to its target groups
+
+    """
+
+    def __init__(self, lb_config: DTLoadBalancerConfig, opts: ResourceOptions = None):
+        """Create the load balancer, its listeners, target groups and routing rules.
+
+        :param lb_config: Configuration object for customizing the load balancer.
+        :type lb_config: DTLoadBalancerConfig
+
+        :returns: The constructed component resource object.
+
+        :rtype: DTLoadBalancer
+        """
+        super().__init__(
+            "diceytech:infrastructure:aws:DTLoadBalancer",
+            lb_config.name,
+            opts,
+        )
+
+        self.name = lb_config.name
+        self.aliases = lb_config.resource_aliases
+
+        # TODO Add access_logs
+        self.load_balancer = lb.LoadBalancer(
+            f"{self.name}-alb",
+            load_balancer_type="application",
+            security_groups=lb_config.security_group_ids,
+            subnets=lb_config.subnet_ids,
+            enable_http2=lb_config.enable_http2,
+            idle_timeout=lb_config.idle_timeout,
+            enable_deletion_protection=lb_config.deletion_protection,
+            tags=lb_config.tags,
+            opts=self._opts("alb"),
+        )
+
+        self.target_groups: Dict[Text, lb.TargetGroup] = {}
+        for target_group_config in lb_config.target_groups:
+            self.create_target_group(lb_config, target_group_config)
+
+        default_target_group = self.target_groups[lb_config.target_groups[0].name]
+
+        self.http_listener = lb.Listener(
+            f"{self.name}-http-listener",
+            load_balancer_arn=self.load_balancer.arn,
+            port=80,
+            default_actions=[
+                lb.ListenerDefaultActionArgs(
+                    type="redirect",
+                    redirect=lb.ListenerDefaultActionRedirectArgs(
+                        port="443",
+                        protocol="HTTPS",
+                        status_code="HTTP_301",
+                    ),
+                )
+            ],
+            opts=self._opts("http_listener"),
+        )
+
+        self.https_listener = lb.Listener(
+            f"{self.name}-https-listener",
+            load_balancer_arn=self.load_balancer.arn,
+            port=443,
+            protocol="HTTPS",
+            ssl_policy=lb_config.ssl_policy,
+            certificate_arn=lb_config.certificate_arn,
+            default_actions=[
+                lb.ListenerDefaultActionArgs(
+                    type="forward", target_group_arn=default_target_group.arn
+                )
+            ],
+            opts=self._opts("https_listener"),
+        )
+
+        self.rules: List[lb.ListenerRule] = []
+        for priority, target_group_config in enumerate(lb_config.target_groups[1:], 1):
+            self.create_rule(priority * 10, target_group_config)
+
+        self.register_outputs(
+            {
+                "dns_name": self.load_balancer.dns_name,
+                "target_group_arns": {
+                    name: target_group.arn
+                    for name, target_group in self.target_groups.items()
+                },
+            }
+        )
+
+        info(msg=f"{self.name} created.", resource=self)
+
+    def _opts(self, key: Text) -> ResourceOptions:
+        return ResourceOptions(parent=self, aliases=self.aliases.get(key))
+
+    def create_target_group(
+        self, lb_config: DTLoadBalancerConfig, target_group_config: DTTargetGroupConfig
+    ):
+        stickiness = None
+        if target_group_config.stickiness_duration:
+            stickiness = lb.TargetGroupStickinessArgs(
+                type="lb_cookie",
+                enabled=True,
+                cookie_duration=target_group_config.stickiness_duration,
+            )
+
+        self.target_groups[target_group_config.name] = lb.TargetGroup(
+            f"{self.name}-{target_group_config.name}-tg",
+            port=target_group_config.port,
+            protocol=target_group_config.protocol,
+            vpc_id=lb_config.vpc_id,
+            deregistration_delay=target_group_config.deregistration_delay,
+            slow_start=target_group_config.slow_start,
+            stickiness=stickiness,
+            health_check=lb.TargetGroupHealthCheckArgs(
+                path=target_group_config.health_check_path,
+                matcher=target_group_config.health_check_matcher,
+                interval=target_group_config.health_check_interval,
+                healthy_threshold=target_group_config.healthy_threshold,
+                unhealthy_threshold=target_group_config.unhealthy_threshold,
+            ),
+            tags={**lb_config.tags, "Name": target_group_config.name},
+            opts=self._opts(target_group_config.name),
+        )
+
+    def create_rule(self, priority: int, target_group_config: DTTargetGroupConfig):
+        conditions = []
+        if target_group_config.hosts:
+            conditions.append(
+                lb.ListenerRuleConditionArgs(
+                    host_header=lb.ListenerRuleConditionHostHeaderArgs(
+                        values=target_group_config.hosts
+                    )
+                )
+            )
+        if target_group_config.paths:
+            conditions.append(
+                lb.ListenerRuleConditionArgs(
+                    path_pattern=lb.ListenerRuleConditionPathPatternArgs(
+                        values=target_group_config.paths
+                    )
+                )
+            )
+
+        rule = lb.ListenerRule(
+            f"{self.name}-{target_group_config.name}-rule",
+            listener_arn=self.https_listener.arn,
+            priority=priority,
+            actions=[
+                lb.ListenerRuleActionArgs(
+                    type="forward",
+                    target_group_arn=self.target_groups[target_group_config.name].arn,
+                )
+            ],
+            conditions=conditions,
+            opts=ResourceOptions(parent=self),
+        )
+        self.rules.append(rule)
+
+    def get_target_group(self, name: Text) -> lb.TargetGroup:
+        return self.target_groups[name]
+
+    def get_dns_name(self) -> Output:
+        return self.load_balancer.dns_name
+
+    def get_zone_id(self) -> Output:
+        return self.load_balancer.zone_id
+
+    def monitoring_metrics(self) -> List[DTMetric]:
+        """Response time percentiles, 5xx responses and requests of the load balancer."""
+        dimensions = {"LoadBalancer": self.load_balancer.arn_suffix}
+        metrics = [
+            DTMetric(
+                key=f"response_time_{percentile}",
+                title=f"Target response time {percentile} (seconds)",
+                namespace="AWS/ApplicationELB",
+                metric_name="TargetResponseTime",
+                dimensions=dimensions,
+                statistic=percentile,
+                threshold=threshold,
+            )
+            for percentile, threshold in (("p95", 1), ("p99", 2.5))
+        ]
+        metrics += [
+            DTMetric(
+                key="target_5xx",
+                title="Target 5xx responses",
+                namespace="AWS/ApplicationELB",
+                metric_name="HTTPCode_Target_5XX_Count",
+                dimensions=dimensions,
+                statistic="Sum",
+                threshold=50,
+            ),
+            DTMetric(
+                key="elb_5xx",
+                title="Load balancer 5xx responses",
+                namespace="AWS/ApplicationELB",
+                metric_name="HTTPCode_ELB_5XX_Count",
+                dimensions=dimensions,
+                statistic="Sum",
+                threshold=10,
+            ),
+            DTMetric(
+                key="requests",
+                title="Requests",
+                namespace="AWS/ApplicationELB",
+                metric_name="RequestCount",
+                dimensions=dimensions,
+                statistic="Sum",
+            ),
+        ]
+        return metrics
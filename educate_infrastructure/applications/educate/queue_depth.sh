@@ -0,0 +1,53 @@
+#!/bin/bash
+# Publish the depth of the Celery queues every minute, the worker fleet scales on it
+set -euo pipefail
+
+# The broker only accepts TLS connections, which redis-cli supports from Redis 6
+if ! redis-cli --version 2>/dev/null | grep -Eq "redis-cli ([6-9]|[1-9][0-9])\."; then
+    curl -fsSL https://packages.redis.io/gpg \
+        | gpg --dearmor --yes -o /usr/share/keyrings/redis-archive-keyring.gpg
+    echo "deb [signed-by=/usr/share/keyrings/redis-archive-keyring.gpg] https://packages.redis.io/deb $(lsb_release -cs) main" \
+        > /etc/apt/sources.list.d/redis.list
+    apt-get update
+    apt-get install -y redis-tools
+fi
+
+cat > /usr/local/bin/publish-queue-depth <<'SCRIPT'
+#!/bin/bash
+set -uo pipefail
+
+token=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60")
+region=$(curl -s -H "X-aws-ec2-metadata-token: $token" http://169.254.169.254/latest/meta-data/placement/region)
+
+if [ -n "{{ auth_secret_arn }}" ]; then
+    if ! REDISCLI_AUTH=$(aws secretsmanager get-secret-value --region "$region" \
+        --secret-id "{{ auth_secret_arn }}" --query SecretString --output text); then
+        echo "Could not read the broker AUTH token, not publishing the queue depth" >&2
+        exit 1
+    fi
+    export REDISCLI_AUTH
+fi
+
+depth=0
+for queue in {{ queues }}; do
+    # redis-cli reports errors such as NOAUTH on stdout, so check the reply is a length
+    length=$(redis-cli -h {{ broker_host }} -p {{ broker_port }} {{ tls_flag }} llen "$queue")
+    if [[ ! "$length" =~ ^[0-9]+$ ]]; then
+        # A missing datapoint holds the capacity, reporting 0 would scale the fleet in
+        echo "Could not read the length of $queue: $length, not publishing the queue depth" >&2
+        exit 1
+    fi
+    depth=$((depth + length))
+done
+
+aws cloudwatch put-metric-data \
+    --region "$region" \
+    --namespace "{{ namespace }}" \
+    --metric-name "{{ metric_name }}" \
+    --dimensions Fleet={{ fleet }} \
+    --unit Count \
+    --value "$depth"
+SCRIPT
+chmod +x /usr/local/bin/publish-queue-depth
+
+echo "* * * * * root /usr/local/bin/publish-queue-depth 2>&1 | logger -t publish-queue-depth" > /etc/cron.d/publish-queue-depth
@@ -0,0 +1,102 @@
+import gzip
+
+import pulumi
+import pytest
+from pulumi_aws import lb
+from pydantic import ValidationError
+
+from educate_infrastructure.applications.educate.autoscaling import (
+    DTEducateASG,
+    DTEducateASGConfig,
+)
+from educate_infrastructure.applications.educate.ec2 import (
+    EDUCATE_AMI_ID,
+    educate_user_data,
+)
+
+
+def asg_config(
+    load_balancer: lb.LoadBalancer, target_group: lb.TargetGroup, **kwargs
+) -> DTEducateASGConfig:
+    return DTEducateASGConfig(
+        **{
+            "name": "educate-app-test",
+            "app_subnet_ids": pulumi.Output.from_input(["subnet-0d06af077da3e1c6f"]),
+            "iam_instance_profile_id": pulumi.Output.from_input("educate-profile"),
+            "security_group_id": pulumi.Output.from_input("sg-0123456789"),
+            "load_balancer": load_balancer,
+            "target_group": target_group,
+            "instance_type": "t3a.large",
+            **kwargs,
+        }
+    )
+
+
+class TestEducateASG(object):
+    @classmethod
+    def setup_class(cls):
+        cls.alb = lb.LoadBalancer("educate-alb")
+        cls.tg = lb.TargetGroup("educate-tg", port=80, protocol="HTTP")
+        cls.asg = DTEducateASG(
+            asg_config(
+                cls.alb,
+                cls.tg,
+                min_size=2,
+                max_size=6,
+                commands="sudo ./version.py > versions.log",
+            )
+        )
+
+    def test_asg_has_scaling_policies(self):
+        assert len(self.asg.policies) == 2
+
+    @pulumi.runtime.test
+    def test_asg_is_registered_with_target_group(self):
+        def check_target_groups(args):
+            target_group_arns, tg_arn = args
+            assert target_group_arns == [tg_arn]
+
+        return pulumi.Output.all(self.asg.asg.target_group_arns, self.tg.arn).apply(
+            check_target_groups
+        )
+
+    @pulumi.runtime.test
+    def test_asg_uses_configured_bounds(self):
+        def check_bounds(args):
+            min_size, max_size = args
+            assert (min_size, max_size) == (2, 6)
+
+        return pulumi.Output.all(self.asg.asg.min_size, self.asg.asg.max_size).apply(
+            check_bounds
+        )
+
+    @pulumi.runtime.test
+    def test_asg_uses_the_educate_image(self):
+        def check_image(image_id):
+            assert image_id == EDUCATE_AMI_ID
+
+        return self.asg.launch_template.image_id.apply(check_image)
+
+    def test_user_data_matches_the_single_instance(self):
+        document = gzip.decompress(self.asg.user_data.payload).decode()
+        assert document.index("sudo locale-gen") < document.index("> versions.log")
+        assert (
+            self.asg.user_data.payload
+            == educate_user_data("sudo ./version.py > versions.log").payload
+        )
+
+    @pulumi.runtime.test
+    def test_user_data_is_in_the_launch_template(self):
+        def check_user_data(user_data):
+            assert user_data == self.asg.user_data.base64()
+
+        return self.asg.launch_template.user_data.apply(check_user_data)
+
+    def test_capacity_must_be_within_bounds(self):
+        asg_config(self.alb, self.tg, min_size=1, max_size=4, desired_capacity=4)
+        with pytest.raises(ValidationError):
+            asg_config(self.alb, self.tg, min_size=2, max_size=4, desired_capacity=1)
+        with pytest.raises(ValidationError):
+            asg_config(self.alb, self.tg, min_size=1, max_size=4, desired_capacity=5)
+        with pytest.raises(ValidationError):
+            asg_config(self.alb, self.tg, min_size=3, max_size=2)
@@ -0,0 +1,57 @@
+import pulumi
+from pulumi_aws import lb
+
+from educate_infrastructure.applications.educate.cdn import (
+    CACHING_DISABLED_POLICY_ID,
+    DTEducateCDN,
+    DTEducateCDNConfig,
+)
+
+
+class TestEducateCDN(object):
+    @classmethod
+    def setup_class(cls):
+        cls.alb = lb.LoadBalancer("educate-alb")
+        cls.cdn = DTEducateCDN(
+            DTEducateCDNConfig(
+                name="educate-cdn-test",
+                load_balancer=cls.alb,
+                aliases=["learn.diceytech.co.uk"],
+                certificate_arn="arn:aws:acm:us-east-1:0:certificate/test",
+            )
+        )
+
+    @pulumi.runtime.test
+    def test_alb_is_the_origin(self):
+        def check_origin(args):
+            origins, dns_name = args
+            assert origins[0]["domain_name"] == dns_name
+            assert origins[0]["custom_origin_config"]["origin_protocol_policy"] == (
+                "https-only"
+            )
+
+        return pulumi.Output.all(
+            self.cdn.distribution.origins, self.alb.dns_name
+        ).apply(check_origin)
+
+    @pulumi.runtime.test
+    def test_dynamic_paths_are_not_cached(self):
+        def check_default(behavior):
+            assert behavior["cache_policy_id"] == CACHING_DISABLED_POLICY_ID
+            assert "POST" in behavior["allowed_methods"]
+
+        return self.cdn.distribution.default_cache_behavior.apply(check_default)
+
+    @pulumi.runtime.test
+    def test_assets_are_cached_and_compressed(self):
+        def check_assets(args):
+            behaviors, policy_id = args
+            assert [b["path_pattern"] for b in behaviors] == ["/static/*", "/media/*"]
+            for behavior in behaviors:
+                assert behavior["cache_policy_id"] == policy_id
+                assert behavior["compress"]
+
+        return pulumi.Output.all(
+            self.cdn.distribution.ordered_cache_behaviors,
+            self.cdn.assets_cache_policy.id,
+        ).apply(check_assets)
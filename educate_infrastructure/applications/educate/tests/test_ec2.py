@@ -1,20 +1,29 @@
-import pytest
+import gzip
+
 import pulumi
 
-from educate_infrastructure.applications.educate.tests import educate_mock
-from educate_infrastructure.applications.educate.ec2 import DTEc2
+from educate_infrastructure.applications.educate.ec2 import DTEc2, DTEducateConfig
 
 
 class TestEducateApp(object):
     """ Initial tests doing some basic coverage"""
 
-    def setup(self):
-        self.name = "educate-app-instance"
-        self.public_instance = DTEc2(
-            name=f"{self.name}-public",
-            app_vpc_id="vpc-0d905953c8537847c",
-            app_subnet_id="subnet-0d06af077da3e1c6f",
-            iam_instance_profile="educate-app-role-de9eb13",
+    @classmethod
+    def setup_class(cls):
+        cls.name = "educate-app-instance"
+        cls.public_instance = DTEc2(
+            DTEducateConfig(
+                name=f"{cls.name}-public",
+                app_vpc_id=pulumi.Output.from_input("vpc-0d905953c8537847c"),
+                app_subnet_id=pulumi.Output.from_input("subnet-0d06af077da3e1c6f"),
+                iam_instance_profile_id=pulumi.Output.from_input(
+                    "educate-app-role-de9eb13"
+                ),
+                security_group_id=pulumi.Output.from_input("sg-0123456789"),
+                instance_type="t3a.large",
+                commands="sudo ./version.py > versions.log",
+                attach_user_data=True,
+            )
         )
 
     @pulumi.runtime.test
@@ -33,3 +42,14 @@ class TestEducateApp(object):
             assert instance_id is not None
 
         return pulumi.Output.all(self.public_instance.get_instance_id()).apply(check_id)
+
+    def test_user_data_runs_the_boot_script_then_the_commands(self):
+        document = gzip.decompress(self.public_instance.user_data.payload).decode()
+        assert document.index("sudo locale-gen") < document.index("> versions.log")
+
+    @pulumi.runtime.test
+    def test_user_data_is_attached(self):
+        def check_user_data(user_data):
+            assert user_data == self.public_instance.user_data.base64()
+
+        return self.public_instance._instance.user_data_base64.apply(check_user_data)
@@ -0,0 +1,122 @@
+import pulumi
+import pytest
+from pydantic import ValidationError
+
+from educate_infrastructure.applications.educate.load_balancer import (
+    DTLoadBalancer,
+    DTLoadBalancerConfig,
+    DTTargetGroupConfig,
+)
+from educate_infrastructure.lib.monitoring import DTMonitoringConfig, attach_monitoring
+
+
+def lb_config(target_groups):
+    return DTLoadBalancerConfig(
+        name="educate-test",
+        vpc_id=pulumi.Output.from_input("vpc-0123456789"),
+        subnet_ids=pulumi.Output.from_input(["subnet-0d06af077da3e1c6f"]),
+        security_group_ids=[pulumi.Output.from_input("sg-0123456789")],
+        certificate_arn="arn:aws:acm:eu-west-2:0:certificate/test",
+        target_groups=target_groups,
+    )
+
+
+class TestDTLoadBalancer(object):
+    @classmethod
+    def setup_class(cls):
+        cls.lb = DTLoadBalancer(
+            lb_config(
+                [
+                    DTTargetGroupConfig(name="lms", hosts=["learn.diceytech.co.uk"]),
+                    DTTargetGroupConfig(
+                        name="studio",
+                        hosts=["studio.diceytech.co.uk"],
+                        slow_start=60,
+                        stickiness_duration=3600,
+                    ),
+                ]
+            )
+        )
+
+    @pulumi.runtime.test
+    def test_default_action_forwards_to_first_group(self):
+        def check_default(args):
+            actions, lms_arn = args
+            assert actions[0]["target_group_arn"] == lms_arn
+
+        return pulumi.Output.all(
+            self.lb.https_listener.default_actions,
+            self.lb.get_target_group("lms").arn,
+        ).apply(check_default)
+
+    @pulumi.runtime.test
+    def test_rule_routes_to_studio(self):
+        rule = self.lb.rules[0]
+
+        def check_rule(args):
+            priority, actions, studio_arn = args
+            assert priority == 10
+            assert actions[0]["target_group_arn"] == studio_arn
+
+        return pulumi.Output.all(
+            rule.priority,
+            rule.actions,
+            self.lb.get_target_group("studio").arn,
+        ).apply(check_rule)
+
+    @pulumi.runtime.test
+    def test_target_group_settings(self):
+        studio = self.lb.get_target_group("studio")
+
+        def check_settings(args):
+            slow_start, stickiness, health_check = args
+            assert slow_start == 60
+            assert stickiness["cookie_duration"] == 3600
+            assert health_check["path"] == "/heartbeat"
+
+        return pulumi.Output.all(
+            studio.slow_start, studio.stickiness, studio.health_check
+        ).apply(check_settings)
+
+    @pulumi.runtime.test
+    def test_http2_enabled(self):
+        def check_http2(enabled):
+            assert enabled
+
+        return self.lb.load_balancer.enable_http2.apply(check_http2)
+
+    @pulumi.runtime.test
+    def test_monitoring_alarms_on_response_time_percentiles(self):
+        monitoring = attach_monitoring(
+            self.lb,
+            DTMonitoringConfig(name="educate-test", thresholds={"requests": 1e5}),
+        )
+        alarm = monitoring.alarms["response_time_p99"]
+
+        def check_alarm(args):
+            extended_statistic, dimensions = args
+            assert extended_statistic == "p99"
+            assert dimensions == {
+                "LoadBalancer": "app/educate-test-alb/0123456789abcdef"
+            }
+
+        assert sorted(monitoring.alarms) == [
+            "elb_5xx",
+            "requests",
+            "response_time_p95",
+            "response_time_p99",
+            "target_5xx",
+        ]
+        return pulumi.Output.all(alarm.extended_statistic, alarm.dimensions).apply(
+            check_alarm
+        )
+
+    def test_routes_need_a_condition(self):
+        with pytest.raises(ValidationError):
+            lb_config(
+                [DTTargetGroupConfig(name="lms"), DTTargetGroupConfig(name="cms")]
+            )
+
+    def test_slow_start_range(self):
+        with pytest.raises(ValidationError):
+            DTTargetGroupConfig(name="lms", slow_start=10)
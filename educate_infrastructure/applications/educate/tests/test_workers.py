@@ -0,0 +1,151 @@
+import base64
+import gzip
+
+import pulumi
+import pytest
+from pydantic import ValidationError
+
+from educate_infrastructure.applications.educate.ec2 import EDUCATE_AMI_ID
+from educate_infrastructure.applications.educate.workers import (
+    DTCeleryWorkerConfig,
+    DTCeleryWorkerFleet,
+    DTWorkerScalingStep,
+)
+
+AUTH_SECRET_ARN = "arn:aws:secretsmanager:eu-west-2:000000000000:secret:educate-cache"
+
+
+def worker_config(**overrides) -> DTCeleryWorkerConfig:
+    return DTCeleryWorkerConfig(
+        **{
+            "name": "educate-workers-test",
+            "vpc_id": pulumi.Output.from_input("vpc-0123456789"),
+            "app_subnet_ids": pulumi.Output.from_input(["subnet-0d06af077da3e1c6f"]),
+            "iam_instance_profile_id": pulumi.Output.from_input("educate-profile"),
+            "broker_host": pulumi.Output.from_input(
+                "master.educate-cache-test.euw2.cache.amazonaws.com"
+            ),
+            "broker_auth_secret_arn": pulumi.Output.from_input(AUTH_SECRET_ARN),
+            **overrides,
+        }
+    )
+
+
+class TestCeleryWorkerFleet(object):
+    @classmethod
+    def setup_class(cls):
+        cls.workers = DTCeleryWorkerFleet(
+            worker_config(user_data="#!/bin/bash\necho workers", max_size=8)
+        )
+
+    @pulumi.runtime.test
+    def test_fleet_mixes_spot_instances(self):
+        def check_policy(policy):
+            distribution = policy["instances_distribution"]
+            assert distribution["on_demand_base_capacity"] == 1
+            assert distribution["on_demand_percentage_above_base_capacity"] == 0
+            assert distribution["spot_allocation_strategy"] == "capacity-optimized"
+            assert [
+                override["instance_type"]
+                for override in policy["launch_template"]["overrides"]
+            ] == ["t3a.large", "t3.large", "m5a.large", "m5.large"]
+
+        return self.workers.asg.mixed_instances_policy.apply(check_policy)
+
+    @pulumi.runtime.test
+    def test_workers_are_drained_before_termination(self):
+        def check_hooks(hooks):
+            assert hooks[0]["lifecycle_transition"] == (
+                "autoscaling:EC2_INSTANCE_TERMINATING"
+            )
+            assert hooks[0]["heartbeat_timeout"] == 900
+
+        return self.workers.asg.initial_lifecycle_hooks.apply(check_hooks)
+
+    @pulumi.runtime.test
+    def test_scale_out_steps_are_relative_to_threshold(self):
+        def check_steps(steps):
+            assert [
+                (
+                    step["metric_interval_lower_bound"],
+                    step.get("metric_interval_upper_bound"),
+                    step["scaling_adjustment"],
+                )
+                for step in steps
+            ] == [("0", "80", 1), ("80", "480", 2), ("480", None, 4)]
+
+        return self.workers.scale_out_policy.step_adjustments.apply(check_steps)
+
+    @pulumi.runtime.test
+    def test_alarms_watch_queue_depth(self):
+        def check_alarms(args):
+            out_threshold, in_threshold, in_periods, dimensions = args
+            assert (out_threshold, in_threshold, in_periods) == (20, 0, 15)
+            assert dimensions == {"Fleet": "educate-workers-test"}
+
+        return pulumi.Output.all(
+            self.workers.scale_out_alarm.threshold,
+            self.workers.scale_in_alarm.threshold,
+            self.workers.scale_in_alarm.evaluation_periods,
+            self.workers.scale_out_alarm.dimensions,
+        ).apply(check_alarms)
+
+    @pulumi.runtime.test
+    def test_launch_template_reads_the_broker_endpoint(self):
+        def check_user_data(user_data):
+            content = gzip.decompress(base64.b64decode(user_data)).decode()
+            assert "-h master.educate-cache-test.euw2.cache.amazonaws.com" in content
+
+        return self.workers.launch_template.user_data.apply(check_user_data)
+
+    @pulumi.runtime.test
+    def test_missing_queue_depth_raises_an_alarm(self):
+        def check_alarm(args):
+            statistic, treat_missing_data = args
+            assert (statistic, treat_missing_data) == ("SampleCount", "breaching")
+
+        return pulumi.Output.all(
+            self.workers.missing_depth_alarm.statistic,
+            self.workers.missing_depth_alarm.treat_missing_data,
+        ).apply(check_alarm)
+
+    @pulumi.runtime.test
+    def test_fleet_uses_the_educate_image(self):
+        def check_image(image_id):
+            assert image_id == EDUCATE_AMI_ID
+
+        return self.workers.launch_template.image_id.apply(check_image)
+
+    def test_user_data_publishes_queue_depth(self):
+        content = gzip.decompress(
+            self.workers.build_user_data(
+                worker_config(), "educate-cache.diceytech.internal", AUTH_SECRET_ARN
+            ).payload
+        ).decode()
+        assert "redis-cli -h educate-cache.diceytech.internal -p 6379 --tls" in content
+        assert f'--secret-id "{AUTH_SECRET_ARN}"' in content
+        # A failed read publishes nothing rather than an empty queue
+        assert "|| echo 0" not in content
+        assert "Fleet=educate-workers-test" in content
+        assert '--lifecycle-hook-name "educate-workers-test-drain"' in content
+
+
+def test_scale_out_steps_must_increase():
+    with pytest.raises(ValidationError):
+        worker_config(
+            scale_out_steps=[
+                DTWorkerScalingStep(queue_depth=100, adjustment=2),
+                DTWorkerScalingStep(queue_depth=20, adjustment=1),
+            ]
+        )
+
+
+def test_scale_in_must_be_below_scale_out():
+    with pytest.raises(ValidationError):
+        worker_config(scale_in_queue_depth=20)
+
+
+def test_other_images_need_a_boot_script():
+    worker_config(ami_id="ami-0123456789", user_data="#!/bin/bash\necho workers")
+    with pytest.raises(ValidationError):
+        worker_config(ami_id=None)
@@ -0,0 +1,416 @@
+"""
+This module defines a Pulumi component resource for encapsulating our best practices for
+running the Educate Celery workers on their own fleet, so that long running tasks such as
+report generation do not compete with the learner facing instances.
+
+This includes:
+- Create a security group for the workers, which accept no inbound traffic
+- Create a launch template whose user data publishes the depth of the Celery queues to
+  CloudWatch, reading the broker over TLS with its AUTH token from Secrets Manager, and
+  drains a worker before it is terminated
+- Create an Auto Scaling Group mixing On-Demand and Spot instances of several types
+- Create step scaling policies driven by alarms on the queue depth, and an alarm when
+  the depth is no longer published
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Text
+
+from pulumi import Output, ResourceOptions, info
+from pulumi_aws import autoscaling, cloudwatch, ec2
+from pydantic import BaseModel, PositiveInt, conint, validator
+
+from educate_infrastructure.applications.educate.ec2 import EDUCATE_AMI_ID
+from educate_infrastructure.lib.component import DTComponent
+from educate_infrastructure.lib.user_data import (
+    DTUserData,
+    DTUserDataPart,
+    build_user_data,
+    load_template,
+)
+
+QUEUE_DEPTH_SCRIPT = Path(__file__).parent / "queue_depth.sh"
+DRAIN_WORKER_SCRIPT = Path(__file__).parent / "drain_worker.sh"
+
+QUEUE_DEPTH_NAMESPACE = "Educate/Celery"
+QUEUE_DEPTH_METRIC = "QueueDepth"
+
+
+class DTWorkerScalingStep(BaseModel):
+    """Instances to add once the queues hold at least `queue_depth` messages."""
+
+    queue_depth: conint(ge=0)  # type: ignore
+    adjustment: PositiveInt
+
+
+class DTCeleryWorkerConfig(BaseModel):
+    """
+    Configuration object for defining configuration needed to create a fleet of Celery
+    workers for Educate.
+    """
+
+    name: Text
+    vpc_id: Output
+    app_subnet_ids: Output
+    iam_instance_profile_id: Output
+    # The first type is the preferred one, the others widen the Spot capacity pools
+    instance_types: List[Text] = ["t3a.large", "t3.large", "m5a.large", "m5.large"]
+    # The Educate image already holds the workers, any other image needs user_data
+    ami_id: Optional[Text] = EDUCATE_AMI_ID
+    volume_size: Optional[PositiveInt] = 50
+    user_data: Optional[Text]  # Boot script starting the workers
+    broker_host: Output  # The cache_primary_endpoint of the databases stack
+    broker_port: PositiveInt = 6379
+    broker_tls: bool = True
+    # Secrets Manager secret holding the broker AUTH token
+    broker_auth_secret_arn: Optional[Output] = None
+    queues: List[Text] = [
+        "edx.lms.core.default",
+        "edx.lms.core.high",
+        "edx.lms.core.high_mem",
+        "edx.cms.core.default",
+        "edx.cms.core.high",
+    ]
+    # Warm shutdown of the workers, run once the instance is being terminated
+    stop_command: Text = "/edx/bin/supervisorctl stop edxapp_worker:"
+    drain_timeout: conint(ge=30, le=7200) = 900  # type: ignore
+    # The workers publish the queue depth, keep one of them running
+    min_size: PositiveInt = 1
+    max_size: PositiveInt = 6
+    on_demand_base_capacity: conint(ge=0) = 1  # type: ignore
+    on_demand_percentage_above_base_capacity: conint(ge=0, le=100) = 0  # type: ignore
+    spot_allocation_strategy: Text = "capacity-optimized"
+    instance_warmup: PositiveInt = 300
+    # Queue depths adding instances, the first one is the scale out alarm threshold
+    scale_out_steps: List[DTWorkerScalingStep] = [
+        DTWorkerScalingStep(queue_depth=20, adjustment=1),
+        DTWorkerScalingStep(queue_depth=100, adjustment=2),
+        DTWorkerScalingStep(queue_depth=500, adjustment=4),
+    ]
+    scale_out_evaluation_periods: PositiveInt = 2  # Minutes
+    # Remove an instance once the queues stay at or below this depth
+    scale_in_queue_depth: conint(ge=0) = 0  # type: ignore
+    scale_in_evaluation_periods: PositiveInt = 15  # Minutes
+    # Notified when no worker publishes the queue depth
+    alarm_actions: List[Text] = []
+    missing_depth_evaluation_periods: PositiveInt = 10  # Minutes
+    tags: Dict = {"pulumi_managed": "true"}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @validator("instance_types")
+    def at_least_one_instance_type(cls, instance_types):
+        if not instance_types:
+            raise ValueError("At least one instance type is needed")
+        return instance_types
+
+    @validator("user_data", always=True)
+    def image_or_boot_script(cls, user_data, values):
+        if not values.get("ami_id") and not user_data:
+            raise ValueError("Workers need either an ami_id or a user_data boot script")
+        return user_data
+
+    @validator("scale_out_steps")
+    def increasing_steps(cls, steps):
+        if not steps:
+            raise ValueError("At least one scale out step is needed")
+        depths = [step.queue_depth for step in steps]
+        if depths != sorted(set(depths)):
+            raise ValueError("Scale out steps must have increasing queue depths")
+        return steps
+
+    @validator("scale_in_queue_depth")
+    def scale_in_below_scale_out(cls, scale_in_queue_depth, values):
+        steps = values.get("scale_out_steps")
+        if steps and scale_in_queue_depth >= steps[0].queue_depth:
+            raise ValueError(
+                "Scale in queue depth must be below the first scale out step"
+            )
+        return scale_in_queue_depth
+
+
+class DTCeleryWorkerFleet(DTComponent):
+    """Pulumi component for building an Auto Scaling Group of Celery workers.
+
+    A component resource that encapsulates all of the standard practices of how the Dicey Tech
+    Engineering team runs and scales the Educate background workers in AWS.
+    """
+
+    def __init__(
+        self, worker_config: DTCeleryWorkerConfig, opts: ResourceOptions = None
+    ):
+        """
+        Build a Celery worker fleet.
+
+        :param worker_config: Config object for customizing the created worker fleet
+            and associated resources.
+        :type DTCeleryWorkerConfig
+
+        :param opts: Optional resource options to be merged into the defaults.  Useful
+            for handling things like AWS provider overrides.
+        :type opts: Optional[ResourceOptions]
+        """
+        self.name = worker_config.name
+        self.tags = {**worker_config.tags, "Name": self.name}
+        self.lifecycle_hook_name = f"{self.name}-drain"
+        super().__init__(
+            "diceytech:infrastructure:aws:CeleryWorkerFleet", self.name, opts
+        )
+
+        self.security_group = ec2.SecurityGroup(
+            f"{self.name}-sg",
+            vpc_id=worker_config.vpc_id,
+            description="Celery workers, outbound access only",
+            egress=[
+                ec2.SecurityGroupEgressArgs(
+                    protocol="-1",
+                    from_port=0,
+                    to_port=0,
+                    cidr_blocks=["0.0.0.0/0"],
+                )
+            ],
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.user_data = Output.all(
+            worker_config.broker_host, worker_config.broker_auth_secret_arn
+        ).apply(lambda args: self.build_user_data(worker_config, *args))
+
+        self.launch_template = ec2.LaunchTemplate(
+            f"{self.name}-lt",
+            name_prefix=f"{self.name}-",
+            image_id=worker_config.ami_id,
+            instance_type=worker_config.instance_types[0],
+            iam_instance_profile=ec2.LaunchTemplateIamInstanceProfileArgs(
+                name=worker_config.iam_instance_profile_id,
+            ),
+            vpc_security_group_ids=[self.security_group.id],
+            user_data=self.user_data.apply(lambda user_data: user_data.base64()),
+            block_device_mappings=[
+                ec2.LaunchTemplateBlockDeviceMappingArgs(
+                    device_name="/dev/sda1",
+                    ebs=ec2.LaunchTemplateBlockDeviceMappingEbsArgs(
+                        delete_on_termination="true",
+                        volume_size=worker_config.volume_size,
+                        encrypted="true",
+                    ),
+                )
+            ],
+            tag_specifications=[
+                ec2.LaunchTemplateTagSpecificationArgs(
+                    resource_type="instance", tags=self.tags
+                ),
+                ec2.LaunchTemplateTagSpecificationArgs(
+                    resource_type="volume", tags=self.tags
+                ),
+            ],
+            update_default_version=True,
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.asg = autoscaling.Group(
+            f"{self.name}-asg",
+            vpc_zone_identifiers=worker_config.app_subnet_ids,
+            min_size=worker_config.min_size,
+            max_size=worker_config.max_size,
+            mixed_instances_policy=autoscaling.GroupMixedInstancesPolicyArgs(
+                instances_distribution=autoscaling.GroupMixedInstancesPolicyInstancesDistributionArgs(
+                    on_demand_base_capacity=worker_config.on_demand_base_capacity,
+                    on_demand_percentage_above_base_capacity=worker_config.on_demand_percentage_above_base_capacity,
+                    spot_allocation_strategy=worker_config.spot_allocation_strategy,
+                ),
+                launch_template=autoscaling.GroupMixedInstancesPolicyLaunchTemplateArgs(
+                    launch_template_specification=autoscaling.GroupMixedInstancesPolicyLaunchTemplateLaunchTemplateSpecificationArgs(
+                        launch_template_id=self.launch_template.id,
+                        version=self.launch_template.latest_version.apply(str),
+                    ),
+                    overrides=[
+                        autoscaling.GroupMixedInstancesPolicyLaunchTemplateOverrideArgs(
+                            instance_type=instance_type
+                        )
+                        for instance_type in worker_config.instance_types
+                    ],
+                ),
+            ),
+            # Replace Spot instances at risk of interruption before they are reclaimed
+            capacity_rebalance=True,
+            initial_lifecycle_hooks=[
+                autoscaling.GroupInitialLifecycleHookArgs(
+                    name=self.lifecycle_hook_name,
+                    lifecycle_transition="autoscaling:EC2_INSTANCE_TERMINATING",
+                    heartbeat_timeout=worker_config.drain_timeout,
+                    default_result="CONTINUE",
+                )
+            ],
+            health_check_type="EC2",
+            tags=[
+                autoscaling.GroupTagArgs(key=key, value=value, propagate_at_launch=True)
+                for key, value in self.tags.items()
+            ],
+            # The scaling policies own the capacity once the group exists
+            opts=ResourceOptions(parent=self, ignore_changes=["desired_capacity"]),
+        )
+
+        threshold = worker_config.scale_out_steps[0].queue_depth
+        bounds = [
+            step.queue_depth - threshold for step in worker_config.scale_out_steps
+        ]
+        self.scale_out_policy = self.add_step_scaling_policy(
+            "scale-out",
+            [
+                autoscaling.PolicyStepAdjustmentArgs(
+                    scaling_adjustment=step.adjustment,
+                    metric_interval_lower_bound=str(lower_bound),
+                    metric_interval_upper_bound=(
+                        str(upper_bound) if upper_bound is not None else None
+                    ),
+                )
+                for step, lower_bound, upper_bound in zip(
+                    worker_config.scale_out_steps, bounds, [*bounds[1:], None]
+                )
+            ],
+            worker_config.instance_warmup,
+        )
+        self.scale_in_policy = self.add_step_scaling_policy(
+            "scale-in",
+            [
+                autoscaling.PolicyStepAdjustmentArgs(
+                    scaling_adjustment=-1,
+                    metric_interval_upper_bound="0",
+                )
+            ],
+        )
+
+        self.scale_out_alarm = self.add_queue_depth_alarm(
+            "scale-out",
+            "GreaterThanOrEqualToThreshold",
+            threshold,
+            worker_config.scale_out_evaluation_periods,
+            self.scale_out_policy,
+        )
+        self.scale_in_alarm = self.add_queue_depth_alarm(
+            "scale-in",
+            "LessThanOrEqualToThreshold",
+            worker_config.scale_in_queue_depth,
+            worker_config.scale_in_evaluation_periods,
+            self.scale_in_policy,
+        )
+
+        # The workers publish nothing when they can not read the broker
+        self.missing_depth_alarm = cloudwatch.MetricAlarm(
+            f"{self.name}-missing-depth-alarm",
+            alarm_description=f"Celery queue depth of {self.name} is not published",
+            namespace=QUEUE_DEPTH_NAMESPACE,
+            metric_name=QUEUE_DEPTH_METRIC,
+            dimensions={"Fleet": self.name},
+            statistic="SampleCount",
+            period=60,
+            evaluation_periods=worker_config.missing_depth_evaluation_periods,
+            comparison_operator="LessThanThreshold",
+            threshold=1,
+            treat_missing_data="breaching",
+            alarm_actions=worker_config.alarm_actions,
+            ok_actions=worker_config.alarm_actions,
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.register_outputs(
+            {
+                "asg_name": self.asg.name,
+                "launch_template_id": self.launch_template.id,
+                "security_group_id": self.security_group.id,
+            }
+        )
+
+        info(msg=f"{self.name} created.", resource=self)
+
+    def build_user_data(
+        self,
+        worker_config: DTCeleryWorkerConfig,
+        broker_host: Text,
+        auth_secret_arn: Optional[Text] = None,
+    ) -> DTUserData:
+        parts = []
+        if worker_config.user_data:
+            parts.append(
+                DTUserDataPart(filename="workers.sh", template=worker_config.user_data)
+            )
+        parts.append(
+            DTUserDataPart(
+                filename="queue_depth.sh",
+                template=load_template(QUEUE_DEPTH_SCRIPT),
+                variables={
+                    "queues": " ".join(worker_config.queues),
+                    "broker_host": broker_host,
+                    "broker_port": worker_config.broker_port,
+                    "tls_flag": "--tls" if worker_config.broker_tls else "",
+                    "auth_secret_arn": auth_secret_arn or "",
+                    "namespace": QUEUE_DEPTH_NAMESPACE,
+                    "metric_name": QUEUE_DEPTH_METRIC,
+                    "fleet": self.name,
+                },
+            )
+        )
+        parts.append(
+            DTUserDataPart(
+                filename="drain_worker.sh",
+                template=load_template(DRAIN_WORKER_SCRIPT),
+                variables={
+                    "stop_command": worker_config.stop_command,
+                    "lifecycle_hook": self.lifecycle_hook_name,
+                },
+            )
+        )
+        return build_user_data(parts)
+
+    def add_step_scaling_policy(
+        self,
+        suffix: Text,
+        step_adjustments: List[autoscaling.PolicyStepAdjustmentArgs],
+        instance_warmup: Optional[int] = None,
+    ) -> autoscaling.Policy:
+        return autoscaling.Policy(
+            f"{self.name}-{suffix}-policy",
+            autoscaling_group_name=self.asg.name,
+            policy_type="StepScaling",
+            adjustment_type="ChangeInCapacity",
+            metric_aggregation_type="Maximum",
+            estimated_instance_warmup=instance_warmup,
+            step_adjustments=step_adjustments,
+            opts=ResourceOptions(parent=self),
+        )
+
+    def add_queue_depth_alarm(
+        self,
+        suffix: Text,
+        comparison_operator: Text,
+        threshold: int,
+        evaluation_periods: int,
+        policy: autoscaling.Policy,
+    ) -> cloudwatch.MetricAlarm:
+        return cloudwatch.MetricAlarm(
+            f"{self.name}-{suffix}-alarm",
+            alarm_description=f"Celery queue depth of {self.name}, {suffix}",
+            namespace=QUEUE_DEPTH_NAMESPACE,
+            metric_name=QUEUE_DEPTH_METRIC,
+            dimensions={"Fleet": self.name},
+            statistic="Maximum",
+            period=60,
+            evaluation_periods=evaluation_periods,
+            comparison_operator=comparison_operator,
+            threshold=threshold,
+            # Hold the capacity when the depth is not published
+            treat_missing_data="notBreaching",
+            alarm_actions=[policy.arn],
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+    def get_asg_name(self) -> Text:
+        return self.asg.name
+
+    def get_security_group_id(self) -> Text:
+        return self.security_group.id
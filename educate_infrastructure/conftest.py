@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from educate_infrastructure.lib.testing import use_mock_engine
+
+
+@pytest.fixture(scope="session", autouse=True)
+def pulumi_mocks():
+    """The Pulumi mock engine shared by every test of the session."""
+    engine = use_mock_engine()
+    yield engine
+    if os.environ.get("DT_MOCK_RECORD"):
+        engine.dump_unmatched(os.environ["DT_MOCK_RECORD"])
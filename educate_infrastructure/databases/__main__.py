@@ -1,26 +1,67 @@
-"""Manage the creation of an RDS instance
+"""Manage the creation of an RDS instance, an ElastiCache cache
 and a MongoDB instance deployed in an EC2 instance.
 
 
 """
-from pulumi import Config, get_stack, export, get_project, StackReference
+from pulumi import Config, get_stack, export, get_project
 from pulumi_aws import ec2
 
 from educate_infrastructure.lib.dt_types import AWSBase
-from educate_infrastructure.databases.database import DTAuroraConfig, DTAuroraCluster
-from educate_infrastructure.databases.mongodb import DTMongoDBConfig, DTMongoDB
-
+from educate_infrastructure.databases.cache import DTCache, DTCacheConfig
+from educate_infrastructure.databases.database import (
+    DTAuroraConfig,
+    DTAuroraCluster,
+    DTAuroraReaderScalingConfig,
+    DTAuroraServerlessConfig,
+    DTReaderScalingMetric,
+)
+from educate_infrastructure.databases.mongodb import (
+    DTMongoDBConfig,
+    DTMongoDB,
+    DTMongoDBStorageConfig,
+    STORAGE_PROFILES,
+)
+from educate_infrastructure.databases.proxy import DTRDSProxy, DTRDSProxyConfig
+from educate_infrastructure.lib.component import export_component_report
+from educate_infrastructure.lib.monitoring import (
+    attach_monitoring,
+    stack_monitoring_config,
+)
+from educate_infrastructure.lib.stack_references import networking_outputs
 
 env = get_stack()
 proj = get_project()
 
-network_stack = StackReference("BbrSofiane/networking/prod")
+networking = networking_outputs()
+
+sql_config = Config("sql")
+snapshot = sql_config.get("snapshot")
+
+reader_scaling = None
+if sql_config.get_int("reader_max_capacity"):
+    reader_scaling = DTAuroraReaderScalingConfig(
+        min_capacity=sql_config.get_int("reader_min_capacity") or 0,
+        max_capacity=sql_config.get_int("reader_max_capacity"),
+        metric=DTReaderScalingMetric[sql_config.get("reader_scaling_metric") or "cpu"],
+        target_value=sql_config.get_float("reader_scaling_target") or 60,
+    )
 
-snapshot = Config("sql").get("snapshot")
+# Serverless v2 capacity range, the instances keep a fixed size when unset
+serverless = None
+if sql_config.get_float("serverless_max_capacity"):
+    serverless = DTAuroraServerlessConfig(
+        min_capacity=sql_config.get_float("serverless_min_capacity") or 0.5,
+        max_capacity=sql_config.get_float("serverless_max_capacity"),
+    )
 
-db_vpc_id = network_stack.get_output("apps_vpc_id")
-db_private_subnet_ids = network_stack.get_output("apps_private_subnet_ids")
-db_subnet_group_name = network_stack.get_output("db_subnet_group_name")
+# Serverless v2 runs on Aurora MySQL 3, the parameter group family follows the version
+engine_overrides = {}
+if sql_config.get("engine_version"):
+    engine_overrides["engine_version"] = sql_config.get("engine_version")
+
+db_vpc_id = networking.apps_vpc_id
+db_private_subnet_ids = networking.apps_private_subnet_ids
+db_subnet_group_name = networking.db_subnet_group_name
 
 mysql_db_sg = ec2.SecurityGroup(
     f"mysql-db-sg-{env}",
@@ -37,6 +78,8 @@ mysql_db_sg = ec2.SecurityGroup(
     vpc_id=db_vpc_id,
 )
 
+instance_count = sql_config.get_int("instance_count") or 1
+
 aurora_cluster_config = DTAuroraConfig(
     instance_name=f"educate-sql-db-{env}",
     subnet_group_name=db_subnet_group_name,
@@ -45,20 +88,161 @@ aurora_cluster_config = DTAuroraConfig(
     snapshot_identifier=snapshot,
     prevent_delete=True,  # For testing
     multi_az=False,
+    instance_count=instance_count,
+    availability_zones=sql_config.get_object("availability_zones"),
+    reader_scaling=reader_scaling,
+    serverless=serverless,
+    tuning_profile=sql_config.get("tuning_profile") or "oltp",
+    parameter_overrides=sql_config.get_object("parameter_overrides") or [],
+    cluster_parameter_overrides=sql_config.get_object("cluster_parameter_overrides") or [],
+    **engine_overrides,
 )
 
 aurora_cluster = DTAuroraCluster(db_config=aurora_cluster_config)
+aurora_monitoring = attach_monitoring(
+    aurora_cluster, stack_monitoring_config(f"educate-sql-db-{env}", "aurora")
+)
+
+# Pool the LMS, CMS and worker connections when the proxy credentials are configured
+proxy_password = sql_config.get_secret("proxy_password")
+if proxy_password:
+    # SecurityGroup drops the default egress rule, so the proxy only reaches the cluster
+    mysql_proxy_sg = ec2.SecurityGroup(
+        f"mysql-proxy-sg-{env}",
+        description="Access from the Educate App instances to the MySQL proxy",
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol="tcp",
+                from_port=3306,
+                to_port=3306,
+                cidr_blocks=["0.0.0.0/0"],
+                description="MySQL access from Educate App instances",
+            ),
+        ],
+        egress=[
+            ec2.SecurityGroupEgressArgs(
+                protocol="tcp",
+                from_port=3306,
+                to_port=3306,
+                security_groups=[mysql_db_sg.id],
+                description="MySQL access from the proxy to the cluster",
+            ),
+        ],
+        vpc_id=db_vpc_id,
+    )
+
+    ec2.SecurityGroupRule(
+        f"mysql-db-sg-{env}-from-proxy",
+        type="ingress",
+        protocol="tcp",
+        from_port=3306,
+        to_port=3306,
+        security_group_id=mysql_db_sg.id,
+        source_security_group_id=mysql_proxy_sg.id,
+        description="MySQL access from the proxy",
+    )
+
+    # The read-only endpoint needs replicas to route to
+    has_replicas = instance_count > 1 or bool(
+        reader_scaling and reader_scaling.max_capacity
+    )
+
+    proxy_config = DTRDSProxyConfig(
+        name=f"educate-sql-proxy-{env}",
+        database=aurora_cluster,
+        username=sql_config.get("proxy_username") or "dtdevops",
+        password=proxy_password,
+        subnet_ids=db_private_subnet_ids,
+        security_groups=[mysql_proxy_sg],
+        reader_endpoint=has_replicas,
+    )
+
+    aurora_proxy = DTRDSProxy(proxy_config)
+
+    export("mysql_proxy_endpoint", aurora_proxy.get_endpoint())
+    if has_replicas:
+        export("mysql_proxy_reader_endpoint", aurora_proxy.get_reader_endpoint())
+
+# Open edX cache and Celery broker, kept off the application instances
+cache_stack_config = Config("cache")
+cache = None
+if cache_stack_config.get_bool("enabled"):
+    # Reachable from the application VPC only, over TLS with the AUTH token
+    cache_sg = ec2.SecurityGroup(
+        f"cache-sg-{env}",
+        description="Access from the application VPC to the ElastiCache cache",
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol="tcp",
+                from_port=6379,
+                to_port=6379,
+                cidr_blocks=[networking.apps_vpc_cidr_block],
+                description="Redis access from Educate App and worker instances",
+            ),
+        ],
+        vpc_id=db_vpc_id,
+    )
+
+    cache_config = DTCacheConfig(
+        name=f"educate-cache-{env}",
+        subnet_ids=db_private_subnet_ids,
+        security_groups=[cache_sg],
+        tags={"pulumi_managed": "True"},
+        node_type=cache_stack_config.get("node_type") or "cache.t3.small",
+        num_node_groups=cache_stack_config.get_int("num_node_groups") or 1,
+        replicas_per_node_group=cache_stack_config.get_int("replicas_per_node_group")
+        or 1,
+        auth_token=cache_stack_config.require_secret("auth_token"),
+    )
+
+    cache = DTCache(cache_config)
+
+mongodb_stack_config = Config("mongodb")
+
+# A named profile, or a full storage definition taking precedence over it
+mongodb_storage = STORAGE_PROFILES[
+    mongodb_stack_config.get("storage_profile") or "standard"
+]
+if mongodb_stack_config.get_object("storage"):
+    mongodb_storage = DTMongoDBStorageConfig(
+        **mongodb_stack_config.get_object("storage")
+    )
 
-# TODO Provision MongoDB Instance
 mongodb_config = DTMongoDBConfig(
     name=f"educate-mongodb-{env}",
     vpc_id=db_vpc_id,
     subnet_id=db_private_subnet_ids[0],
+    ingress_cidr_blocks=[networking.apps_vpc_cidr_block],
     instance_type=ec2.InstanceType.T3A_MICRO,
+    replica_set_name=mongodb_stack_config.get("replica_set_name"),
+    member_count=mongodb_stack_config.get_int("member_count") or 1,
+    subnet_ids=db_private_subnet_ids,
+    storage=mongodb_storage,
+    commands=mongodb_stack_config.get("commands"),
+    attach_user_data=mongodb_stack_config.get_bool("attach_user_data") or False,
+    import_volume_ids=mongodb_stack_config.get_object("import_volume_ids") or {},
+    admin_password=mongodb_stack_config.get_secret("admin_password"),
+    key_file=mongodb_stack_config.get_secret("key_file"),
 )
 
 mongodb_cluster = DTMongoDB(mongodb_config)
+mongodb_monitoring = attach_monitoring(
+    mongodb_cluster, stack_monitoring_config(f"educate-mongodb-{env}", "mongodb")
+)
 
 export("mongodb_endpoint", mongodb_cluster.get_private_dns())
 export("mongodb_instance_id", mongodb_cluster.get_instance_id())
+export("mongodb_connection_string", mongodb_cluster.get_connection_string())
+if mongodb_config.admin_password is not None:
+    export(
+        "mongodb_admin_password_secret_arn",
+        mongodb_cluster.get_admin_password_secret_arn(),
+    )
 export("mysql_endpoint", aurora_cluster.get_endpoint())
+export("mysql_reader_endpoint", aurora_cluster.get_reader_endpoint())
+if cache:
+    export("cache_primary_endpoint", cache.get_primary_endpoint())
+    export("cache_reader_endpoint", cache.get_reader_endpoint())
+    export("cache_auth_token_secret_arn", cache.get_auth_token_secret_arn())
+
+export_component_report()
@@ -0,0 +1,222 @@
+"""
+This module defines a Pulumi component resource for encapsulating our best practices for
+building an ElastiCache deployment used as the Open edX cache and Celery broker.
+
+This includes:
+- Create a cache subnet group in the private subnets
+- Create a Redis replication group, optionally in cluster mode, encrypted in transit and
+  protected by an AUTH token, kept in Secrets Manager for the clients
+- Or create a Memcached cluster spread across availability zones
+"""
+from enum import Enum
+from typing import List, Optional, Text
+
+from pulumi import Output, ResourceOptions, info
+from pulumi_aws import elasticache, secretsmanager
+from pulumi_aws.ec2 import SecurityGroup
+from pydantic import PositiveInt, conint, validator
+
+from educate_infrastructure.lib.component import DTComponent
+from educate_infrastructure.lib.dt_types import AWSBase
+
+
+class DTCacheEngine(str, Enum):
+    redis = "redis"
+    memcached = "memcached"
+
+
+DEFAULT_PORTS = {DTCacheEngine.redis: 6379, DTCacheEngine.memcached: 11211}
+DEFAULT_ENGINE_VERSIONS = {
+    DTCacheEngine.redis: "6.x",
+    DTCacheEngine.memcached: "1.6.17",
+}
+
+
+class DTCacheConfig(AWSBase):
+    """Configuration object for defining the interface to create an ElastiCache deployment."""
+
+    name: Text
+    subnet_ids: Output
+    security_groups: List[SecurityGroup]
+    engine: DTCacheEngine = DTCacheEngine.redis
+    engine_version: Optional[Text] = None  # Defaults to DEFAULT_ENGINE_VERSIONS
+    node_type: Text = "cache.t3.small"
+    # Redis: shards (more than one enables cluster mode) and replicas of each shard
+    num_node_groups: PositiveInt = 1
+    replicas_per_node_group: conint(ge=0, le=5) = 1  # type: ignore
+    # Memcached: number of nodes
+    num_cache_nodes: PositiveInt = 2
+    parameter_group_name: Optional[Text] = None
+    snapshot_retention_limit: conint(ge=0, le=35) = 1  # type: ignore
+    at_rest_encryption: bool = True
+    # Redis: TLS between the clients and the nodes, required by the AUTH token
+    transit_encryption: bool = True
+    auth_token: Optional[Output[Text]] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @validator("engine_version", always=True)
+    def default_engine_version(cls, engine_version, values):
+        if engine_version is None and "engine" in values:
+            return DEFAULT_ENGINE_VERSIONS[values["engine"]]
+        return engine_version
+
+    @validator("parameter_group_name", always=True)
+    def cluster_mode_parameter_group(cls, parameter_group_name, values):
+        # Cluster mode needs a parameter group with cluster-enabled set
+        if parameter_group_name is None and values.get("num_node_groups", 1) > 1:
+            return f"default.redis{values['engine_version']}.cluster.on"
+        return parameter_group_name
+
+    @validator("auth_token")
+    def auth_token_needs_redis_tls(cls, auth_token, values):
+        if auth_token is None:
+            return auth_token
+        if values.get("engine") != DTCacheEngine.redis:
+            raise ValueError("Only Redis supports an AUTH token")
+        if not values.get("transit_encryption"):
+            raise ValueError("An AUTH token needs transit_encryption")
+        return auth_token
+
+    @property
+    def port(self) -> int:
+        return DEFAULT_PORTS[self.engine]
+
+    @property
+    def cluster_mode(self) -> bool:
+        return self.engine == DTCacheEngine.redis and self.num_node_groups > 1
+
+
+class DTCache(DTComponent):
+    """
+    Build an ElastiCache Redis replication group or Memcached cluster
+
+    """
+
+    def __init__(self, cache_config: DTCacheConfig, opts: ResourceOptions = None):
+        """Create the subnet group and the Redis or Memcached deployment.
+
+        :param cache_config: Configuration object for customizing the deployed cache.
+        :type cache_config: DTCacheConfig
+
+        :returns: The constructed component resource object.
+
+        :rtype: DTCache
+        """
+        super().__init__(
+            "diceytech:infrastructure:aws:database:DTCache",
+            cache_config.name,
+            opts,
+        )
+
+        self.config = cache_config
+
+        self.subnet_group = elasticache.SubnetGroup(
+            f"{cache_config.name}-subnet-group",
+            name=f"{cache_config.name}-subnet-group",
+            description=f"ElastiCache subnet group for {cache_config.name}",
+            subnet_ids=cache_config.subnet_ids,
+            opts=ResourceOptions(parent=self),
+        )
+
+        security_group_ids = [group.id for group in cache_config.security_groups]
+
+        # The clients, e.g. the Celery workers, read the AUTH token at boot
+        self.auth_token_secret = None
+        if cache_config.auth_token is not None:
+            self.auth_token_secret = secretsmanager.Secret(
+                f"{cache_config.name}-auth-token",
+                description=f"Redis AUTH token of {cache_config.name}",
+                tags=cache_config.tags,
+                opts=ResourceOptions(parent=self),
+            )
+            secretsmanager.SecretVersion(
+                f"{cache_config.name}-auth-token-version",
+                secret_id=self.auth_token_secret.id,
+                secret_string=Output.secret(cache_config.auth_token),
+                opts=ResourceOptions(parent=self),
+            )
+
+        self.replication_group = None
+        self.memcached_cluster = None
+        if cache_config.engine == DTCacheEngine.redis:
+            has_replicas = cache_config.replicas_per_node_group > 0
+            num_node_groups = None
+            replicas_per_node_group = None
+            num_cache_clusters = None
+            if cache_config.cluster_mode:
+                num_node_groups = cache_config.num_node_groups
+                replicas_per_node_group = cache_config.replicas_per_node_group
+            else:
+                num_cache_clusters = 1 + cache_config.replicas_per_node_group
+
+            self.replication_group = elasticache.ReplicationGroup(
+                f"{cache_config.name}-redis",
+                replication_group_id=cache_config.name,
+                description=f"Redis for {cache_config.name}",
+                engine=cache_config.engine.value,
+                engine_version=cache_config.engine_version,
+                node_type=cache_config.node_type,
+                port=cache_config.port,
+                parameter_group_name=cache_config.parameter_group_name,
+                num_node_groups=num_node_groups,
+                replicas_per_node_group=replicas_per_node_group,
+                num_cache_clusters=num_cache_clusters,
+                automatic_failover_enabled=has_replicas or cache_config.cluster_mode,
+                multi_az_enabled=has_replicas,
+                subnet_group_name=self.subnet_group.name,
+                security_group_ids=security_group_ids,
+                at_rest_encryption_enabled=cache_config.at_rest_encryption,
+                transit_encryption_enabled=cache_config.transit_encryption,
+                auth_token=cache_config.auth_token,
+                snapshot_retention_limit=cache_config.snapshot_retention_limit,
+                tags=cache_config.tags,
+                opts=ResourceOptions(parent=self),
+            )
+        else:
+            self.memcached_cluster = elasticache.Cluster(
+                f"{cache_config.name}-memcached",
+                cluster_id=cache_config.name,
+                engine=cache_config.engine.value,
+                engine_version=cache_config.engine_version,
+                node_type=cache_config.node_type,
+                port=cache_config.port,
+                parameter_group_name=cache_config.parameter_group_name,
+                num_cache_nodes=cache_config.num_cache_nodes,
+                az_mode="cross-az" if cache_config.num_cache_nodes > 1 else None,
+                subnet_group_name=self.subnet_group.name,
+                security_group_ids=security_group_ids,
+                tags=cache_config.tags,
+                opts=ResourceOptions(parent=self),
+            )
+
+        self.register_outputs(
+            {
+                "primary_endpoint": self.get_primary_endpoint(),
+                "reader_endpoint": self.get_reader_endpoint(),
+            }
+        )
+
+        info(msg=f"{cache_config.name} created.", resource=self)
+
+    def get_primary_endpoint(self) -> Output:
+        """Endpoint receiving writes, the configuration endpoint in cluster mode."""
+        if self.memcached_cluster:
+            return self.memcached_cluster.configuration_endpoint
+        if self.config.cluster_mode:
+            return self.replication_group.configuration_endpoint_address
+        return self.replication_group.primary_endpoint_address
+
+    def get_reader_endpoint(self) -> Output:
+        """Endpoint balancing reads across the replicas."""
+        if self.replication_group and not self.config.cluster_mode:
+            return self.replication_group.reader_endpoint_address
+        return self.get_primary_endpoint()
+
+    def get_auth_token_secret_arn(self) -> Optional[Output]:
+        if self.auth_token_secret:
+            return self.auth_token_secret.arn
+
+    def get_port(self) -> int:
+        return self.config.port
@@ -1,15 +1,74 @@
-""" RDS """
-from typing import Dict, List, Optional, Text, Union
+"""RDS"""
+from enum import Enum
+from typing import Dict, List, Optional, Text, Tuple, Union
 
-from pulumi import ComponentResource, Output, ResourceOptions, info, Alias
-from pulumi_aws import rds
+from pulumi import Output, ResourceOptions, info, Alias
+from pulumi_aws import appautoscaling, rds
 from pulumi_aws.ec2 import SecurityGroup
-from pydantic import BaseModel, PositiveInt, SecretStr, conint
-
+from pydantic import (
+    BaseModel,
+    PositiveFloat,
+    PositiveInt,
+    SecretStr,
+    confloat,
+    conint,
+    validator,
+)
+
+from educate_infrastructure.databases.parameters import (
+    SERVERLESS_INSTANCE_CLASS,
+    DTTuningProfile,
+    ParameterValue,
+    cluster_parameters,
+    instance_parameters,
+)
+from educate_infrastructure.lib.component import DTComponent
 from educate_infrastructure.lib.dt_types import AWSBase
+from educate_infrastructure.lib.monitoring import DTMetric
 
 MAX_BACKUP_DAYS = 35
 
+# Serverless v2 needs Aurora MySQL 3.02.0 (MySQL 8.0 compatible) or later
+SERVERLESS_MIN_ENGINE_VERSION = (3, 2, 0)
+
+# Engines whose parameter group family is the engine and its major.minor version
+VERSIONED_FAMILY_ENGINES = ("mysql", "mariadb")
+
+
+def database_metrics(dimensions: Dict[Text, Output]) -> List[DTMetric]:
+    """CPU, connections and latency of an instance or cluster."""
+    metrics = [
+        DTMetric(
+            key="cpu",
+            title="CPU utilization",
+            namespace="AWS/RDS",
+            metric_name="CPUUtilization",
+            dimensions=dimensions,
+            threshold=80,
+        ),
+        # The connection limit depends on the instance class, set a threshold per stack
+        DTMetric(
+            key="connections",
+            title="Connections",
+            namespace="AWS/RDS",
+            metric_name="DatabaseConnections",
+            dimensions=dimensions,
+            statistic="Maximum",
+        ),
+    ]
+    for operation in ("Read", "Write"):
+        metrics.append(
+            DTMetric(
+                key=f"{operation.lower()}_latency",
+                title=f"{operation} latency (seconds)",
+                namespace="AWS/RDS",
+                metric_name=f"{operation}Latency",
+                dimensions=dimensions,
+                threshold=0.05,
+            )
+        )
+    return metrics
+
 
 class DTReplicaDBConfig(BaseModel):
     """Configuration object for defining configuration needed to create a read replica."""
@@ -17,20 +76,90 @@ class DTReplicaDBConfig(BaseModel):
     instance_size: Text = rds.InstanceType.T3_MEDIUM
     storage_type: rds.StorageType = rds.StorageType.GP2
     public_access: bool = False
-    security_groups: Optional[List[SecurityGroup]] = None
+    security_groups: Optional[List[SecurityGroup]] = None  # Defaults to the primary's
+    replica_count: PositiveInt = 1
+    # Replicas are spread over these zones in order, AWS picks one when unset
+    availability_zones: Optional[List[Text]] = None
+    tuning_profile: Optional[DTTuningProfile] = DTTuningProfile.reporting
+    parameter_overrides: List[Dict[Text, ParameterValue]] = []  # noqa: WPS234
 
     class Config:
         arbitrary_types_allowed = True
 
 
+class DTReaderScalingMetric(str, Enum):
+    cpu = "RDSReaderAverageCPUUtilization"
+    connections = "RDSReaderAverageDatabaseConnections"
+
+
+class DTAuroraReaderScalingConfig(BaseModel):
+    """Configuration object for defining Application Auto Scaling of Aurora replicas."""
+
+    min_capacity: conint(ge=0, le=15) = 0  # type: ignore
+    max_capacity: conint(ge=1, le=15) = 2  # type: ignore
+    metric: DTReaderScalingMetric = DTReaderScalingMetric.cpu
+    target_value: PositiveFloat = 60
+    scale_in_cooldown: PositiveInt = 300
+    scale_out_cooldown: PositiveInt = 120
+
+    @validator("max_capacity")
+    def max_above_min(cls, max_capacity, values):
+        if max_capacity < values.get("min_capacity", 0):
+            raise ValueError("max_capacity must not be below min_capacity")
+        return max_capacity
+
+
+class DTAuroraServerlessConfig(BaseModel):
+    """Capacity range of Aurora Serverless v2 instances, in Aurora capacity units (ACU).
+
+    Each ACU is about 2 GiB of memory with matching CPU and network.
+    """
+
+    min_capacity: confloat(ge=0.5, le=128) = 0.5  # type: ignore
+    max_capacity: confloat(ge=1, le=128) = 4  # type: ignore
+
+    @validator("min_capacity", "max_capacity")
+    def half_acu_increments(cls, capacity):
+        if capacity * 2 != int(capacity * 2):
+            raise ValueError("Capacity must be a multiple of 0.5 ACU")
+        return capacity
+
+    @validator("max_capacity")
+    def max_above_min(cls, max_capacity, values):
+        if max_capacity < values.get("min_capacity", 0):
+            raise ValueError("max_capacity must not be below min_capacity")
+        return max_capacity
+
+
+def aurora_mysql_version(engine_version: Text) -> Tuple[int, ...]:
+    """The Aurora version of an engine version, e.g. (3, 2, 0) for 8.0.mysql_aurora.3.02.0"""
+    _, _, version = engine_version.rpartition("mysql_aurora.")
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
+
+def parameter_group_family(engine: Text, engine_version: Text) -> Text:
+    """The parameter group family of an engine version, e.g. aurora-mysql8.0"""
+    if engine == rds.EngineType.AURORA_MYSQL:
+        if aurora_mysql_version(engine_version) >= (3,):
+            return "aurora-mysql8.0"
+        return "aurora-mysql5.7"
+    if engine in VERSIONED_FAMILY_ENGINES:
+        major, minor, *_ = engine_version.split(".")
+        return f"{engine}{major}.{minor}"
+    raise ValueError(f"No parameter group family known for the {engine} engine")
+
+
 class DTRDSConfig(AWSBase):
     """Configuration object for defining the interface to create an RDS instance with sane defaults."""
 
     engine: Text
     engine_version: Text
+    # Parameter group family, derived from the engine version when unset
+    family: Optional[Text] = None
     instance_name: Text  # The name of the RDS instance
     password: Optional[SecretStr]
-    # parameter_overrides: List[Dict[Text, Union[Text, bool, int, float]]]  # noqa: WPS234
+    tuning_profile: Optional[DTTuningProfile] = None  # Engine defaults when unset
+    parameter_overrides: List[Dict[Text, ParameterValue]] = []  # noqa: WPS234
     port: PositiveInt
     subnet_group_name: Union[Text, Output[str]]
     security_groups: List[SecurityGroup]
@@ -40,6 +169,8 @@ class DTRDSConfig(AWSBase):
     is_public: bool = False
     max_storage: Optional[PositiveInt] = None  # Set to allow for storage autoscaling
     multi_az: bool = True
+    # Needed to apply an engine_version with a new major version, e.g. MySQL 5.7 to 8.0
+    allow_major_version_upgrade: bool = True
     prevent_delete: bool = True
     public_access: bool = False
     take_final_snapshot: bool = True
@@ -51,6 +182,18 @@ class DTRDSConfig(AWSBase):
     class Config:
         arbitrary_types_allowed = True
 
+    @validator("family", always=True)
+    def family_matches_engine_version(cls, family, values):
+        if "engine" not in values or "engine_version" not in values:
+            return family
+        expected = parameter_group_family(values["engine"], values["engine_version"])
+        if family is not None and family != expected:
+            raise ValueError(
+                f"Family {family} does not match engine version "
+                f"{values['engine_version']}, use {expected}"
+            )
+        return expected
+
 
 class DTMySQLConfig(DTRDSConfig):
     """Configuration container to specify settings specific to MySQL."""
@@ -60,7 +203,6 @@ class DTMySQLConfig(DTRDSConfig):
     port: PositiveInt = PositiveInt(3306)
     instance_size: Text = rds.InstanceType.T3_LARGE
     snapshot_identifier: Optional[Text]
-    family: Text = "mysql5.7"
 
 
 class DTAuroraConfig(DTRDSConfig):
@@ -71,10 +213,46 @@ class DTAuroraConfig(DTRDSConfig):
     port: PositiveInt = PositiveInt(3306)
     instance_size: Text = rds.InstanceType.T3_MEDIUM
     snapshot_identifier: Optional[Text]
-    family: Text = "aurora-mysql5.7"
-
-
-class DTRDSInstance(ComponentResource):
+    cluster_parameter_overrides: List[Dict[Text, ParameterValue]] = []  # noqa: WPS234
+    instance_count: PositiveInt = 1  # The first instance is the writer
+    # Instances are spread over these zones in order, AWS picks one when unset
+    availability_zones: Optional[List[Text]] = None
+    reader_scaling: Optional[DTAuroraReaderScalingConfig] = None
+    # Serverless v2 capacity of every instance, instance_size is used when unset
+    serverless: Optional[DTAuroraServerlessConfig] = None
+
+    @validator("serverless")
+    def serverless_engine_version(cls, serverless, values):
+        if serverless is None:
+            return serverless
+        engine_version = values.get("engine_version", "")
+        if aurora_mysql_version(engine_version) < SERVERLESS_MIN_ENGINE_VERSION:
+            raise ValueError(
+                f"Serverless v2 needs Aurora MySQL 3.02.0 or later (family aurora-mysql8.0), "
+                f"not {engine_version}"
+            )
+        return serverless
+
+    @property
+    def instance_class(self) -> Text:
+        if self.serverless:
+            return SERVERLESS_INSTANCE_CLASS
+        return self.instance_size
+
+
+def parameter_group_parameters(
+    profile: Optional[DTTuningProfile],
+    instance_size: Text,
+    family: Text,
+    overrides: List[Dict[Text, ParameterValue]],
+) -> List[rds.ParameterGroupParameterArgs]:
+    return [
+        rds.ParameterGroupParameterArgs(**parameter.dict())
+        for parameter in instance_parameters(profile, instance_size, family, overrides)
+    ]
+
+
+class DTRDSInstance(DTComponent):
     """
     Build an RDS Instance
 
@@ -98,15 +276,21 @@ class DTRDSInstance(ComponentResource):
 
         self.parameter_group = rds.ParameterGroup(
             f"{db_config.instance_name}-{db_config.engine}-parameter-group",
-            # family=parameter_group_family(db_config.engine, db_config.engine_version),
             family=db_config.family,
-            name=f"{db_config.instance_name}-{db_config.engine}-parameter-group",
+            name_prefix=f"{db_config.instance_name}-{db_config.engine}-parameter-group-",
+            parameters=parameter_group_parameters(
+                db_config.tuning_profile,
+                db_config.instance_size,
+                db_config.family,
+                db_config.parameter_overrides,
+            ),
             opts=ResourceOptions(parent=self),
         )
         # TODO add date to make final snapshot unique
         self.db_instance = rds.Instance(
             f"{db_config.instance_name}-{db_config.engine}-instance",
             allocated_storage=db_config.storage,
+            allow_major_version_upgrade=db_config.allow_major_version_upgrade,
             auto_minor_version_upgrade=True,
             backup_retention_period=db_config.backup_days,
             copy_tags_to_snapshot=True,
@@ -134,20 +318,97 @@ class DTRDSInstance(ComponentResource):
             opts=ResourceOptions(parent=self),
         )
 
+        self.db_replicas: List[rds.Instance] = []
+        if db_config.read_replica:
+            self.create_read_replicas(db_config, db_config.read_replica)
+
         component_outputs = {
             "parameter_group": self.parameter_group,
             "rds_instance": self.db_instance,
+            "rds_replicas": self.db_replicas,
         }
 
         self.register_outputs(component_outputs)
 
         info(msg=f"{db_config.instance_name} created.", resource=self)
 
+    def create_read_replicas(
+        self, db_config: DTRDSConfig, replica_config: DTReplicaDBConfig
+    ):
+        """Create the read replicas of the primary instance.
+
+        :param db_config: Configuration object of the primary instance.
+        :type db_config: DTRDSConfig
+
+        :param replica_config: Configuration object for customizing the replicas.
+        :type replica_config: DTReplicaDBConfig
+        """
+        security_groups = replica_config.security_groups or db_config.security_groups
+        zones = replica_config.availability_zones or [None]
+
+        self.replica_parameter_group = rds.ParameterGroup(
+            f"{db_config.instance_name}-{db_config.engine}-replica-parameter-group",
+            family=db_config.family,
+            name_prefix=f"{db_config.instance_name}-{db_config.engine}-replica-parameter-group-",
+            parameters=parameter_group_parameters(
+                replica_config.tuning_profile,
+                replica_config.instance_size,
+                db_config.family,
+                replica_config.parameter_overrides,
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+
+        for index in range(replica_config.replica_count):
+            replica_name = f"{db_config.instance_name}-replica-{index}"
+            self.db_replicas.append(
+                rds.Instance(
+                    f"{db_config.instance_name}-{db_config.engine}-replica-{index}",
+                    auto_minor_version_upgrade=True,
+                    availability_zone=zones[index % len(zones)],
+                    copy_tags_to_snapshot=True,
+                    identifier=replica_name,
+                    instance_class=replica_config.instance_size,
+                    max_allocated_storage=db_config.max_storage,
+                    parameter_group_name=self.replica_parameter_group.name,
+                    publicly_accessible=replica_config.public_access,
+                    replicate_source_db=self.db_instance.identifier,
+                    skip_final_snapshot=True,
+                    storage_encrypted=True,
+                    storage_type=replica_config.storage_type.value,
+                    tags={**db_config.tags, "Name": replica_name},
+                    vpc_security_group_ids=[group.id for group in security_groups],
+                    opts=ResourceOptions(parent=self),
+                )
+            )
+
+    def monitoring_metrics(self) -> List[DTMetric]:
+        metrics = database_metrics(
+            {"DBInstanceIdentifier": self.db_instance.identifier}
+        )
+        for index, replica in enumerate(self.db_replicas):
+            metrics.append(
+                DTMetric(
+                    key="replica_lag",
+                    label=str(index),
+                    title=f"Replica {index} lag (seconds)",
+                    namespace="AWS/RDS",
+                    metric_name="ReplicaLag",
+                    dimensions={"DBInstanceIdentifier": replica.identifier},
+                    statistic="Maximum",
+                    threshold=30,
+                )
+            )
+        return metrics
+
     def get_endpoint(self) -> str:
         return self.db_instance.endpoint
 
+    def get_reader_endpoints(self) -> Output:
+        return Output.all(*[replica.endpoint for replica in self.db_replicas])
+
 
-class DTAuroraCluster(ComponentResource):
+class DTAuroraCluster(DTComponent):
     """
     Build an Aurora Cluster
 
@@ -168,14 +429,41 @@ class DTAuroraCluster(ComponentResource):
             db_config.instance_name,
             opts,
         )
-        """
+        self.serverless = db_config.serverless
+
+        self.cluster_parameter_group = rds.ClusterParameterGroup(
+            f"{db_config.instance_name}-{db_config.engine}-cluster-parameter-group",
+            family=db_config.family,
+            name_prefix=f"{db_config.instance_name}-{db_config.engine}-cluster-parameter-group-",
+            parameters=[
+                rds.ClusterParameterGroupParameterArgs(**parameter.dict())
+                for parameter in cluster_parameters(
+                    db_config.cluster_parameter_overrides
+                )
+            ],
+            opts=ResourceOptions(parent=self),
+        )
+
         self.parameter_group = rds.ParameterGroup(
             f"{db_config.instance_name}-{db_config.engine}-parameter-group",
-            # family=parameter_group_family(db_config.engine, db_config.engine_version),
             family=db_config.family,
-            name=f"{db_config.instance_name}-{db_config.engine}-parameter-group",
+            name_prefix=f"{db_config.instance_name}-{db_config.engine}-parameter-group-",
+            parameters=parameter_group_parameters(
+                db_config.tuning_profile,
+                db_config.instance_class,
+                db_config.family,
+                db_config.parameter_overrides,
+            ),
+            opts=ResourceOptions(parent=self),
         )
-        """
+
+        scaling = None
+        if self.serverless:
+            scaling = rds.ClusterServerlessv2ScalingConfigurationArgs(
+                min_capacity=self.serverless.min_capacity,
+                max_capacity=self.serverless.max_capacity,
+            )
+
         self.db_cluster = rds.Cluster(
             f"{db_config.instance_name}-{db_config.engine}-instance",
             backup_retention_period=db_config.backup_days,
@@ -185,34 +473,54 @@ class DTAuroraCluster(ComponentResource):
             cluster_identifier=db_config.instance_name,
             engine=db_config.engine,
             engine_version=db_config.engine_version,
+            allow_major_version_upgrade=db_config.allow_major_version_upgrade,
             final_snapshot_identifier=f"{db_config.instance_name}-{db_config.engine}-final-snapshot",
-            # db_cluster_parameter_group_name=self.parameter_group.name,
+            db_cluster_parameter_group_name=self.cluster_parameter_group.name,
+            # A major version upgrade moves the instances to the group of the new family
+            db_instance_parameter_group_name=self.parameter_group.name
+            if db_config.allow_major_version_upgrade
+            else None,
             port=db_config.port,
             skip_final_snapshot=not db_config.take_final_snapshot,
             tags=db_config.tags,
             vpc_security_group_ids=[group.id for group in db_config.security_groups],
             snapshot_identifier=db_config.snapshot_identifier,
+            serverlessv2_scaling_configuration=scaling,
             opts=ResourceOptions(parent=self),
         )
 
-        self.instance = rds.ClusterInstance(
-            f"{db_config.instance_name}-{db_config.engine}-instance-0",
-            identifier=db_config.instance_name,
-            cluster_identifier=self.db_cluster.id,
-            engine=db_config.engine,
-            engine_version=db_config.engine_version,
-            instance_class=db_config.instance_size,
-            tags=db_config.tags,
-            opts=ResourceOptions(
-                parent=self,
-            ),
-        )
-
+        zones = db_config.availability_zones or [None]
         self.cluster_instances = []
-        self.cluster_instances.append(self.instance)
+        for index in range(db_config.instance_count):
+            # The writer keeps the cluster name as its identifier
+            identifier = db_config.instance_name
+            if index:
+                identifier = f"{db_config.instance_name}-{index}"
+
+            self.cluster_instances.append(
+                rds.ClusterInstance(
+                    f"{db_config.instance_name}-{db_config.engine}-instance-{index}",
+                    identifier=identifier,
+                    availability_zone=zones[index % len(zones)],
+                    cluster_identifier=self.db_cluster.id,
+                    db_parameter_group_name=self.parameter_group.name,
+                    engine=db_config.engine,
+                    engine_version=db_config.engine_version,
+                    instance_class=db_config.instance_class,
+                    tags=db_config.tags,
+                    opts=ResourceOptions(
+                        parent=self,
+                    ),
+                )
+            )
+        self.instance = self.cluster_instances[0]
+
+        if db_config.reader_scaling:
+            self.create_reader_scaling(db_config, db_config.reader_scaling)
 
         component_outputs = {
-            # "parameter_group": self.parameter_group,
+            "cluster_parameter_group": self.cluster_parameter_group,
+            "parameter_group": self.parameter_group,
             "aurora_cluster": self.db_cluster,
             "aurora_instances": self.cluster_instances,
         }
@@ -224,5 +532,84 @@ class DTAuroraCluster(ComponentResource):
             resource=self,
         )
 
+    def create_reader_scaling(
+        self, db_config: DTAuroraConfig, scaling_config: DTAuroraReaderScalingConfig
+    ):
+        """Register the cluster replicas with Application Auto Scaling.
+
+        :param db_config: Configuration object of the cluster.
+        :type db_config: DTAuroraConfig
+
+        :param scaling_config: Configuration object for customizing the scaling policy.
+        :type scaling_config: DTAuroraReaderScalingConfig
+        """
+        self.reader_scaling_target = appautoscaling.Target(
+            f"{db_config.instance_name}-{db_config.engine}-reader-scaling-target",
+            service_namespace="rds",
+            scalable_dimension="rds:cluster:ReadReplicaCount",
+            resource_id=Output.concat("cluster:", self.db_cluster.id),
+            min_capacity=scaling_config.min_capacity,
+            max_capacity=scaling_config.max_capacity,
+            opts=ResourceOptions(parent=self, depends_on=self.cluster_instances),
+        )
+
+        self.reader_scaling_policy = appautoscaling.Policy(
+            f"{db_config.instance_name}-{db_config.engine}-reader-scaling-policy",
+            policy_type="TargetTrackingScaling",
+            service_namespace=self.reader_scaling_target.service_namespace,
+            scalable_dimension=self.reader_scaling_target.scalable_dimension,
+            resource_id=self.reader_scaling_target.resource_id,
+            target_tracking_scaling_policy_configuration=appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
+                predefined_metric_specification=appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
+                    predefined_metric_type=scaling_config.metric.value,
+                ),
+                target_value=scaling_config.target_value,
+                scale_in_cooldown=scaling_config.scale_in_cooldown,
+                scale_out_cooldown=scaling_config.scale_out_cooldown,
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+
+    def monitoring_metrics(self) -> List[DTMetric]:
+        dimensions = {"DBClusterIdentifier": self.db_cluster.cluster_identifier}
+        metrics = [
+            *database_metrics(dimensions),
+            DTMetric(
+                key="replica_lag",
+                title="Aurora replica lag (milliseconds)",
+                namespace="AWS/RDS",
+                metric_name="AuroraReplicaLag",
+                dimensions={**dimensions, "Role": "READER"},
+                statistic="Maximum",
+                threshold=1000,
+            ),
+        ]
+        if self.serverless:
+            metrics += [
+                DTMetric(
+                    key="capacity",
+                    title="Serverless capacity (ACU)",
+                    namespace="AWS/RDS",
+                    metric_name="ServerlessDatabaseCapacity",
+                    dimensions=dimensions,
+                    statistic="Maximum",
+                    period=60,
+                ),
+                # Close to max_capacity, the instances can not absorb another spike
+                DTMetric(
+                    key="acu_utilization",
+                    title="Serverless capacity used (percent of max)",
+                    namespace="AWS/RDS",
+                    metric_name="ACUUtilization",
+                    dimensions=dimensions,
+                    statistic="Maximum",
+                    threshold=90,
+                ),
+            ]
+        return metrics
+
     def get_endpoint(self) -> str:
         return self.db_cluster.endpoint
+
+    def get_reader_endpoint(self) -> str:
+        return self.db_cluster.reader_endpoint
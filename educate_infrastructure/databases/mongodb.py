@@ -4,20 +4,139 @@ building a MongoDB instance
 
 This includes:
 - Create the named EC2 with appropriate tags
-- Create a Security Group
+- Create a Security Group only reachable from the configured CIDR blocks
 - Create a profile for the instance
-- TODO Replica
+- Optionally spread the members of a replica set across the private subnets, the first
+  one initiating the set once every member answers
+- Keep the admin password and the replica set key file in Secrets Manager, the boot
+  script enables authorization with them
+- Create and attach the data, journal and log volumes described by a storage profile,
+  kept when the instance is replaced or the stack destroys them
+- Render the boot script installing MongoDB on those volumes, followed by the configured
+  commands, into compressed user data
+- Describe the instance and volume metrics to monitor
 """
 
-from typing import Optional, Text
+import json
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Text, Union
 
-from pulumi import ComponentResource, ResourceOptions, Output, info
-from pulumi_aws import ec2, get_ami, GetAmiFilterArgs, iam
-from pydantic import BaseModel, PositiveInt
+from pulumi import ResourceOptions, Output, info
+from pulumi_aws import ebs, ec2, iam, secretsmanager
+from pydantic import BaseModel, PositiveInt, validator
+
+from educate_infrastructure.lib.component import DTComponent
+from educate_infrastructure.lib.lookups import lookup_ami
+from educate_infrastructure.lib.monitoring import DTMetric
+from educate_infrastructure.lib.user_data import (
+    DTUserData,
+    DTUserDataPart,
+    build_user_data,
+    load_template,
+)
+
+MONGODB_BOOT_SCRIPT = Path(__file__).parent / "mongodb.sh"
+
+MONGODB_PORT = 27017
+
+# Root user created by the boot script, its password is in the admin password secret
+MONGODB_ADMIN_USER = "admin"
+
+
+class DTVolumeType(str, Enum):
+    gp2 = "gp2"
+    gp3 = "gp3"
+    io1 = "io1"
+    io2 = "io2"
+
+
+class DTEBSVolumeConfig(BaseModel):
+    """Configuration object for a single EBS volume attached to a MongoDB member."""
+
+    device_name: Text
+    name: Text
+    volume_size: PositiveInt
+    volume_type: Optional[DTVolumeType] = None  # Provider default (gp2) when unset
+    iops: Optional[PositiveInt] = None
+    throughput: Optional[PositiveInt] = None  # MiB/s
+
+    @validator("iops", always=True)
+    def iops_matches_volume_type(cls, iops, values):
+        volume_type = values.get("volume_type")
+        if volume_type in (DTVolumeType.io1, DTVolumeType.io2) and iops is None:
+            raise ValueError(f"{volume_type.value} volumes need provisioned iops")
+        if iops is not None and volume_type not in (
+            DTVolumeType.gp3,
+            DTVolumeType.io1,
+            DTVolumeType.io2,
+        ):
+            raise ValueError("iops can only be provisioned on gp3, io1 and io2 volumes")
+        return iops
+
+    @validator("throughput")
+    def throughput_matches_volume_type(cls, throughput, values):
+        if throughput is not None and values.get("volume_type") != DTVolumeType.gp3:
+            raise ValueError("throughput can only be provisioned on gp3 volumes")
+        return throughput
+
+
+class DTMongoDBStorageConfig(BaseModel):
+    """Storage profile of the MongoDB members.
+
+    The volumes are separate from the instances, so growing them or changing their type,
+    iops and throughput is applied in place by Elastic Volumes.
+    """
+
+    data: DTEBSVolumeConfig = DTEBSVolumeConfig(
+        device_name="/dev/sdf", name="MongoDB Data", volume_size=20
+    )
+    journal: DTEBSVolumeConfig = DTEBSVolumeConfig(
+        device_name="/dev/sdg", name="MongoDB Journal", volume_size=4
+    )
+    log: DTEBSVolumeConfig = DTEBSVolumeConfig(
+        device_name="/dev/sdh", name="MongoDB Log", volume_size=2
+    )
+    ebs_optimized: Optional[bool] = None
+
+    def volumes(self) -> List[DTEBSVolumeConfig]:
+        return [self.data, self.journal, self.log]
+
+
+# gp3 baseline performance does not depend on burst credits
+HIGH_PERFORMANCE_STORAGE = DTMongoDBStorageConfig(
+    data=DTEBSVolumeConfig(
+        device_name="/dev/sdf",
+        name="MongoDB Data",
+        volume_size=50,
+        volume_type=DTVolumeType.gp3,
+        iops=6000,
+        throughput=250,
+    ),
+    journal=DTEBSVolumeConfig(
+        device_name="/dev/sdg",
+        name="MongoDB Journal",
+        volume_size=8,
+        volume_type=DTVolumeType.gp3,
+        iops=3000,
+        throughput=125,
+    ),
+    log=DTEBSVolumeConfig(
+        device_name="/dev/sdh",
+        name="MongoDB Log",
+        volume_size=4,
+        volume_type=DTVolumeType.gp3,
+    ),
+    ebs_optimized=True,
+)
+
+STORAGE_PROFILES = {
+    "standard": DTMongoDBStorageConfig(),
+    "high_performance": HIGH_PERFORMANCE_STORAGE,
+}
 
 
 # TODO Add deletion protection
-# TODO Handle cluster
 class DTMongoDBConfig(BaseModel):
     """
     Configuration object for defining configuration needed to create a
@@ -27,15 +146,62 @@ class DTMongoDBConfig(BaseModel):
     name: Text
     vpc_id: Output[Text]
     subnet_id: Output[Text]
+    # Sources allowed to reach mongod, e.g. the CIDR block of the apps VPC
+    ingress_cidr_blocks: List[Union[Text, Output[Text]]]
     instance_type: ec2.InstanceType
     volume_size: Optional[PositiveInt] = 8
-    commands: Optional[Text]
+    storage: DTMongoDBStorageConfig = DTMongoDBStorageConfig()
+    commands: Optional[Text]  # Run after the boot script
+    mongodb_version: Text = "4.4"
+    # Changing the user data of a running member stops and starts it
+    attach_user_data: bool = False
+    # Replica set mode: members are placed round-robin over subnet_ids
+    replica_set_name: Optional[Text] = None
+    member_count: PositiveInt = 1
+    subnet_ids: Optional[Output[List[Text]]] = None
+    read_preference: Text = "secondaryPreferred"
+    # Volumes of the first member, by device name, to import instead of creating them,
+    # e.g. those created inline with the instance before the volumes were separate
+    import_volume_ids: Dict[Text, Text] = {}
+    # Read by the boot script: the password of the admin user it creates (used in a
+    # JavaScript string, e.g. openssl rand -hex 32) and the key file the members of a
+    # replica set authenticate each other with (e.g. openssl rand -base64 756)
+    admin_password: Optional[Output[Text]] = None
+    key_file: Optional[Output[Text]] = None
 
     class Config:
         arbitrary_types_allowed = True
 
+    @validator("replica_set_name")
+    def replica_set_needs_user_data(cls, replica_set_name, values):
+        # The boot script configures and initiates the replica set
+        if replica_set_name and not values.get("attach_user_data"):
+            raise ValueError("A replica set needs attach_user_data")
+        return replica_set_name
+
+    @validator("member_count")
+    def member_count_keeps_a_majority(cls, member_count, values):
+        if member_count > 1 and not values.get("replica_set_name"):
+            raise ValueError("Multiple members require a replica_set_name")
+        if member_count % 2 == 0:
+            raise ValueError("A replica set needs an odd number of members to elect")
+        return member_count
+
+    @validator("admin_password", always=True)
+    def user_data_needs_admin_password(cls, admin_password, values):
+        # The boot script enables authorization
+        if values.get("attach_user_data") and admin_password is None:
+            raise ValueError("attach_user_data needs an admin_password")
+        return admin_password
+
+    @validator("key_file", always=True)
+    def replica_set_needs_key_file(cls, key_file, values):
+        if values.get("replica_set_name") and key_file is None:
+            raise ValueError("A replica set needs a key_file")
+        return key_file
 
-class DTMongoDB(ComponentResource):
+
+class DTMongoDB(DTComponent):
     """
     Component to create a MongoDB instance with sane defaults and manage associated resources.
 
@@ -61,18 +227,42 @@ class DTMongoDB(ComponentResource):
         )
 
         self.tags = {"pulumi_managed": "true"}
+        self.replica_set_name = instance_config.replica_set_name
+        self.read_preference = instance_config.read_preference
+        self.storage = instance_config.storage
+        # The volumes of every member, by device name
+        self.member_volumes: List[Dict[Text, ebs.Volume]] = []
+
+        # The boot script reads them by name, so the members wait for their values
+        self.secret_versions: List[secretsmanager.SecretVersion] = []
+        self.admin_password_secret = None
+        if instance_config.admin_password is not None:
+            self.admin_password_secret = self.create_secret(
+                instance_config, "admin-password", instance_config.admin_password
+            )
+        self.key_file_secret = None
+        if instance_config.key_file is not None:
+            self.key_file_secret = self.create_secret(
+                instance_config, "key-file", instance_config.key_file
+            )
 
         # Amazon Linux 2
-        self.ami = get_ami(
-            most_recent=True,
+        self.ami = lookup_ami(
             owners=["137112412989"],  # x86_64
-            filters=[
-                GetAmiFilterArgs(name="name", values=["amzn2-ami-hvm-2.0.*"]),
-                GetAmiFilterArgs(name="architecture", values=["x86_64"]),
-            ],
+            filters={
+                "name": ["amzn2-ami-hvm-2.0.*"],
+                "architecture": ["x86_64"],
+            },
         )
 
-        security_group = ec2.SecurityGroup(
+        # The boot script of every member, only the first one initiates the replica set
+        self.member_user_data = [
+            self.build_user_data(instance_config, index)
+            for index in range(instance_config.member_count)
+        ]
+        self.user_data = self.member_user_data[0]
+
+        self.security_group = ec2.SecurityGroup(
             f"{instance_config.name}-sg",
             vpc_id=instance_config.vpc_id,
             description="Enable HTTP and HTTPS access",
@@ -87,9 +277,9 @@ class DTMongoDB(ComponentResource):
             ingress=[
                 ec2.SecurityGroupIngressArgs(
                     protocol=ec2.ProtocolType.TCP,
-                    from_port=27017,
-                    to_port=27017,
-                    cidr_blocks=["0.0.0.0/0"],
+                    from_port=MONGODB_PORT,
+                    to_port=MONGODB_PORT,
+                    cidr_blocks=instance_config.ingress_cidr_blocks,
                 ),
             ],
             tags={**self.tags, "Name": f"{instance_config.name}"},
@@ -131,60 +321,281 @@ class DTMongoDB(ComponentResource):
             opts=ResourceOptions(parent=self),
         )
 
+        if self.replica_set_name:
+            # The first member finds the others by their MongoDBReplicaSet tag
+            iam.RolePolicy(
+                f"{instance_config.name}-describe-instances-policy",
+                role=mongodb_role.id,
+                policy=json.dumps(
+                    {
+                        "Version": "2012-10-17",
+                        "Statement": [
+                            {
+                                "Effect": "Allow",
+                                "Action": ["ec2:DescribeInstances"],
+                                "Resource": ["*"],
+                            }
+                        ],
+                    }
+                ),
+                opts=ResourceOptions(parent=self),
+            )
+
+        secrets = [
+            secret
+            for secret in (self.admin_password_secret, self.key_file_secret)
+            if secret is not None
+        ]
+        if secrets:
+            iam.RolePolicy(
+                f"{instance_config.name}-secrets-policy",
+                role=mongodb_role.id,
+                policy=Output.all(*[secret.arn for secret in secrets]).apply(
+                    lambda arns: json.dumps(
+                        {
+                            "Version": "2012-10-17",
+                            "Statement": [
+                                {
+                                    "Effect": "Allow",
+                                    "Action": ["secretsmanager:GetSecretValue"],
+                                    "Resource": arns,
+                                }
+                            ],
+                        }
+                    )
+                ),
+                opts=ResourceOptions(parent=self),
+            )
+
         mongodb_profile = iam.InstanceProfile(
             f"{instance_config.name}-profile",
             role=mongodb_role.name,
             opts=ResourceOptions(parent=self),
         )
 
-        self._instance = ec2.Instance(
-            f"{instance_config.name}-instance",
+        self.members: List[ec2.Instance] = []
+        for index in range(instance_config.member_count):
+            subnet_id = instance_config.subnet_id
+            if instance_config.subnet_ids is not None:
+                subnet_id = instance_config.subnet_ids.apply(
+                    lambda ids, index=index: ids[index % len(ids)]
+                )
+            self.create_member(
+                instance_config,
+                index,
+                subnet_id,
+                self.security_group,
+                mongodb_profile,
+            )
+        self._instance = self.members[0]
+
+        self.register_outputs(
+            {
+                "private_dns": self._instance.private_dns,
+                "instance_id": self._instance.id,
+                "connection_string": self.get_connection_string(),
+            }
+        )
+
+        info(msg=f"{instance_config.name} created.", resource=self)
+
+    def create_secret(
+        self, instance_config: DTMongoDBConfig, kind: Text, value: Output[Text]
+    ) -> secretsmanager.Secret:
+        secret = secretsmanager.Secret(
+            f"{instance_config.name}-{kind}",
+            name=self.secret_name(instance_config, kind),
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+        self.secret_versions.append(
+            secretsmanager.SecretVersion(
+                f"{instance_config.name}-{kind}-version",
+                secret_id=secret.id,
+                secret_string=Output.secret(value),
+                opts=ResourceOptions(parent=self),
+            )
+        )
+        return secret
+
+    @staticmethod
+    def secret_name(instance_config: DTMongoDBConfig, kind: Text) -> Text:
+        return f"{instance_config.name}/{kind}"
+
+    def create_member(
+        self,
+        instance_config: DTMongoDBConfig,
+        index: int,
+        subnet_id: Output[Text],
+        security_group: ec2.SecurityGroup,
+        instance_profile: iam.InstanceProfile,
+    ):
+        # The first member keeps the name of the original standalone instance
+        name = f"{instance_config.name}-instance"
+        tags = {**self.tags, "Name": "MongoDB Prod"}
+        if index:
+            name = f"{instance_config.name}-instance-{index}"
+            tags = {**self.tags, "Name": f"{instance_config.name}-{index}"}
+        if self.replica_set_name:
+            tags["MongoDBReplicaSet"] = self.replica_set_name
+        user_data = None
+        if instance_config.attach_user_data:
+            user_data = self.member_user_data[index].base64()
+
+        member = ec2.Instance(
+            name,
             instance_type=instance_config.instance_type,
-            subnet_id=instance_config.subnet_id,
+            subnet_id=subnet_id,
             vpc_security_group_ids=[security_group.id],
             ami=self.ami.id,
-            iam_instance_profile=mongodb_profile.id,
+            iam_instance_profile=instance_profile.id,
             root_block_device=ec2.InstanceRootBlockDeviceArgs(
                 delete_on_termination=True,
                 volume_size=instance_config.volume_size,
                 encrypted=True,
             ),
-            ebs_block_devices=[
-                ec2.InstanceEbsBlockDeviceArgs(
-                    device_name="/dev/sdf",
-                    volume_size=20,
-                    encrypted=True,
-                    tags={**self.tags, "Name": "MongoDB Data"},
-                ),
-                ec2.InstanceEbsBlockDeviceArgs(
-                    device_name="/dev/sdg",
-                    volume_size=4,
-                    encrypted=True,
-                    tags={**self.tags, "Name": "MongoDB Journal"},
-                ),
-                ec2.InstanceEbsBlockDeviceArgs(
-                    device_name="/dev/sdh",
-                    volume_size=2,
-                    encrypted=True,
-                    tags={**self.tags, "Name": "MongoDB Log"},
-                ),
-            ],
+            ebs_optimized=instance_config.storage.ebs_optimized,
+            user_data_base64=user_data,
             disable_api_termination=True,
-            tags={**self.tags, "Name": "MongoDB Prod"},
-            opts=ResourceOptions(parent=self),
+            tags=tags,
+            opts=ResourceOptions(parent=self, depends_on=self.secret_versions),
         )
+        self.members.append(member)
 
-        self.register_outputs(
-            {
-                "private_dns": self._instance.private_dns,
-                "instance_id": self._instance.id,
-            }
-        )
+        # Attached volumes are not deleted on termination, the data outlives the member
+        volumes = {}
+        for volume in instance_config.storage.volumes():
+            device = volume.device_name.split("/")[-1]
+            volume_id = None
+            if not index:
+                volume_id = instance_config.import_volume_ids.get(volume.device_name)
+            volumes[volume.device_name] = ebs.Volume(
+                f"{name}-{device}-volume",
+                availability_zone=member.availability_zone,
+                size=volume.volume_size,
+                type=volume.volume_type and volume.volume_type.value,
+                iops=volume.iops,
+                throughput=volume.throughput,
+                encrypted=True,
+                tags={**self.tags, "Name": volume.name},
+                opts=ResourceOptions(
+                    parent=self, retain_on_delete=True, import_=volume_id
+                ),
+            )
+            ec2.VolumeAttachment(
+                f"{name}-{device}-attachment",
+                device_name=volume.device_name,
+                volume_id=volumes[volume.device_name].id,
+                instance_id=member.id,
+                stop_instance_before_detaching=True,
+                opts=ResourceOptions(parent=self),
+            )
+        self.member_volumes.append(volumes)
 
-        info(msg=f"{instance_config.name} created.", resource=self)
+    def build_user_data(
+        self, instance_config: DTMongoDBConfig, index: int
+    ) -> DTUserData:
+        storage = instance_config.storage
+        key_file_secret_id = ""
+        if instance_config.key_file is not None:
+            key_file_secret_id = self.secret_name(instance_config, "key-file")
+        parts = [
+            DTUserDataPart(
+                filename="mongodb.sh",
+                template=load_template(MONGODB_BOOT_SCRIPT),
+                variables={
+                    "mongodb_version": instance_config.mongodb_version,
+                    "data_device": storage.data.device_name,
+                    "journal_device": storage.journal.device_name,
+                    "log_device": storage.log.device_name,
+                    "replica_set_name": self.replica_set_name or "",
+                    "member_count": str(instance_config.member_count),
+                    # The first member initiates the replica set and creates the admin
+                    "bootstrap": not index,
+                    "admin_user": MONGODB_ADMIN_USER,
+                    "admin_secret_id": self.secret_name(
+                        instance_config, "admin-password"
+                    ),
+                    "key_file_secret_id": key_file_secret_id,
+                },
+            )
+        ]
+        if instance_config.commands:
+            parts.append(
+                DTUserDataPart(
+                    filename="commands.sh", template=instance_config.commands
+                )
+            )
+        return build_user_data(parts)
+
+    def monitoring_metrics(self) -> List[DTMetric]:
+        """CPU of every member, queue length and burst balance of its volumes."""
+        metrics = []
+        for index, member in enumerate(self.members):
+            metrics.append(
+                DTMetric(
+                    key="cpu",
+                    label=str(index),
+                    title=f"Member {index} CPU utilization",
+                    namespace="AWS/EC2",
+                    metric_name="CPUUtilization",
+                    dimensions={"InstanceId": member.id},
+                    threshold=80,
+                )
+            )
+            for volume in self.storage.volumes():
+                volume_id = self.member_volumes[index][volume.device_name].id
+                label = f"{index}-{volume.device_name.split('/')[-1]}"
+                metrics.append(
+                    DTMetric(
+                        key="volume_queue_length",
+                        label=label,
+                        title=f"Member {index} {volume.name} queue length",
+                        namespace="AWS/EBS",
+                        metric_name="VolumeQueueLength",
+                        dimensions={"VolumeId": volume_id},
+                        threshold=10,
+                    )
+                )
+                # Only gp2 volumes spend burst credits
+                if volume.volume_type in (None, DTVolumeType.gp2):
+                    metrics.append(
+                        DTMetric(
+                            key="burst_balance",
+                            label=label,
+                            title=f"Member {index} {volume.name} burst balance",
+                            namespace="AWS/EBS",
+                            metric_name="BurstBalance",
+                            dimensions={"VolumeId": volume_id},
+                            statistic="Minimum",
+                            comparison_operator="LessThanOrEqualToThreshold",
+                            threshold=20,
+                        )
+                    )
+        return metrics
 
     def get_private_dns(self) -> Text:
         return self._instance.private_dns
 
     def get_instance_id(self) -> Text:
         return self._instance.id
+
+    def get_admin_password_secret_arn(self) -> Optional[Output]:
+        if self.admin_password_secret is None:
+            return None
+        return self.admin_password_secret.arn
+
+    def get_member_private_dns(self) -> Output:
+        return Output.all(*[member.private_dns for member in self.members])
+
+    def get_connection_string(self) -> Output:
+        """Build a connection string listing every member of the deployment."""
+
+        def build(hosts: List[Text]) -> Text:
+            uri = "mongodb://" + ",".join(f"{host}:{MONGODB_PORT}" for host in hosts)
+            if self.replica_set_name:
+                uri += f"/?replicaSet={self.replica_set_name}"
+                uri += f"&readPreference={self.read_preference}"
+            return uri
+
+        return self.get_member_private_dns().apply(build)
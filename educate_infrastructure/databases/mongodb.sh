@@ -0,0 +1,171 @@
+#!/bin/bash
+# Boot script of the MongoDB members (Amazon Linux 2)
+set -euo pipefail
+
+cat > /etc/yum.repos.d/mongodb-org-{{ mongodb_version }}.repo <<REPO
+[mongodb-org-{{ mongodb_version }}]
+name=MongoDB Repository
+baseurl=https://repo.mongodb.org/yum/amazon/2/mongodb-org/{{ mongodb_version }}/x86_64/
+gpgcheck=1
+enabled=1
+gpgkey=https://www.mongodb.org/static/pgp/server-{{ mongodb_version }}.asc
+REPO
+yum install -y mongodb-org
+
+# Format the EBS volumes on first boot only and mount them where mongod expects them
+mount_volume() {
+    local device=$1 mount_point=$2
+    if ! blkid "$device"; then
+        mkfs.xfs "$device"
+    fi
+    mkdir -p "$mount_point"
+    grep -q " $mount_point " /etc/fstab || \
+        echo "$device $mount_point xfs defaults,noatime,nofail 0 2" >> /etc/fstab
+    mount "$mount_point" || true
+    chown mongod:mongod "$mount_point"
+}
+mount_volume {{ data_device }} /data
+mount_volume {{ journal_device }} /journal
+mount_volume {{ log_device }} /log
+if [ ! -L /data/journal ]; then
+    ln -s /journal /data/journal
+fi
+
+token=$(curl -s -X PUT http://169.254.169.254/latest/api/token \
+    -H "X-aws-ec2-metadata-token-ttl-seconds: 300")
+metadata() {
+    curl -s -H "X-aws-ec2-metadata-token: $token" \
+        "http://169.254.169.254/latest/meta-data/$1"
+}
+region=$(metadata placement/region)
+private_ip=$(metadata local-ipv4)
+
+# The members of a replica set authenticate each other with the shared key file
+if [ -n "{{ key_file_secret_id }}" ]; then
+    (
+        umask 077
+        aws secretsmanager get-secret-value --region "$region" \
+            --secret-id "{{ key_file_secret_id }}" --query SecretString --output text \
+            > /etc/mongod.key
+    )
+    chown mongod:mongod /etc/mongod.key
+fi
+
+sed -i \
+    -e 's|dbPath: .*|dbPath: /data|' \
+    -e 's|path: /var/log/mongodb/mongod.log|path: /log/mongod.log|' \
+    -e "s|bindIp: .*|bindIp: 127.0.0.1,$private_ip|" \
+    /etc/mongod.conf
+if ! grep -q "^security:" /etc/mongod.conf; then
+    printf 'security:\n  authorization: enabled\n' >> /etc/mongod.conf
+    if [ -n "{{ key_file_secret_id }}" ]; then
+        printf '  keyFile: /etc/mongod.key\n' >> /etc/mongod.conf
+    fi
+fi
+if [ -n "{{ replica_set_name }}" ] && ! grep -q replSetName /etc/mongod.conf; then
+    printf 'replication:\n  replSetName: {{ replica_set_name }}\n' >> /etc/mongod.conf
+fi
+
+systemctl enable mongod
+systemctl restart mongod
+
+if [ "{{ bootstrap }}" != "true" ]; then
+    exit 0
+fi
+
+# The first member initiates the replica set once every member answers, then creates the
+# admin user through the localhost exception. systemd retries it until it succeeds, so a
+# slow member delays the set instead of leaving it uninitiated.
+cat > /usr/local/bin/mongodb-bootstrap <<'SCRIPT'
+#!/bin/bash
+set -uo pipefail
+
+token=$(curl -s -X PUT http://169.254.169.254/latest/api/token \
+    -H "X-aws-ec2-metadata-token-ttl-seconds: 60")
+metadata() {
+    curl -s -H "X-aws-ec2-metadata-token: $token" \
+        "http://169.254.169.254/latest/meta-data/$1"
+}
+region=$(metadata placement/region)
+self=$(metadata local-hostname)
+
+if ! password=$(aws secretsmanager get-secret-value --region "$region" \
+    --secret-id "{{ admin_secret_id }}" --query SecretString --output text); then
+    echo "Could not read the admin password" >&2
+    exit 1
+fi
+# isMaster answers without authentication
+is_master() {
+    mongo --host "$1" --quiet --eval "db.isMaster().$2" 2>/dev/null
+}
+
+# Done once the admin user exists, e.g. on a reboot
+if mongo admin --quiet -u {{ admin_user }} -p "$password" \
+    --eval 'db.runCommand({connectionStatus: 1}).ok' 2>/dev/null | grep -q 1; then
+    exit 0
+fi
+
+if [ -n "{{ replica_set_name }}" ] \
+    && [ "$(is_master localhost setName)" != "{{ replica_set_name }}" ]; then
+    # The members are found by their MongoDBReplicaSet tag and named by their private
+    # DNS, like in the connection string
+    hosts=$(aws ec2 describe-instances --region "$region" --output text \
+        --filters "Name=tag:MongoDBReplicaSet,Values={{ replica_set_name }}" \
+            "Name=instance-state-name,Values=running" \
+        --query 'Reservations[].Instances[].PrivateDnsName')
+    if [ "$(echo $hosts | wc -w)" -lt {{ member_count }} ]; then
+        echo "Not every member of {{ replica_set_name }} is running yet" >&2
+        exit 1
+    fi
+    for host in $hosts; do
+        set_name=$(is_master "$host" setName) || {
+            echo "$host does not answer yet" >&2
+            exit 1
+        }
+        # A replaced first member must not start a second set, rs.add() it from the primary
+        if [ "$set_name" = "{{ replica_set_name }}" ]; then
+            echo "{{ replica_set_name }} is already initiated without $self" >&2
+            exit 0
+        fi
+    done
+
+    members="{_id: 0, host: '$self:27017', priority: 2}"
+    id=1
+    for host in $hosts; do
+        if [ "$host" != "$self" ]; then
+            members="$members, {_id: $id, host: '$host:27017'}"
+            id=$((id + 1))
+        fi
+    done
+    mongo --quiet --eval "rs.initiate({_id: '{{ replica_set_name }}', members: [$members]})" \
+        || exit 1
+fi
+
+# Users are created on the primary, the first member has the highest priority
+if [ -n "{{ replica_set_name }}" ] && [ "$(is_master localhost ismaster)" != "true" ]; then
+    echo "Waiting for $self to become the primary of {{ replica_set_name }}" >&2
+    exit 1
+fi
+mongo admin --quiet --eval \
+    "db.createUser({user: '{{ admin_user }}', pwd: '$password', roles: ['root']})"
+SCRIPT
+chmod 700 /usr/local/bin/mongodb-bootstrap
+
+cat > /etc/systemd/system/mongodb-bootstrap.service <<'UNIT'
+[Unit]
+Description=Initiate the MongoDB replica set and create its admin user
+After=mongod.service network-online.target
+Wants=network-online.target
+
+[Service]
+Type=simple
+ExecStart=/usr/local/bin/mongodb-bootstrap
+Restart=on-failure
+RestartSec=30
+StartLimitInterval=0
+
+[Install]
+WantedBy=multi-user.target
+UNIT
+systemctl daemon-reload
+systemctl enable --now mongodb-bootstrap
@@ -0,0 +1,205 @@
+"""
+This module defines the MySQL/Aurora tuning profiles applied to our database parameter
+groups.
+
+A profile describes the workload (OLTP learner traffic or reporting/exports) and is turned
+into parameter values that RDS evaluates against the memory of the instance class.
+
+This includes:
+- Buffer pool and connection limits scaled with the instance memory
+- Query cache, temporary table and sort buffer sizing
+- Slow query logging thresholds
+- MySQL 8.0 engines have no query cache
+- Serverless instances leave their memory and connection sizing to Aurora
+"""
+from enum import Enum
+from fractions import Fraction
+from typing import Dict, List, Optional, Text, Union
+
+from pydantic import BaseModel
+
+GIB = 1024**3
+MIB = 1024**2
+
+# Same ceiling as the engine's own max_connections formula
+MAX_CONNECTIONS_LIMIT = 16000
+
+SERVERLESS_INSTANCE_CLASS = "db.serverless"
+
+# Aurora resizes the buffer pool and connection limit of serverless instances with their
+# capacity
+SERVERLESS_MANAGED_PARAMETERS = ("innodb_buffer_pool_size", "max_connections")
+
+# Parameter group families of the engines that removed the query cache
+NO_QUERY_CACHE_FAMILIES = ("mysql8.0", "aurora-mysql8.0")
+QUERY_CACHE_PARAMETERS = ("query_cache_type", "query_cache_size")
+
+ParameterValue = Union[Text, bool, int, float]
+
+
+class DTTuningProfile(str, Enum):
+    oltp = "oltp"
+    reporting = "reporting"
+
+
+class DTDBParameter(BaseModel):
+    """A single database parameter and how it should be applied."""
+
+    name: Text
+    value: Text
+    apply_method: Text = "immediate"
+
+
+class DTProfileSettings(BaseModel):
+    """Workload specific knobs from which the parameter values are derived."""
+
+    buffer_pool_ratio: float
+    memory_per_connection_mib: int
+    query_cache_ratio: float  # 0 disables the query cache
+    tmp_table_ratio: float
+    sort_buffer_mib: int
+    long_query_time: float
+
+
+PROFILE_SETTINGS: Dict[DTTuningProfile, DTProfileSettings] = {
+    # Many short transactions: large buffer pool, plenty of connections and no query
+    # cache invalidation churn on writes
+    DTTuningProfile.oltp: DTProfileSettings(
+        buffer_pool_ratio=0.75,
+        memory_per_connection_mib=12,
+        query_cache_ratio=0,
+        tmp_table_ratio=1 / 128,
+        sort_buffer_mib=2,
+        long_query_time=1,
+    ),
+    # Few long running aggregate queries: bigger per query buffers and fewer connections
+    DTTuningProfile.reporting: DTProfileSettings(
+        buffer_pool_ratio=0.7,
+        memory_per_connection_mib=32,
+        query_cache_ratio=1 / 32,
+        tmp_table_ratio=1 / 32,
+        sort_buffer_mib=8,
+        long_query_time=10,
+    ),
+}
+
+
+def _apply_overrides(
+    parameters: Dict[Text, DTDBParameter],
+    overrides: Optional[List[Dict[Text, ParameterValue]]],
+) -> List[DTDBParameter]:
+    for override in overrides or []:
+        value = override["value"]
+        if isinstance(value, bool):
+            value = int(value)
+        parameters[override["name"]] = DTDBParameter(
+            name=override["name"],
+            value=str(value),
+            apply_method=override.get("apply_method", "immediate"),
+        )
+    return list(parameters.values())
+
+
+def _memory_formula(ratio: float, limit: Optional[int] = None) -> Text:
+    # Parameter group formulas only accept integer arithmetic
+    fraction = Fraction(ratio).limit_denominator(1000)
+    formula = f"{{DBInstanceClassMemory*{fraction.numerator}/{fraction.denominator}}}"
+    if limit is not None:
+        formula = f"LEAST({formula},{limit})"
+    return formula
+
+
+def instance_parameters(
+    profile: Optional[DTTuningProfile],
+    instance_size: Text,
+    family: Text,
+    overrides: Optional[List[Dict[Text, ParameterValue]]] = None,
+) -> List[DTDBParameter]:
+    """Build the instance level parameters of a tuning profile.
+
+    The memory based values are DBInstanceClassMemory formulas, so they follow the
+    instance class. Serverless instances keep the engine values of
+    SERVERLESS_MANAGED_PARAMETERS.
+
+    :param profile: The workload profile to tune for, None keeps the engine defaults.
+    :type profile: Optional[DTTuningProfile]
+
+    :param instance_size: The instance class, e.g. db.t3.medium
+    :type instance_size: Text
+
+    :param family: The parameter group family, e.g. aurora-mysql5.7
+    :type family: Text
+
+    :param overrides: Parameters taking precedence over the profile, as dictionaries
+        with a name, a value and optionally an apply_method.
+    :type overrides: Optional[List[Dict[Text, ParameterValue]]]
+
+    :rtype: List[DTDBParameter]
+    """
+    if profile is None:
+        return _apply_overrides({}, overrides)
+
+    settings = PROFILE_SETTINGS[profile]
+    per_connection = settings.memory_per_connection_mib * MIB
+    tmp_table = _memory_formula(settings.tmp_table_ratio, GIB)
+
+    parameters = {
+        "innodb_buffer_pool_size": DTDBParameter(
+            name="innodb_buffer_pool_size",
+            value=_memory_formula(settings.buffer_pool_ratio),
+            apply_method="pending-reboot",
+        ),
+        "max_connections": DTDBParameter(
+            name="max_connections",
+            value=f"LEAST({{DBInstanceClassMemory/{per_connection}}},{MAX_CONNECTIONS_LIMIT})",
+        ),
+        "query_cache_type": DTDBParameter(
+            name="query_cache_type",
+            value="1" if settings.query_cache_ratio else "0",
+            apply_method="pending-reboot",
+        ),
+        "query_cache_size": DTDBParameter(
+            name="query_cache_size",
+            value=(
+                _memory_formula(settings.query_cache_ratio, 256 * MIB)
+                if settings.query_cache_ratio
+                else "0"
+            ),
+        ),
+        "tmp_table_size": DTDBParameter(name="tmp_table_size", value=tmp_table),
+        "max_heap_table_size": DTDBParameter(
+            name="max_heap_table_size", value=tmp_table
+        ),
+        "sort_buffer_size": DTDBParameter(
+            name="sort_buffer_size", value=str(settings.sort_buffer_mib * MIB)
+        ),
+        "slow_query_log": DTDBParameter(name="slow_query_log", value="1"),
+        "long_query_time": DTDBParameter(
+            name="long_query_time", value=str(settings.long_query_time)
+        ),
+        # Floods the slow query log under learner traffic, opt in through the overrides
+        "log_queries_not_using_indexes": DTDBParameter(
+            name="log_queries_not_using_indexes", value="0"
+        ),
+    }
+    if family in NO_QUERY_CACHE_FAMILIES:
+        for name in QUERY_CACHE_PARAMETERS:
+            del parameters[name]
+    if instance_size == SERVERLESS_INSTANCE_CLASS:
+        for name in SERVERLESS_MANAGED_PARAMETERS:
+            del parameters[name]
+
+    return _apply_overrides(parameters, overrides)
+
+
+def cluster_parameters(
+    overrides: Optional[List[Dict[Text, ParameterValue]]] = None,
+) -> List[DTDBParameter]:
+    """Build the Aurora cluster level parameters, the engine defaults unless overridden.
+
+    :param overrides: Parameters set on the cluster, e.g. character_set_server.
+    :type overrides: Optional[List[Dict[Text, ParameterValue]]]
+
+    :rtype: List[DTDBParameter]
+    """
+    return _apply_overrides({}, overrides)
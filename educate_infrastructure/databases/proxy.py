@@ -0,0 +1,197 @@
+"""
+This module defines a Pulumi component resource for encapsulating our best practices for
+putting an RDS Proxy in front of an Aurora cluster or an RDS instance.
+
+This includes:
+- Store the database credentials in Secrets Manager
+- Create an IAM role allowing the proxy to read them
+- Create the proxy, its connection pool settings and target
+- Optionally create a read-only endpoint for Aurora clusters
+"""
+import json
+from typing import Dict, List, Text, Union
+
+from pulumi import Output, ResourceOptions, info
+from pulumi_aws import iam, rds, secretsmanager
+from pulumi_aws.ec2 import SecurityGroup
+from pydantic import BaseModel, PositiveInt, conint
+
+from educate_infrastructure.databases.database import DTAuroraCluster, DTRDSInstance
+from educate_infrastructure.lib.component import DTComponent
+
+
+class DTRDSProxyConfig(BaseModel):
+    """Configuration object for defining the interface to create an RDS Proxy."""
+
+    name: Text
+    database: Union[DTAuroraCluster, DTRDSInstance]
+    username: Text = "dtdevops"
+    password: Output[Text]
+    subnet_ids: Output
+    security_groups: List[SecurityGroup]
+    tags: Dict = {"pulumi_managed": "true"}
+    engine_family: Text = "MYSQL"
+    require_tls: bool = False
+    idle_client_timeout: PositiveInt = 1800
+    connection_borrow_timeout: PositiveInt = 120
+    max_connections_percent: conint(ge=1, le=100) = 90  # type: ignore
+    max_idle_connections_percent: conint(ge=0, le=100) = 50  # type: ignore
+    reader_endpoint: bool = True  # Only used for Aurora clusters
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class DTRDSProxy(DTComponent):
+    """
+    Build an RDS Proxy pooling the connections to a DTAuroraCluster or DTRDSInstance
+
+    """
+
+    def __init__(self, proxy_config: DTRDSProxyConfig, opts: ResourceOptions = None):
+        """Create the proxy, its credentials, IAM role and target.
+
+        :param proxy_config: Configuration object for customizing the deployed proxy.
+        :type proxy_config: DTRDSProxyConfig
+
+        :returns: The constructed component resource object.
+
+        :rtype: DTRDSProxy
+        """
+        super().__init__(
+            "diceytech:infrastructure:aws:database:DTRDSProxy",
+            proxy_config.name,
+            opts,
+        )
+
+        self.secret = secretsmanager.Secret(
+            f"{proxy_config.name}-credentials",
+            description=f"Database credentials used by {proxy_config.name}",
+            tags=proxy_config.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        secretsmanager.SecretVersion(
+            f"{proxy_config.name}-credentials-version",
+            secret_id=self.secret.id,
+            secret_string=Output.secret(proxy_config.password).apply(
+                lambda password: json.dumps(
+                    {"username": proxy_config.username, "password": password}
+                )
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+
+        proxy_assume_role_policy = iam.get_policy_document(
+            statements=[
+                iam.GetPolicyDocumentStatementArgs(
+                    actions=["sts:AssumeRole"],
+                    principals=[
+                        iam.GetPolicyDocumentStatementPrincipalArgs(
+                            type="Service",
+                            identifiers=["rds.amazonaws.com"],
+                        )
+                    ],
+                )
+            ],
+        )
+
+        self.role = iam.Role(
+            f"{proxy_config.name}-role",
+            assume_role_policy=proxy_assume_role_policy.json,
+            tags=proxy_config.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        iam.RolePolicy(
+            f"{proxy_config.name}-secret-policy",
+            role=self.role.id,
+            policy=self.secret.arn.apply(
+                lambda arn: json.dumps(
+                    {
+                        "Version": "2012-10-17",
+                        "Statement": [
+                            {
+                                "Effect": "Allow",
+                                "Action": ["secretsmanager:GetSecretValue"],
+                                "Resource": [arn],
+                            }
+                        ],
+                    }
+                )
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+
+        security_group_ids = [group.id for group in proxy_config.security_groups]
+
+        self.proxy = rds.Proxy(
+            f"{proxy_config.name}-proxy",
+            name=proxy_config.name,
+            engine_family=proxy_config.engine_family,
+            role_arn=self.role.arn,
+            vpc_subnet_ids=proxy_config.subnet_ids,
+            vpc_security_group_ids=security_group_ids,
+            require_tls=proxy_config.require_tls,
+            idle_client_timeout=proxy_config.idle_client_timeout,
+            auths=[
+                rds.ProxyAuthArgs(
+                    auth_scheme="SECRETS",
+                    iam_auth="DISABLED",
+                    secret_arn=self.secret.arn,
+                )
+            ],
+            tags=proxy_config.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.target_group = rds.ProxyDefaultTargetGroup(
+            f"{proxy_config.name}-target-group",
+            db_proxy_name=self.proxy.name,
+            connection_pool_config=rds.ProxyDefaultTargetGroupConnectionPoolConfigArgs(
+                connection_borrow_timeout=proxy_config.connection_borrow_timeout,
+                max_connections_percent=proxy_config.max_connections_percent,
+                max_idle_connections_percent=proxy_config.max_idle_connections_percent,
+            ),
+            opts=ResourceOptions(parent=self),
+        )
+
+        database = proxy_config.database
+        is_cluster = isinstance(database, DTAuroraCluster)
+        self.target = rds.ProxyTarget(
+            f"{proxy_config.name}-target",
+            db_proxy_name=self.proxy.name,
+            target_group_name=self.target_group.name,
+            db_cluster_identifier=database.db_cluster.id if is_cluster else None,
+            db_instance_identifier=None if is_cluster else database.db_instance.id,
+            opts=ResourceOptions(parent=self),
+        )
+
+        self.reader_endpoint = None
+        if is_cluster and proxy_config.reader_endpoint:
+            self.reader_endpoint = rds.ProxyEndpoint(
+                f"{proxy_config.name}-reader-endpoint",
+                db_proxy_endpoint_name=f"{proxy_config.name}-reader",
+                db_proxy_name=self.proxy.name,
+                vpc_subnet_ids=proxy_config.subnet_ids,
+                vpc_security_group_ids=security_group_ids,
+                target_role="READ_ONLY",
+                tags=proxy_config.tags,
+                opts=ResourceOptions(parent=self, depends_on=[self.target]),
+            )
+
+        self.register_outputs(
+            {
+                "proxy_endpoint": self.proxy.endpoint,
+                "proxy_reader_endpoint": self.get_reader_endpoint(),
+            }
+        )
+
+        info(msg=f"{proxy_config.name} created.", resource=self)
+
+    def get_endpoint(self) -> Text:
+        return self.proxy.endpoint
+
+    def get_reader_endpoint(self) -> Text:
+        if self.reader_endpoint:
+            return self.reader_endpoint.endpoint
@@ -0,0 +1,99 @@
+import pulumi
+import pytest
+from pulumi_aws.ec2 import SecurityGroup
+from pydantic import ValidationError
+
+from educate_infrastructure.databases.cache import (
+    DTCache,
+    DTCacheConfig,
+    DTCacheEngine,
+)
+
+
+def build_cache(name, **kwargs):
+    return DTCache(
+        DTCacheConfig(
+            name=name,
+            subnet_ids=pulumi.Output.from_input(["subnet-0a1b2c3d4e5f60718"]),
+            security_groups=[SecurityGroup(f"{name}-sg")],
+            tags={"Name": name},
+            **kwargs,
+        )
+    )
+
+
+class TestDTCache(object):
+    @pulumi.runtime.test
+    def test_redis_replication_group_with_replica(self):
+        cache = build_cache("educate-cache-test")
+
+        def check_group(args):
+            clusters, failover, multi_az, num_node_groups, description = args
+            assert clusters == 2
+            assert failover
+            assert multi_az
+            assert num_node_groups is None
+            assert description == "Redis for educate-cache-test"
+
+        return pulumi.Output.all(
+            cache.replication_group.num_cache_clusters,
+            cache.replication_group.automatic_failover_enabled,
+            cache.replication_group.multi_az_enabled,
+            cache.replication_group.num_node_groups,
+            cache.replication_group.description,
+        ).apply(check_group)
+
+    @pulumi.runtime.test
+    def test_cluster_mode(self):
+        cache = build_cache("educate-cache-cluster-test", num_node_groups=3)
+        assert cache.config.parameter_group_name == "default.redis6.x.cluster.on"
+
+        def check_cluster_mode(args):
+            num_node_groups, replicas_per_node_group, clusters = args
+            assert num_node_groups == 3
+            assert replicas_per_node_group == 1
+            assert clusters is None
+
+        return pulumi.Output.all(
+            cache.replication_group.num_node_groups,
+            cache.replication_group.replicas_per_node_group,
+            cache.replication_group.num_cache_clusters,
+        ).apply(check_cluster_mode)
+
+    @pulumi.runtime.test
+    def test_redis_uses_tls_and_auth(self):
+        cache = build_cache(
+            "educate-cache-auth-test",
+            auth_token=pulumi.Output.secret("not-a-real-auth-token"),
+        )
+
+        def check_encryption(args):
+            transit_encryption, auth_token = args
+            assert transit_encryption is True
+            assert auth_token == "not-a-real-auth-token"
+
+        assert cache.get_auth_token_secret_arn() is not None
+        return pulumi.Output.all(
+            cache.replication_group.transit_encryption_enabled,
+            cache.replication_group.auth_token,
+        ).apply(check_encryption)
+
+    def test_memcached(self):
+        cache = build_cache("educate-memcached-test", engine=DTCacheEngine.memcached)
+        assert cache.replication_group is None
+        assert cache.memcached_cluster is not None
+        assert cache.get_auth_token_secret_arn() is None
+        assert cache.config.engine_version == "1.6.17"
+        assert cache.get_port() == 11211
+
+
+def test_auth_token_needs_redis_tls():
+    with pytest.raises(ValidationError):
+        DTCacheConfig(
+            name="educate-cache-plaintext-test",
+            subnet_ids=pulumi.Output.from_input(["subnet-0a1b2c3d4e5f60718"]),
+            security_groups=[],
+            tags={"Name": "educate-cache-plaintext-test"},
+            transit_encryption=False,
+            auth_token=pulumi.Output.secret("not-a-real-auth-token"),
+        )
@@ -1,20 +1,306 @@
 import pulumi
 import pytest
+from pulumi_aws import rds
+from pulumi_aws.ec2 import SecurityGroup
+from pydantic import ValidationError
 
-from educate_infrastructure.databases.database import DTRDSInstance, DTMySQLConfig
+from educate_infrastructure.databases.database import (
+    DTAuroraCluster,
+    DTAuroraConfig,
+    DTAuroraReaderScalingConfig,
+    DTAuroraServerlessConfig,
+    DTMySQLConfig,
+    DTRDSInstance,
+    DTReaderScalingMetric,
+    DTReplicaDBConfig,
+    parameter_group_family,
+)
+from educate_infrastructure.lib.monitoring import DTMonitoringConfig, attach_monitoring
 
 
-class TestDTVpc(object):
+class TestDTRDSInstance(object):
     """ Initial tests doing basic coverage """
 
-    def setup(self):
-        self.config = DTMySQLConfig()
+    @classmethod
+    def setup_class(cls):
+        cls.config = DTMySQLConfig(
+            instance_name="educate-sql-db-basic",
+            password="not-a-real-password",
+            subnet_group_name="educate-app-db-subnet-group",
+            security_groups=[SecurityGroup("mysql-db-basic-sg")],
+            tags={"Name": "educate-sql-db-basic"},
+        )
 
-        self.rds = DTRDSInstance(db_config=self.config)
+        cls.rds = DTRDSInstance(db_config=cls.config)
 
     @pulumi.runtime.test
     def test_rds_created(self):
-        def check_name(args):
-            pass
+        def check_name(identifier):
+            assert identifier == "educate-sql-db-basic"
 
-        return pulumi.Output.all(self.rds).apply(check_name)
+        return self.rds.db_instance.identifier.apply(check_name)
+
+
+class TestDTRDSReadReplicas(object):
+    @classmethod
+    def setup_class(cls):
+        cls.security_group = SecurityGroup("mysql-db-sg")
+        cls.replica_security_group = SecurityGroup("mysql-db-replica-sg")
+        cls.config = DTMySQLConfig(
+            instance_name="educate-sql-db-test",
+            password="not-a-real-password",
+            subnet_group_name="educate-app-db-subnet-group",
+            security_groups=[cls.security_group],
+            tags={"Name": "educate-sql-db-test"},
+            read_replica=DTReplicaDBConfig(
+                replica_count=2,
+                availability_zones=["eu-west-2b", "eu-west-2c"],
+                security_groups=[cls.replica_security_group],
+            ),
+        )
+        cls.rds = DTRDSInstance(db_config=cls.config)
+
+    def test_replicas_created(self):
+        assert len(self.rds.db_replicas) == 2
+
+    @pulumi.runtime.test
+    def test_replicas_spread_over_zones(self):
+        def check_zones(zones):
+            assert zones == ["eu-west-2b", "eu-west-2c"]
+
+        return pulumi.Output.all(
+            *[replica.availability_zone for replica in self.rds.db_replicas]
+        ).apply(check_zones)
+
+    @pulumi.runtime.test
+    def test_replicas_use_their_own_security_groups(self):
+        def check_security_groups(args):
+            replica_groups, replica_sg_id = args
+            assert replica_groups == [replica_sg_id]
+
+        return pulumi.Output.all(
+            self.rds.db_replicas[0].vpc_security_group_ids,
+            self.replica_security_group.id,
+        ).apply(check_security_groups)
+
+    @pulumi.runtime.test
+    def test_reader_endpoints_exported(self):
+        def check_endpoints(endpoints):
+            assert endpoints == [
+                "educate-sql-db-test-replica-0.eu-west-2.rds.amazonaws.com:3306",
+                "educate-sql-db-test-replica-1.eu-west-2.rds.amazonaws.com:3306",
+            ]
+
+        return self.rds.get_reader_endpoints().apply(check_endpoints)
+
+
+class TestDTAuroraCluster(object):
+    @classmethod
+    def setup_class(cls):
+        cls.config = DTAuroraConfig(
+            instance_name="educate-sql-db-test",
+            subnet_group_name="educate-app-db-subnet-group",
+            security_groups=[SecurityGroup("aurora-db-sg")],
+            tags={"Name": "educate-sql-db-test"},
+            instance_count=3,
+            availability_zones=["eu-west-2a", "eu-west-2b"],
+            reader_scaling=DTAuroraReaderScalingConfig(
+                max_capacity=4, metric=DTReaderScalingMetric.connections
+            ),
+        )
+        cls.cluster = DTAuroraCluster(db_config=cls.config)
+
+    @pulumi.runtime.test
+    def test_writer_keeps_cluster_identifier(self):
+        def check_identifiers(identifiers):
+            assert identifiers == [
+                "educate-sql-db-test",
+                "educate-sql-db-test-1",
+                "educate-sql-db-test-2",
+            ]
+
+        return pulumi.Output.all(
+            *[instance.identifier for instance in self.cluster.cluster_instances]
+        ).apply(check_identifiers)
+
+    @pulumi.runtime.test
+    def test_instances_spread_over_zones(self):
+        def check_zones(zones):
+            assert zones == ["eu-west-2a", "eu-west-2b", "eu-west-2a"]
+
+        return pulumi.Output.all(
+            *[instance.availability_zone for instance in self.cluster.cluster_instances]
+        ).apply(check_zones)
+
+    @pulumi.runtime.test
+    def test_reader_scaling_target(self):
+        def check_target(args):
+            dimension, max_capacity = args
+            assert dimension == "rds:cluster:ReadReplicaCount"
+            assert max_capacity == 4
+
+        return pulumi.Output.all(
+            self.cluster.reader_scaling_target.scalable_dimension,
+            self.cluster.reader_scaling_target.max_capacity,
+        ).apply(check_target)
+
+    @pulumi.runtime.test
+    def test_monitoring_alarms_on_replica_lag(self):
+        monitoring = attach_monitoring(
+            self.cluster,
+            DTMonitoringConfig(name="educate-sql-db-test", thresholds={"cpu": 70}),
+        )
+        alarm = monitoring.alarms["replica_lag"]
+
+        def check_alarm(args):
+            dimensions, cpu_threshold = args
+            assert dimensions == {
+                "DBClusterIdentifier": "educate-sql-db-test",
+                "Role": "READER",
+            }
+            assert cpu_threshold == 70
+
+        return pulumi.Output.all(
+            alarm.dimensions, monitoring.alarms["cpu"].threshold
+        ).apply(check_alarm)
+
+
+SERVERLESS_ENGINE_VERSION = "8.0.mysql_aurora.3.02.0"
+
+
+def aurora_config(instance_name="educate-sql-db-serverless", **kwargs):
+    return DTAuroraConfig(
+        instance_name=instance_name,
+        subnet_group_name="educate-app-db-subnet-group",
+        security_groups=[SecurityGroup("aurora-serverless-db-sg")],
+        tags={"Name": "educate-sql-db-serverless"},
+        **kwargs,
+    )
+
+
+class TestDTAuroraServerlessCluster(object):
+    @classmethod
+    def setup_class(cls):
+        cls.cluster = DTAuroraCluster(
+            db_config=aurora_config(
+                engine_version=SERVERLESS_ENGINE_VERSION,
+                instance_count=2,
+                serverless=DTAuroraServerlessConfig(min_capacity=0.5, max_capacity=16),
+            )
+        )
+
+    @pulumi.runtime.test
+    def test_cluster_scales_between_capacities(self):
+        def check_scaling(scaling):
+            assert scaling["min_capacity"] == 0.5
+            assert scaling["max_capacity"] == 16
+
+        return self.cluster.db_cluster.serverlessv2_scaling_configuration.apply(
+            check_scaling
+        )
+
+    @pulumi.runtime.test
+    def test_instances_use_serverless_class(self):
+        def check_classes(classes):
+            assert classes == ["db.serverless", "db.serverless"]
+
+        return pulumi.Output.all(
+            *[instance.instance_class for instance in self.cluster.cluster_instances]
+        ).apply(check_classes)
+
+
+def test_serverless_config_selects_serverless_class():
+    config = aurora_config(
+        engine_version=SERVERLESS_ENGINE_VERSION,
+        serverless=DTAuroraServerlessConfig(max_capacity=8),
+    )
+
+    assert config.instance_class == "db.serverless"
+    assert aurora_config().instance_class == rds.InstanceType.T3_MEDIUM
+
+
+def test_family_follows_engine_version():
+    assert aurora_config().family == "aurora-mysql5.7"
+    assert aurora_config(engine_version=SERVERLESS_ENGINE_VERSION).family == (
+        "aurora-mysql8.0"
+    )
+    with pytest.raises(ValidationError):
+        aurora_config(
+            engine_version=SERVERLESS_ENGINE_VERSION, family="aurora-mysql5.7"
+        )
+
+
+def test_family_needs_a_known_engine():
+    assert parameter_group_family("mysql", "5.7.38") == "mysql5.7"
+    with pytest.raises(ValueError):
+        parameter_group_family("postgres", "13.4")
+
+
+class TestDTAuroraMySQL3Cluster(object):
+    @classmethod
+    def setup_class(cls):
+        cls.cluster = DTAuroraCluster(
+            db_config=aurora_config(
+                instance_name="educate-sql-db-mysql3",
+                engine_version=SERVERLESS_ENGINE_VERSION,
+                tuning_profile="reporting",
+            )
+        )
+
+    @pulumi.runtime.test
+    def test_provisioned_instances_have_no_query_cache(self):
+        def check_parameters(args):
+            family, parameters = args
+            names = [parameter["name"] for parameter in parameters]
+            assert family == "aurora-mysql8.0"
+            assert "innodb_buffer_pool_size" in names
+            assert "query_cache_type" not in names
+            assert "query_cache_size" not in names
+
+        return pulumi.Output.all(
+            self.cluster.parameter_group.family,
+            self.cluster.parameter_group.parameters,
+        ).apply(check_parameters)
+
+    @pulumi.runtime.test
+    def test_parameter_groups_can_be_replaced(self):
+        def check_names(args):
+            cluster_group_prefix, group_prefix = args
+            assert cluster_group_prefix.startswith("educate-sql-db-mysql3-")
+            assert group_prefix.startswith("educate-sql-db-mysql3-")
+
+        return pulumi.Output.all(
+            self.cluster.cluster_parameter_group.name_prefix,
+            self.cluster.parameter_group.name_prefix,
+        ).apply(check_names)
+
+    @pulumi.runtime.test
+    def test_cluster_allows_major_version_upgrade(self):
+        def check_upgrade(args):
+            allowed, instance_group, group = args
+            assert allowed
+            assert instance_group == group
+
+        return pulumi.Output.all(
+            self.cluster.db_cluster.allow_major_version_upgrade,
+            self.cluster.db_cluster.db_instance_parameter_group_name,
+            self.cluster.parameter_group.name,
+        ).apply(check_upgrade)
+
+
+def test_serverless_needs_aurora_mysql_3():
+    with pytest.raises(ValidationError):
+        aurora_config(serverless=DTAuroraServerlessConfig())
+
+
+def test_serverless_capacity_in_half_acus():
+    with pytest.raises(ValidationError):
+        DTAuroraServerlessConfig(min_capacity=0.75)
+    with pytest.raises(ValidationError):
+        DTAuroraServerlessConfig(min_capacity=8, max_capacity=4)
+
+
+def test_reader_scaling_bounds():
+    assert DTAuroraReaderScalingConfig(min_capacity=2, max_capacity=2).max_capacity == 2
+    with pytest.raises(ValidationError):
+        DTAuroraReaderScalingConfig(min_capacity=4, max_capacity=2)
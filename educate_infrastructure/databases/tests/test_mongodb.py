@@ -0,0 +1,245 @@
+import gzip
+
+import pulumi
+import pytest
+from pulumi_aws import ec2
+from pydantic import ValidationError
+
+from educate_infrastructure.databases.mongodb import (
+    HIGH_PERFORMANCE_STORAGE,
+    DTEBSVolumeConfig,
+    DTMongoDB,
+    DTMongoDBConfig,
+)
+from educate_infrastructure.lib.monitoring import DTMonitoringConfig, attach_monitoring
+
+PRIVATE_SUBNET_IDS = ["subnet-0a1b2c3d4e5f60718", "subnet-0d06af077da3e1c6f"]
+APPS_VPC_CIDR_BLOCK = "10.12.0.0/16"
+
+
+def mongodb_config(**kwargs):
+    return DTMongoDBConfig(
+        name="educate-mongodb-test",
+        vpc_id=pulumi.Output.from_input("vpc-0d905953c8537847c"),
+        subnet_id=pulumi.Output.from_input(PRIVATE_SUBNET_IDS[0]),
+        ingress_cidr_blocks=[APPS_VPC_CIDR_BLOCK],
+        instance_type=ec2.InstanceType.T3A_MICRO,
+        **kwargs,
+    )
+
+
+def replica_set_config(**kwargs):
+    settings = {
+        "replica_set_name": "rs0",
+        "member_count": 3,
+        "attach_user_data": True,
+        "admin_password": pulumi.Output.from_input("not-a-real-password"),
+        "key_file": pulumi.Output.from_input("not-a-real-key-file"),
+    }
+    return mongodb_config(**{**settings, **kwargs})
+
+
+class TestDTMongoDBReplicaSet(object):
+    @classmethod
+    def setup_class(cls):
+        cls.mongodb = DTMongoDB(
+            replica_set_config(subnet_ids=pulumi.Output.from_input(PRIVATE_SUBNET_IDS))
+        )
+
+    def test_members_created(self):
+        assert len(self.mongodb.members) == 3
+
+    @pulumi.runtime.test
+    def test_members_spread_over_subnets(self):
+        def check_subnets(subnet_ids):
+            assert subnet_ids == PRIVATE_SUBNET_IDS + PRIVATE_SUBNET_IDS[:1]
+
+        return pulumi.Output.all(
+            *[member.subnet_id for member in self.mongodb.members]
+        ).apply(check_subnets)
+
+    @pulumi.runtime.test
+    def test_connection_string_lists_every_member(self):
+        def check_connection_string(connection_string):
+            assert connection_string == (
+                "mongodb://educate-mongodb-test-instance.eu-west-2.compute.internal:27017,"
+                "educate-mongodb-test-instance-1.eu-west-2.compute.internal:27017,"
+                "educate-mongodb-test-instance-2.eu-west-2.compute.internal:27017"
+                "/?replicaSet=rs0&readPreference=secondaryPreferred"
+            )
+
+        return self.mongodb.get_connection_string().apply(check_connection_string)
+
+    def test_user_data_configures_the_replica_set(self):
+        document = gzip.decompress(self.mongodb.user_data.payload).decode()
+        assert "replSetName: rs0" in document
+        assert "mount_volume /dev/sdf /data" in document
+
+    def test_user_data_enables_authorization(self):
+        document = gzip.decompress(self.mongodb.user_data.payload).decode()
+        assert "bindIp: 127.0.0.1,$private_ip" in document
+        assert "authorization: enabled" in document
+        assert "keyFile: /etc/mongod.key" in document
+        assert '--secret-id "educate-mongodb-test/key-file"' in document
+        assert '--secret-id "educate-mongodb-test/admin-password"' in document
+
+    def test_first_member_initiates_the_replica_set(self):
+        documents = [
+            gzip.decompress(user_data.payload).decode()
+            for user_data in self.mongodb.member_user_data
+        ]
+        assert '"true" != "true"' in documents[0]
+        assert all('"false" != "true"' in document for document in documents[1:])
+        assert "Values=rs0" in documents[0]
+        assert "-lt 3 ]" in documents[0]
+        # Retried by systemd until every member answers
+        assert "Restart=on-failure" in documents[0]
+
+    @pulumi.runtime.test
+    def test_members_get_their_own_user_data(self):
+        def check_user_data(user_data):
+            assert user_data == [
+                member_user_data.base64()
+                for member_user_data in self.mongodb.member_user_data
+            ]
+
+        return pulumi.Output.all(
+            *[member.user_data_base64 for member in self.mongodb.members]
+        ).apply(check_user_data)
+
+    @pulumi.runtime.test
+    def test_secrets_are_named_for_the_boot_script(self):
+        def check_names(names):
+            assert names == [
+                "educate-mongodb-test/admin-password",
+                "educate-mongodb-test/key-file",
+            ]
+
+        return pulumi.Output.all(
+            self.mongodb.admin_password_secret.name, self.mongodb.key_file_secret.name
+        ).apply(check_names)
+
+
+def test_replica_set_needs_odd_member_count():
+    with pytest.raises(ValidationError):
+        replica_set_config(member_count=2)
+
+
+def test_multiple_members_need_replica_set_name():
+    with pytest.raises(ValidationError):
+        mongodb_config(member_count=3)
+
+
+def test_replica_set_needs_user_data():
+    with pytest.raises(ValidationError):
+        mongodb_config(replica_set_name="rs0", member_count=3)
+
+
+def test_user_data_needs_admin_password():
+    with pytest.raises(ValidationError):
+        mongodb_config(attach_user_data=True)
+
+
+def test_replica_set_needs_key_file():
+    with pytest.raises(ValidationError):
+        replica_set_config(key_file=None)
+
+
+class TestDTMongoDBStorage(object):
+    @classmethod
+    def setup_class(cls):
+        cls.mongodb = DTMongoDB(mongodb_config(storage=HIGH_PERFORMANCE_STORAGE))
+
+    @pulumi.runtime.test
+    def test_volumes_follow_storage_profile(self):
+        data = self.mongodb.member_volumes[0]["/dev/sdf"]
+
+        def check_volumes(args):
+            volume_type, iops, throughput, ebs_optimized = args
+            assert volume_type == "gp3"
+            assert iops == 6000
+            assert throughput == 250
+            assert ebs_optimized is True
+
+        return pulumi.Output.all(
+            data.type,
+            data.iops,
+            data.throughput,
+            self.mongodb.members[0].ebs_optimized,
+        ).apply(check_volumes)
+
+    @pulumi.runtime.test
+    def test_volumes_are_separate_from_the_instance(self):
+        data = self.mongodb.member_volumes[0]["/dev/sdf"]
+
+        def check_volumes(args):
+            inline_devices, availability_zone, member_zone = args
+            assert not inline_devices
+            assert availability_zone == member_zone
+
+        return pulumi.Output.all(
+            self.mongodb.members[0].ebs_block_devices,
+            data.availability_zone,
+            self.mongodb.members[0].availability_zone,
+        ).apply(check_volumes)
+
+    @pulumi.runtime.test
+    def test_volume_alarms_watch_the_volumes(self):
+        monitoring = attach_monitoring(
+            self.mongodb, DTMonitoringConfig(name="educate-mongodb-volume-test")
+        )
+
+        def check_dimensions(args):
+            dimensions, volume_id = args
+            assert dimensions == {"VolumeId": volume_id}
+
+        return pulumi.Output.all(
+            monitoring.alarms["volume_queue_length-0-sdf"].dimensions,
+            self.mongodb.member_volumes[0]["/dev/sdf"].id,
+        ).apply(check_dimensions)
+
+    @pulumi.runtime.test
+    def test_mongod_is_only_reachable_from_the_apps_vpc(self):
+        def check_ingress(ingress):
+            assert [rule["cidr_blocks"] for rule in ingress] == [[APPS_VPC_CIDR_BLOCK]]
+
+        return self.mongodb.security_group.ingress.apply(check_ingress)
+
+    @pulumi.runtime.test
+    def test_user_data_is_not_attached_by_default(self):
+        def check_user_data(user_data):
+            assert user_data is None
+
+        return self.mongodb.members[0].user_data_base64.apply(check_user_data)
+
+    def test_gp3_volumes_have_no_burst_balance_alarm(self):
+        monitoring = attach_monitoring(
+            self.mongodb, DTMonitoringConfig(name="educate-mongodb-storage-test")
+        )
+        assert sorted(monitoring.alarms) == [
+            "cpu-0",
+            "volume_queue_length-0-sdf",
+            "volume_queue_length-0-sdg",
+            "volume_queue_length-0-sdh",
+        ]
+
+
+def test_provisioned_iops_volumes_need_iops():
+    with pytest.raises(ValidationError):
+        DTEBSVolumeConfig(
+            device_name="/dev/sdf",
+            name="MongoDB Data",
+            volume_size=20,
+            volume_type="io2",
+        )
+
+
+def test_throughput_is_gp3_only():
+    with pytest.raises(ValidationError):
+        DTEBSVolumeConfig(
+            device_name="/dev/sdf",
+            name="MongoDB Data",
+            volume_size=20,
+            volume_type="gp2",
+            throughput=250,
+        )
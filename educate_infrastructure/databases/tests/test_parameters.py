@@ -0,0 +1,111 @@
+from educate_infrastructure.databases.parameters import (
+    DTTuningProfile,
+    cluster_parameters,
+    instance_parameters,
+)
+
+
+def as_dict(parameters):
+    return {parameter.name: parameter.value for parameter in parameters}
+
+
+def test_values_scale_with_instance_memory():
+    parameters = as_dict(
+        instance_parameters(DTTuningProfile.oltp, "db.t3.medium", "aurora-mysql5.7")
+    )
+
+    assert parameters["innodb_buffer_pool_size"] == "{DBInstanceClassMemory*3/4}"
+    assert (
+        parameters["max_connections"] == "LEAST({DBInstanceClassMemory/12582912},16000)"
+    )
+    assert (
+        parameters["tmp_table_size"]
+        == "LEAST({DBInstanceClassMemory*1/128},1073741824)"
+    )
+
+
+def test_reporting_profile_enables_query_cache():
+    oltp = as_dict(
+        instance_parameters(DTTuningProfile.oltp, "db.t3.large", "aurora-mysql5.7")
+    )
+    reporting = as_dict(
+        instance_parameters(DTTuningProfile.reporting, "db.t3.large", "aurora-mysql5.7")
+    )
+
+    assert oltp["query_cache_type"] == "0"
+    assert reporting["query_cache_type"] == "1"
+    assert (
+        reporting["query_cache_size"] == "LEAST({DBInstanceClassMemory*1/32},268435456)"
+    )
+    assert float(reporting["long_query_time"]) > float(oltp["long_query_time"])
+    assert (
+        reporting["max_connections"] == "LEAST({DBInstanceClassMemory/33554432},16000)"
+    )
+
+
+def test_mysql_8_has_no_query_cache():
+    for family in ("mysql8.0", "aurora-mysql8.0"):
+        parameters = as_dict(
+            instance_parameters(DTTuningProfile.reporting, "db.r5.large", family)
+        )
+
+        assert "query_cache_type" not in parameters
+        assert "query_cache_size" not in parameters
+        assert parameters["innodb_buffer_pool_size"] == "{DBInstanceClassMemory*7/10}"
+
+
+def test_overrides_take_precedence():
+    parameters = instance_parameters(
+        DTTuningProfile.oltp,
+        "db.t3.medium",
+        "aurora-mysql5.7",
+        [
+            {"name": "slow_query_log", "value": False},
+            {"name": "wait_timeout", "value": 60},
+        ],
+    )
+
+    assert as_dict(parameters)["slow_query_log"] == "0"
+    assert as_dict(parameters)["wait_timeout"] == "60"
+
+
+def test_no_profile_keeps_engine_defaults():
+    assert instance_parameters(None, "db.t3.medium", "aurora-mysql5.7") == []
+
+
+def test_cluster_keeps_engine_defaults():
+    assert cluster_parameters() == []
+    parameters = cluster_parameters(
+        [{"name": "character_set_server", "value": "utf8mb4"}]
+    )
+
+    assert as_dict(parameters) == {"character_set_server": "utf8mb4"}
+
+
+def test_unindexed_queries_are_logged_on_request():
+    for profile in DTTuningProfile:
+        parameters = as_dict(
+            instance_parameters(profile, "db.t3.large", "aurora-mysql5.7")
+        )
+
+        assert parameters["log_queries_not_using_indexes"] == "0"
+
+    parameters = instance_parameters(
+        DTTuningProfile.oltp,
+        "db.t3.large",
+        "aurora-mysql5.7",
+        [{"name": "log_queries_not_using_indexes", "value": True}],
+    )
+
+    assert as_dict(parameters)["log_queries_not_using_indexes"] == "1"
+
+
+def test_serverless_leaves_capacity_sizing_to_aurora():
+    parameters = as_dict(
+        instance_parameters(DTTuningProfile.oltp, "db.serverless", "aurora-mysql8.0")
+    )
+
+    assert "innodb_buffer_pool_size" not in parameters
+    assert "max_connections" not in parameters
+    assert "query_cache_type" not in parameters
+    assert parameters["slow_query_log"] == "1"
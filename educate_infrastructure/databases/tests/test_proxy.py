@@ -0,0 +1,55 @@
+import pulumi
+from pulumi_aws.ec2 import SecurityGroup
+
+from educate_infrastructure.databases.database import DTAuroraCluster, DTAuroraConfig
+from educate_infrastructure.databases.proxy import DTRDSProxy, DTRDSProxyConfig
+
+
+class TestDTRDSProxy(object):
+    @classmethod
+    def setup_class(cls):
+        cls.security_group = SecurityGroup("aurora-db-sg")
+        cls.cluster = DTAuroraCluster(
+            db_config=DTAuroraConfig(
+                instance_name="educate-sql-db-test",
+                subnet_group_name="educate-app-db-subnet-group",
+                security_groups=[cls.security_group],
+                tags={"Name": "educate-sql-db-test"},
+            )
+        )
+        cls.proxy = DTRDSProxy(
+            DTRDSProxyConfig(
+                name="educate-sql-proxy-test",
+                database=cls.cluster,
+                password=pulumi.Output.from_input("not-a-real-password"),
+                subnet_ids=pulumi.Output.from_input(["subnet-0a1b2c3d4e5f60718"]),
+                security_groups=[cls.security_group],
+            )
+        )
+
+    @pulumi.runtime.test
+    def test_proxy_targets_the_cluster(self):
+        def check_target(args):
+            cluster_identifier, instance_identifier, cluster_id = args
+            assert cluster_identifier == cluster_id
+            assert instance_identifier is None
+
+        return pulumi.Output.all(
+            self.proxy.target.db_cluster_identifier,
+            self.proxy.target.db_instance_identifier,
+            self.cluster.db_cluster.id,
+        ).apply(check_target)
+
+    @pulumi.runtime.test
+    def test_proxy_uses_secret_credentials(self):
+        def check_auth(args):
+            auths, secret_arn = args
+            assert auths[0]["auth_scheme"] == "SECRETS"
+            assert auths[0]["secret_arn"] == secret_arn
+
+        return pulumi.Output.all(self.proxy.proxy.auths, self.proxy.secret.arn).apply(
+            check_auth
+        )
+
+    def test_cluster_gets_reader_endpoint(self):
+        assert self.proxy.reader_endpoint is not None
@@ -5,24 +5,93 @@
 from ipaddress import IPv4Network
 from pulumi import Config, export, get_stack
 
+from educate_infrastructure.infra.network.peering import (
+    DTPeeringMode,
+    DTVPCPeering,
+    DTVPCPeeringConfig,
+)
+from educate_infrastructure.infra.network.subnets import (
+    DEFAULT_SUBNET_TIERS,
+    DTSubnetTierConfig,
+)
 from educate_infrastructure.infra.network.vpc import (
+    DEFAULT_INTERFACE_ENDPOINTS,
+    DTNatStrategy,
     DTVpc,
     DTVPCConfig,
 )
+from educate_infrastructure.lib.component import export_component_report
+from educate_infrastructure.lib.monitoring import (
+    attach_monitoring,
+    stack_monitoring_config,
+)
 
 env = get_stack()
+aws_config = Config("aws")
 
 apps_config = Config("apps_vpc")
 app_network = IPv4Network(apps_config.require("cidr_block"))
+app_subnet_tiers = DEFAULT_SUBNET_TIERS
+if apps_config.get_object("subnet_tiers"):
+    app_subnet_tiers = [
+        DTSubnetTierConfig(**tier) for tier in apps_config.get_object("subnet_tiers")
+    ]
 apps_network_config = DTVPCConfig(
     name="educate-app",
     cidr_block=app_network,
+    az_count=apps_config.get_int("az_count") or 2,
     rds_network=True,
+    nat_strategy=DTNatStrategy(apps_config.get("nat_strategy") or "single"),
+    region=aws_config.require("region"),
+    interface_endpoints=apps_config.get_object("interface_endpoints")
+    or DEFAULT_INTERFACE_ENDPOINTS,
+    subnet_tiers=app_subnet_tiers,
+    db_subnet_tier=apps_config.get("db_subnet_tier"),
+    import_route_ids=apps_config.get_object("import_route_ids") or {},
 )
 
 apps_vpc = DTVpc(apps_network_config)
+apps_vpc_monitoring = attach_monitoring(
+    apps_vpc, stack_monitoring_config(f"educate-app-vpc-{env}", "vpc")
+)
+
+# The databases VPC has private subnets only and no route to the internet, only to the
+# VPCs peered with it. Opt in with db_vpc:enabled once the databases move to it.
+db_config = Config("db_vpc")
+db_vpc = None
+if db_config.get_bool("enabled"):
+    db_network_config = DTVPCConfig(
+        name="educate-db",
+        cidr_block=IPv4Network(db_config.require("cidr_block")),
+        rds_network=True,
+        nat_strategy=DTNatStrategy.none,
+        region=aws_config.require("region"),
+        subnet_tiers=[DTSubnetTierConfig(name="private")],
+        internet_gateway=False,
+    )
+    db_vpc = DTVpc(db_network_config)
+
+    peering_config = Config("peering")
+    vpc_peering = DTVPCPeering(
+        DTVPCPeeringConfig(
+            name=f"educate-{env}",
+            vpcs=[apps_vpc, db_vpc],
+            mode=DTPeeringMode(peering_config.get("mode") or "mesh"),
+        )
+    )
 
 export("apps_vpc_id", apps_vpc.get_id())
+export("apps_vpc_cidr_block", str(app_network))
 export("apps_public_subnet_ids", apps_vpc.get_public_subnet_ids())
 export("apps_private_subnet_ids", apps_vpc.get_private_subnet_ids())
 export("db_subnet_group_name", apps_vpc.get_db_subnet_group_name())
+for tier in app_subnet_tiers:
+    export(f"apps_{tier.name}_tier_subnet_ids", apps_vpc.get_tier_subnet_ids(tier.name))
+if db_vpc:
+    export("db_vpc_id", db_vpc.get_id())
+    export("db_private_subnet_ids", db_vpc.get_private_subnet_ids())
+    export("db_vpc_subnet_group_name", db_vpc.get_db_subnet_group_name())
+    export("peering_connection_ids", vpc_peering.get_peering_connection_ids())
+    export("transit_gateway_id", vpc_peering.get_transit_gateway_id())
+
+export_component_report()
@@ -0,0 +1,175 @@
+"""
+This module defines a Pulumi component resource connecting several of our VPCs to each
+other, either directly or through a transit gateway.
+
+This includes:
+- Check up front that the CIDR blocks of the VPCs do not overlap
+- mesh: peer every pair of VPCs
+- transit_gateway: attach every VPC to a single transit gateway hub
+- Route the traffic to the other VPCs from every public and private route table, so that
+  the private subnets reach their peers directly instead of through a NAT gateway
+"""
+from enum import Enum
+from itertools import combinations
+from typing import Dict, List, Text
+
+from pulumi import ResourceOptions, info
+from pulumi_aws import ec2, ec2transitgateway
+from pydantic import BaseModel, validator
+
+from educate_infrastructure.infra.network.vpc import DTVpc, DTVPCPeeringConnection
+from educate_infrastructure.lib.component import DTComponent
+
+
+class DTPeeringMode(str, Enum):
+    mesh = "mesh"  # A peering connection between every pair of VPCs
+    transit_gateway = "transit_gateway"  # Every VPC attached to one transit gateway
+
+
+def check_cidr_overlap(vpcs: List[DTVpc]):
+    """Fail when two VPCs can not be routed to each other.
+
+    :param vpcs: The VPCs to connect.
+    :type vpcs: List[DTVpc]
+
+    :raises ValueError: When the CIDR blocks of two VPCs overlap.
+    """
+    for vpc, other in combinations(vpcs, 2):
+        if vpc.get_cidr_block().overlaps(other.get_cidr_block()):
+            raise ValueError(
+                f"{vpc.name} ({vpc.get_cidr_block()}) overlaps "
+                f"{other.name} ({other.get_cidr_block()})"
+            )
+
+
+class DTVPCPeeringConfig(BaseModel):
+    """Configuration object for connecting VPCs to each other."""
+
+    name: Text
+    vpcs: List[DTVpc]
+    mode: DTPeeringMode = DTPeeringMode.mesh
+    # Amazon side ASN of the transit gateway
+    amazon_side_asn: int = 64512
+    tags: Dict = {"pulumi_managed": "true"}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @validator("vpcs")
+    def routable_vpcs(cls, vpcs):
+        if len(vpcs) < 2:
+            raise ValueError("At least two VPCs are needed")
+        names = [vpc.name for vpc in vpcs]
+        if len(set(names)) != len(names):
+            raise ValueError("VPC names must be unique")
+        check_cidr_overlap(vpcs)
+        return vpcs
+
+
+class DTVPCPeering(DTComponent):
+    """
+    Connect VPCs to each other and route every subnet of each to the others
+
+    """
+
+    def __init__(
+        self, peering_config: DTVPCPeeringConfig, opts: ResourceOptions = None
+    ):
+        """Create the peering connections or transit gateway and the routes.
+
+        :param peering_config: Configuration object for customizing the connections.
+        :type peering_config: DTVPCPeeringConfig
+
+        :returns: The constructed component resource object.
+
+        :rtype: DTVPCPeering
+        """
+        super().__init__(
+            "diceytech:infrastructure:aws:DTVPCPeering",
+            peering_config.name,
+            opts,
+        )
+
+        self.name = peering_config.name
+        self.mode = peering_config.mode
+        self.peering_connections: Dict[Text, DTVPCPeeringConnection] = {}
+        self.attachments: Dict[Text, ec2transitgateway.VpcAttachment] = {}
+        self.routes: List[ec2.Route] = []
+
+        if self.mode == DTPeeringMode.mesh:
+            for source_vpc, destination_vpc in combinations(peering_config.vpcs, 2):
+                self.create_peering_connection(source_vpc, destination_vpc)
+        else:
+            self.create_transit_gateway(peering_config)
+
+        self.register_outputs(
+            {
+                "peering_connection_ids": self.get_peering_connection_ids(),
+                "transit_gateway_id": self.get_transit_gateway_id(),
+            }
+        )
+
+        info(msg=f"{self.name} created.", resource=self)
+
+    def create_peering_connection(self, source_vpc: DTVpc, destination_vpc: DTVpc):
+        name = f"{source_vpc.name}-{destination_vpc.name}"
+        self.peering_connections[name] = DTVPCPeeringConnection(
+            f"{name}-peering",
+            source_vpc,
+            destination_vpc,
+            opts=ResourceOptions(parent=self),
+        )
+
+    def create_transit_gateway(self, peering_config: DTVPCPeeringConfig):
+        # The attachments are associated with and propagate to the default route table,
+        # so the hub routes between every attached VPC without further configuration
+        self.transit_gateway = ec2transitgateway.TransitGateway(
+            f"{self.name}-tgw",
+            description=f"Hub connecting {', '.join(vpc.name for vpc in peering_config.vpcs)}",
+            amazon_side_asn=peering_config.amazon_side_asn,
+            default_route_table_association="enable",
+            default_route_table_propagation="enable",
+            dns_support="enable",
+            tags={**peering_config.tags, "Name": self.name},
+            opts=ResourceOptions(parent=self),
+        )
+
+        for vpc in peering_config.vpcs:
+            # One subnet per zone, in the tier the instances live in
+            self.attachments[vpc.name] = ec2transitgateway.VpcAttachment(
+                f"{self.name}-{vpc.name}-attachment",
+                transit_gateway_id=self.transit_gateway.id,
+                vpc_id=vpc.get_id(),
+                subnet_ids=vpc.get_private_subnet_ids() or vpc.get_public_subnet_ids(),
+                dns_support="enable",
+                tags={**peering_config.tags, "Name": f"{self.name}-{vpc.name}"},
+                opts=ResourceOptions(parent=self),
+            )
+
+        for vpc in peering_config.vpcs:
+            for other in peering_config.vpcs:
+                if other is vpc:
+                    continue
+                for key, route_table in vpc.get_route_tables().items():
+                    self.routes.append(
+                        ec2.Route(
+                            f"{self.name}-{vpc.name}-to-{other.name}-{key}-route",
+                            route_table_id=route_table.id,
+                            destination_cidr_block=str(other.get_cidr_block()),
+                            transit_gateway_id=self.transit_gateway.id,
+                            opts=ResourceOptions(
+                                parent=self,
+                                depends_on=[self.attachments[vpc.name]],
+                            ),
+                        )
+                    )
+
+    def get_peering_connection_ids(self) -> Dict[Text, Text]:
+        return {
+            name: connection.peering_connection.id
+            for name, connection in self.peering_connections.items()
+        }
+
+    def get_transit_gateway_id(self) -> Text:
+        if self.mode == DTPeeringMode.transit_gateway:
+            return self.transit_gateway.id
@@ -0,0 +1,167 @@
+"""Plan the subnets of a VPC from tier specifications.
+
+A tier (public, app, data, cache...) asks for one subnet of a given prefix length in
+each of its availability zones. The planner packs them into the VPC CIDR block
+deterministically:
+- Pinned CIDR blocks are reserved first
+- Every tier then reserves the lowest free block holding max_az_count of its subnets,
+  in declaration order
+- The subnet of the n-th zone is the n-th slot of the tier block, unless pinned
+
+A tier block only depends on the tiers declared before it, and a zone slot on the zone
+position, so appending a tier or a zone, up to max_az_count, never renumbers the
+existing subnets. Pin the CIDR blocks of a tier before resizing or inserting one
+declared ahead of it, or to keep subnets laid out another way.
+"""
+from ipaddress import IPv4Network
+from math import ceil, log2
+from typing import Dict, List, Optional, Text
+
+from pydantic import BaseModel, PositiveInt, conint, validator
+
+SUBNET_PREFIX_V4 = (
+    24  # A CIDR block of prefix length 24 allows for up to 255 individual IP addresses
+)
+MAX_AZ_COUNT = 4  # Zones reserved per tier, eu-west-2 has three
+
+
+class DTSubnetTierConfig(BaseModel):
+    """A tier of subnets, one per availability zone."""
+
+    name: Text
+    prefix_length: conint(ge=16, le=28) = SUBNET_PREFIX_V4  # type: ignore
+    az_count: Optional[PositiveInt] = None  # Defaults to the VPC az_count
+    # Zones the tier block has room for, rounded up to a power of two
+    max_az_count: conint(ge=1, le=16) = MAX_AZ_COUNT  # type: ignore
+    public: bool = False
+    # Isolated subnets have no route to the internet, not even through a NAT gateway
+    isolated: bool = False
+    # Blocks already allocated to this tier, in zone order
+    cidr_blocks: List[IPv4Network] = []
+
+    @validator("isolated")
+    def public_or_isolated(cls, isolated, values):
+        if isolated and values.get("public"):
+            raise ValueError("A tier can not be both public and isolated")
+        return isolated
+
+    @validator("az_count")
+    def az_count_reserved(cls, az_count, values):
+        if az_count and "max_az_count" in values and az_count > values["max_az_count"]:
+            raise ValueError(
+                f"az_count {az_count} is above the {values['max_az_count']} reserved zones"
+            )
+        return az_count
+
+    @validator("cidr_blocks", each_item=True)
+    def pinned_block_size(cls, cidr_block, values):
+        if (
+            "prefix_length" in values
+            and cidr_block.prefixlen != values["prefix_length"]
+        ):
+            raise ValueError(
+                f"{cidr_block} does not match the tier prefix length /{values['prefix_length']}"
+            )
+        return cidr_block
+
+    @property
+    def block_prefix_length(self) -> int:
+        return self.prefix_length - ceil(log2(self.max_az_count))
+
+
+class DTSubnetPlan(BaseModel):
+    """A planned subnet."""
+
+    tier: DTSubnetTierConfig
+    zone: Text
+    cidr_block: IPv4Network
+
+
+# Two /24 tiers, each in a /22 block
+DEFAULT_SUBNET_TIERS = [
+    DTSubnetTierConfig(name="public", public=True),
+    DTSubnetTierConfig(name="private"),
+]
+
+
+def _overlaps(cidr_block: IPv4Network, allocated: List[IPv4Network]) -> bool:
+    return any(cidr_block.overlaps(other) for other in allocated)
+
+
+def _first_free_block(
+    vpc_cidr: IPv4Network, prefix_length: int, allocated: List[IPv4Network]
+) -> IPv4Network:
+    for candidate in vpc_cidr.subnets(new_prefix=prefix_length):
+        if not _overlaps(candidate, allocated):
+            return candidate
+    raise ValueError(f"No free /{prefix_length} left in {vpc_cidr}")
+
+
+def plan_subnets(
+    vpc_cidr: IPv4Network,
+    tiers: List[DTSubnetTierConfig],
+    zones: List[Text],
+) -> List[DTSubnetPlan]:
+    """Allocate a CIDR block to every subnet of every tier.
+
+    :param vpc_cidr: The CIDR block of the VPC.
+    :type vpc_cidr: IPv4Network
+
+    :param tiers: The tiers to allocate, in declaration order.
+    :type tiers: List[DTSubnetTierConfig]
+
+    :param zones: The availability zones of the VPC, a tier uses the first az_count.
+    :type zones: List[Text]
+
+    :raises ValueError: When tier names repeat, a tier asks for more zones than
+        available or reserved, a pinned block is outside the VPC or overlaps another,
+        or the VPC CIDR block is full.
+
+    :rtype: List[DTSubnetPlan]
+    """
+    names = [tier.name for tier in tiers]
+    if len(set(names)) != len(names):
+        raise ValueError("Subnet tier names must be unique")
+
+    allocated: List[IPv4Network] = []
+    for tier in tiers:
+        if tier.block_prefix_length < vpc_cidr.prefixlen:
+            raise ValueError(f"Tier {tier.name} block is larger than {vpc_cidr}")
+        for cidr_block in tier.cidr_blocks:
+            if not cidr_block.subnet_of(vpc_cidr):
+                raise ValueError(
+                    f"{cidr_block} of tier {tier.name} is outside {vpc_cidr}"
+                )
+            if _overlaps(cidr_block, allocated):
+                raise ValueError(
+                    f"{cidr_block} of tier {tier.name} overlaps another block"
+                )
+            allocated.append(cidr_block)
+
+    blocks: Dict[Text, IPv4Network] = {}
+    for tier in tiers:
+        blocks[tier.name] = _first_free_block(
+            vpc_cidr, tier.block_prefix_length, allocated
+        )
+        allocated.append(blocks[tier.name])
+
+    plan: List[DTSubnetPlan] = []
+    for tier in tiers:
+        az_count = tier.az_count or len(zones)
+        if az_count > len(zones):
+            raise ValueError(
+                f"Tier {tier.name} needs {az_count} zones, only {len(zones)} available"
+            )
+        if az_count > tier.max_az_count:
+            raise ValueError(
+                f"Tier {tier.name} needs {az_count} zones, only {tier.max_az_count} reserved"
+            )
+        slots = list(blocks[tier.name].subnets(new_prefix=tier.prefix_length))
+        for index, zone in enumerate(zones[:az_count]):
+            if index < len(tier.cidr_blocks):
+                cidr_block = tier.cidr_blocks[index]
+            else:
+                cidr_block = slots[index]
+            plan.append(DTSubnetPlan(tier=tier, zone=zone, cidr_block=cidr_block))
+
+    return plan
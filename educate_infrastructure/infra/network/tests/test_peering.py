@@ -0,0 +1,111 @@
+from ipaddress import IPv4Network
+
+import pulumi
+import pytest
+
+from educate_infrastructure.infra.network.peering import (
+    DTPeeringMode,
+    DTVPCPeering,
+    DTVPCPeeringConfig,
+)
+from educate_infrastructure.infra.network.vpc import DTNatStrategy, DTVpc, DTVPCConfig
+
+
+def build_vpc(name, cidr_block):
+    return DTVpc(
+        DTVPCConfig(
+            name=name,
+            cidr_block=IPv4Network(cidr_block),
+            nat_strategy=DTNatStrategy.none,
+        )
+    )
+
+
+def test_overlapping_cidr_blocks_are_rejected():
+    apps_vpc = build_vpc("educate-overlap-apps", "10.30.0.0/16")
+    db_vpc = build_vpc("educate-overlap-db", "10.30.128.0/17")
+    with pytest.raises(ValueError, match="overlaps"):
+        DTVPCPeeringConfig(name="educate-overlap", vpcs=[apps_vpc, db_vpc])
+
+
+def test_a_single_vpc_is_rejected():
+    with pytest.raises(ValueError):
+        DTVPCPeeringConfig(
+            name="educate-alone",
+            vpcs=[build_vpc("educate-alone-apps", "10.31.0.0/16")],
+        )
+
+
+class TestDTVPCPeeringMesh(object):
+    @classmethod
+    def setup_class(cls):
+        cls.vpcs = [
+            build_vpc(f"educate-mesh-{index}", f"10.{40 + index}.0.0/16")
+            for index in range(3)
+        ]
+        cls.peering = DTVPCPeering(
+            DTVPCPeeringConfig(name="educate-mesh", vpcs=cls.vpcs)
+        )
+
+    def test_every_pair_is_peered(self):
+        assert sorted(self.peering.peering_connections) == [
+            "educate-mesh-0-educate-mesh-1",
+            "educate-mesh-0-educate-mesh-2",
+            "educate-mesh-1-educate-mesh-2",
+        ]
+        assert self.peering.get_transit_gateway_id() is None
+
+    def test_every_route_table_is_routed(self):
+        # Each VPC has a public and two private route tables, routed to both peers
+        routes = [
+            route
+            for connection in self.peering.peering_connections.values()
+            for route in connection.routes
+        ]
+        assert len(routes) == 3 * 3 * 2
+
+
+class TestDTVPCPeeringTransitGateway(object):
+    @classmethod
+    def setup_class(cls):
+        cls.vpcs = [
+            build_vpc(f"educate-tgw-{index}", f"10.{50 + index}.0.0/16")
+            for index in range(3)
+        ]
+        cls.peering = DTVPCPeering(
+            DTVPCPeeringConfig(
+                name="educate-tgw",
+                vpcs=cls.vpcs,
+                mode=DTPeeringMode.transit_gateway,
+            )
+        )
+
+    def test_every_vpc_is_attached(self):
+        assert sorted(self.peering.attachments) == [
+            "educate-tgw-0",
+            "educate-tgw-1",
+            "educate-tgw-2",
+        ]
+        assert self.peering.peering_connections == {}
+
+    @pulumi.runtime.test
+    def test_attachments_use_the_private_subnets(self):
+        def check_subnets(args):
+            subnet_ids, private_subnet_ids = args
+            assert subnet_ids == private_subnet_ids
+
+        return pulumi.Output.all(
+            self.peering.attachments["educate-tgw-0"].subnet_ids,
+            pulumi.Output.all(*self.vpcs[0].get_private_subnet_ids()),
+        ).apply(check_subnets)
+
+    @pulumi.runtime.test
+    def test_routes_go_through_the_hub(self):
+        def check_routes(args):
+            destinations = args
+            assert len(destinations) == 3 * 3 * 2
+            assert "10.50.0.0/16" in destinations
+
+        return pulumi.Output.all(
+            *[route.destination_cidr_block for route in self.peering.routes]
+        ).apply(check_routes)
@@ -0,0 +1,140 @@
+from ipaddress import IPv4Network
+from pathlib import Path
+
+import pytest
+import yaml
+
+from educate_infrastructure.infra.network.subnets import (
+    DEFAULT_SUBNET_TIERS,
+    DTSubnetTierConfig,
+    plan_subnets,
+)
+
+VPC_CIDR = IPv4Network("10.12.0.0/16")
+ZONES = ["eu-west-2a", "eu-west-2b", "eu-west-2c"]
+PROD_STACK = Path(__file__).parents[1] / "Pulumi.prod.yaml"
+
+
+def cidrs(plan):
+    return {(subnet.tier.name, subnet.zone): str(subnet.cidr_block) for subnet in plan}
+
+
+def test_default_tiers_reserve_a_block_each():
+    plan = plan_subnets(VPC_CIDR, DEFAULT_SUBNET_TIERS, ZONES[:2])
+    assert [str(subnet.cidr_block) for subnet in plan] == [
+        "10.12.0.0/24",
+        "10.12.1.0/24",
+        "10.12.4.0/24",
+        "10.12.5.0/24",
+    ]
+
+
+def test_variable_size_tiers_are_aligned():
+    tiers = [
+        DTSubnetTierConfig(name="public", public=True),
+        DTSubnetTierConfig(name="app", prefix_length=20),
+        DTSubnetTierConfig(name="data", prefix_length=26, isolated=True, az_count=2),
+    ]
+    planned = cidrs(plan_subnets(VPC_CIDR, tiers, ZONES))
+    assert planned[("app", "eu-west-2a")] == "10.12.64.0/20"
+    assert planned[("app", "eu-west-2c")] == "10.12.96.0/20"
+    assert planned[("data", "eu-west-2a")] == "10.12.4.0/26"
+    assert ("data", "eu-west-2c") not in planned
+
+
+def test_adding_a_zone_keeps_the_existing_subnets():
+    before = cidrs(plan_subnets(VPC_CIDR, DEFAULT_SUBNET_TIERS, ZONES[:2]))
+    after = cidrs(plan_subnets(VPC_CIDR, DEFAULT_SUBNET_TIERS, ZONES))
+    assert before == {
+        ("public", "eu-west-2a"): "10.12.0.0/24",
+        ("public", "eu-west-2b"): "10.12.1.0/24",
+        ("private", "eu-west-2a"): "10.12.4.0/24",
+        ("private", "eu-west-2b"): "10.12.5.0/24",
+    }
+    assert after == {
+        **before,
+        ("public", "eu-west-2c"): "10.12.2.0/24",
+        ("private", "eu-west-2c"): "10.12.6.0/24",
+    }
+
+
+def test_appending_a_tier_keeps_the_existing_subnets():
+    tiers = [
+        DTSubnetTierConfig(name="public", public=True),
+        DTSubnetTierConfig(name="app", prefix_length=22),
+    ]
+    before = cidrs(plan_subnets(VPC_CIDR, tiers, ZONES))
+    grown = [*tiers, DTSubnetTierConfig(name="cache", prefix_length=27, isolated=True)]
+    after = cidrs(plan_subnets(VPC_CIDR, grown, ZONES))
+    assert {key: after[key] for key in before} == before
+    assert after[("cache", "eu-west-2a")] == "10.12.4.0/27"
+
+
+def test_pinned_zones_grow_into_the_tier_block():
+    tiers = [
+        DTSubnetTierConfig(name="public", public=True, cidr_blocks=["10.12.0.0/24"]),
+        DTSubnetTierConfig(name="private", cidr_blocks=["10.12.1.0/24"]),
+    ]
+    planned = cidrs(plan_subnets(VPC_CIDR, tiers, ZONES[:2]))
+    assert planned == {
+        ("public", "eu-west-2a"): "10.12.0.0/24",
+        ("public", "eu-west-2b"): "10.12.5.0/24",
+        ("private", "eu-west-2a"): "10.12.1.0/24",
+        ("private", "eu-west-2b"): "10.12.9.0/24",
+    }
+
+
+def test_zones_beyond_the_reservation_are_rejected():
+    tiers = [DTSubnetTierConfig(name="public", public=True, max_az_count=2)]
+    with pytest.raises(ValueError):
+        plan_subnets(VPC_CIDR, tiers, ZONES)
+
+
+def test_pinned_blocks_survive_resizing_earlier_tiers():
+    tiers = [
+        DTSubnetTierConfig(name="public", public=True),
+        DTSubnetTierConfig(name="app", prefix_length=22),
+    ]
+    app = [
+        subnet.cidr_block
+        for subnet in plan_subnets(VPC_CIDR, tiers, ZONES)
+        if subnet.tier.name == "app"
+    ]
+
+    resized = [
+        DTSubnetTierConfig(name="public", public=True, prefix_length=23),
+        DTSubnetTierConfig(name="app", prefix_length=22, cidr_blocks=app),
+    ]
+    plan = plan_subnets(VPC_CIDR, resized, ZONES)
+    assert [s.cidr_block for s in plan if s.tier.name == "app"] == app
+    public = [s.cidr_block for s in plan if s.tier.name == "public"]
+    assert not any(block.overlaps(other) for block in public for other in app)
+
+
+def test_full_vpc_is_rejected():
+    tiers = [DTSubnetTierConfig(name="app", prefix_length=17)]
+    with pytest.raises(ValueError):
+        plan_subnets(VPC_CIDR, tiers, ZONES)
+
+
+def test_overlapping_pins_are_rejected():
+    tiers = [
+        DTSubnetTierConfig(name="public", public=True, cidr_blocks=["10.12.0.0/24"]),
+        DTSubnetTierConfig(name="app", prefix_length=20, cidr_blocks=["10.12.0.0/20"]),
+    ]
+    with pytest.raises(ValueError):
+        plan_subnets(VPC_CIDR, tiers, ZONES)
+
+
+def test_prod_stack_keeps_its_subnets():
+    config = yaml.safe_load(PROD_STACK.read_text())["config"]
+    tiers = [DTSubnetTierConfig(**tier) for tier in config["apps_vpc:subnet_tiers"]]
+    zones = ZONES[: config["apps_vpc:az_count"]]
+    plan = plan_subnets(IPv4Network(config["apps_vpc:cidr_block"]), tiers, zones)
+    # Public subnets first, then the private ones, one /24 per zone
+    assert cidrs(plan) == {
+        ("public", "eu-west-2a"): "10.12.0.0/24",
+        ("public", "eu-west-2b"): "10.12.1.0/24",
+        ("private", "eu-west-2a"): "10.12.2.0/24",
+        ("private", "eu-west-2b"): "10.12.3.0/24",
+    }
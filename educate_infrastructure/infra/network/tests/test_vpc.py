@@ -3,8 +3,14 @@ from ipaddress import IPv4Network
 import pulumi
 import pytest
 
-from educate_infrastructure.infra.network.tests import networking_mock
-from educate_infrastructure.infra.network.vpc import DTVpc
+from educate_infrastructure.infra.network.subnets import DTSubnetTierConfig
+from educate_infrastructure.infra.network.vpc import (
+    DEFAULT_INTERFACE_ENDPOINTS,
+    DTNatStrategy,
+    DTVpc,
+    DTVPCConfig,
+    DTVPCPeeringConnection,
+)
 from educate_infrastructure.lib.dt_types import AWSBase
 
 
@@ -17,14 +23,14 @@ class FakeIPv4Network(object):
 class TestDTVpc(object):
     """ Initial tests doing basic coverage """
 
-    def setup(self):
-        self.name = "educate-app-vpc"
-        self.az_count = 2
-        # self.base = AWSBase()
-        self.cidr_block = IPv4Network("172.255.100.0/16", False)
+    @classmethod
+    def setup_class(cls):
+        cls.name = "educate-app-vpc"
+        cls.az_count = 2
+        cls.cidr_block = IPv4Network("172.255.100.0/16", False)
 
-        self.test_vpc = DTVpc(
-            name=self.name, az_count=self.az_count, cidr_block=self.cidr_block
+        cls.test_vpc = DTVpc(
+            DTVPCConfig(name=cls.name, az_count=cls.az_count, cidr_block=cls.cidr_block)
         )
 
     @pulumi.runtime.test
@@ -66,8 +72,275 @@ class TestDTVpc(object):
         )
 
 
+def build_vpc(nat_strategy):
+    return DTVpc(
+        DTVPCConfig(
+            name=f"educate-nat-{nat_strategy.value}",
+            az_count=3,
+            cidr_block=IPv4Network("10.12.0.0/16"),
+            nat_strategy=nat_strategy,
+        )
+    )
+
+
+def default_route_targets(vpc):
+    return pulumi.Output.all(
+        *[
+            (
+                vpc.internet_routes[key].nat_gateway_id
+                if key in vpc.internet_routes
+                else None
+            )
+            for key in vpc.private_route_tables
+        ]
+    )
+
+
+class TestDTVpcNatStrategy(object):
+    @pulumi.runtime.test
+    def test_routes_are_standalone(self):
+        vpc = build_vpc(DTNatStrategy.single)
+
+        def check_routes(args):
+            inline_routes, route_table_id, gateway_id, igw_id = args
+            assert not any(inline_routes)
+            assert route_table_id is not None
+            assert gateway_id == igw_id
+
+        public_route = vpc.internet_routes["public"]
+        return pulumi.Output.all(
+            pulumi.Output.all(
+                *[route_table.routes for route_table in vpc.get_route_tables().values()]
+            ),
+            public_route.route_table_id,
+            public_route.gateway_id,
+            vpc.igw.id,
+        ).apply(check_routes)
+
+    @pulumi.runtime.test
+    def test_routes_declared_inline_before_are_imported(self):
+        vpc = DTVpc(
+            DTVPCConfig(
+                name="educate-import-routes",
+                cidr_block=IPv4Network("10.12.0.0/16"),
+                import_route_ids={
+                    "public": "rtb-0123456789_0.0.0.0/0",
+                    "private-eu-west-2a": "rtb-9876543210_0.0.0.0/0",
+                },
+            )
+        )
+
+        def check_ids(route_ids):
+            assert route_ids == [
+                "rtb-0123456789_0.0.0.0/0",
+                "rtb-9876543210_0.0.0.0/0",
+                "educate-import-routes-private-nat-route-eu-west-2b_id",
+            ]
+
+        return pulumi.Output.all(
+            *[route.id for route in vpc.internet_routes.values()]
+        ).apply(check_ids)
+
+    def test_unknown_imported_routes_are_rejected(self):
+        with pytest.raises(ValueError):
+            DTVpc(
+                DTVPCConfig(
+                    name="educate-import-unknown-route",
+                    cidr_block=IPv4Network("10.12.0.0/16"),
+                    import_route_ids={"private-eu-west-2c": "rtb-0123456789_0.0.0.0/0"},
+                )
+            )
+
+    @pulumi.runtime.test
+    def test_per_az_routes_to_local_nat(self):
+        vpc = build_vpc(DTNatStrategy.per_az)
+        assert list(vpc.nat_gateway_ids) == ["eu-west-2a", "eu-west-2b", "eu-west-2c"]
+
+        def check_routes(args):
+            targets, nat_gateway_ids = args
+            assert targets == nat_gateway_ids
+
+        return pulumi.Output.all(
+            default_route_targets(vpc),
+            pulumi.Output.all(*vpc.nat_gateway_ids.values()),
+        ).apply(check_routes)
+
+    @pulumi.runtime.test
+    def test_single_nat_shared_by_every_zone(self):
+        vpc = build_vpc(DTNatStrategy.single)
+        assert list(vpc.nat_gateway_ids) == ["eu-west-2a"]
+
+        def check_routes(args):
+            targets, nat_gateway_id = args
+            assert targets == [nat_gateway_id] * 3
+
+        return pulumi.Output.all(
+            default_route_targets(vpc),
+            vpc.nat_gateway_ids["eu-west-2a"],
+        ).apply(check_routes)
+
+    @pulumi.runtime.test
+    def test_no_nat(self):
+        vpc = build_vpc(DTNatStrategy.none)
+        assert vpc.nat_gateway_ids == {}
+
+        def check_routes(targets):
+            assert targets == [None, None, None]
+
+        return default_route_targets(vpc).apply(check_routes)
+
+
+class TestDTVpcEndpoints(object):
+    @classmethod
+    def setup_class(cls):
+        cls.vpc = DTVpc(
+            DTVPCConfig(
+                name="educate-endpoints",
+                cidr_block=IPv4Network("10.12.0.0/16"),
+                region="eu-west-1",
+                interface_endpoints=DEFAULT_INTERFACE_ENDPOINTS,
+            )
+        )
+
+    @pulumi.runtime.test
+    def test_s3_endpoint_on_every_route_table(self):
+        def check_route_tables(args):
+            service_name, route_table_ids, *expected = args
+            assert service_name == "com.amazonaws.eu-west-1.s3"
+            assert route_table_ids == expected
+
+        return pulumi.Output.all(
+            self.vpc.s3_gateway_endpoint.service_name,
+            self.vpc.s3_gateway_endpoint.route_table_ids,
+            self.vpc.public_route_table.id,
+            *[table.id for table in self.vpc.private_route_tables.values()],
+        ).apply(check_route_tables)
+
+    @pulumi.runtime.test
+    def test_interface_endpoints_in_private_subnets(self):
+        assert list(self.vpc.interface_endpoints) == DEFAULT_INTERFACE_ENDPOINTS
+        endpoint = self.vpc.interface_endpoints["ssm"]
+
+        def check_endpoint(args):
+            service_name, subnet_ids, private_dns, *private_subnet_ids = args
+            assert service_name == "com.amazonaws.eu-west-1.ssm"
+            assert subnet_ids == private_subnet_ids
+            assert private_dns
+
+        return pulumi.Output.all(
+            endpoint.service_name,
+            endpoint.subnet_ids,
+            endpoint.private_dns_enabled,
+            *self.vpc.get_private_subnet_ids(),
+        ).apply(check_endpoint)
+
+
+class TestDTVpcSubnetTiers(object):
+    @classmethod
+    def setup_class(cls):
+        cls.vpc = DTVpc(
+            DTVPCConfig(
+                name="educate-tiers",
+                cidr_block=IPv4Network("10.12.0.0/16"),
+                rds_network=True,
+                subnet_tiers=[
+                    DTSubnetTierConfig(name="public", public=True),
+                    DTSubnetTierConfig(name="app", prefix_length=20),
+                    DTSubnetTierConfig(name="data", isolated=True),
+                ],
+                db_subnet_tier="data",
+            )
+        )
+
+    def test_private_subnets_are_the_app_tier(self):
+        assert self.vpc.get_private_subnet_ids() == self.vpc.get_tier_subnet_ids("app")
+        assert len(self.vpc.get_tier_subnet_ids("data")) == 2
+
+    def test_data_tier_is_isolated(self):
+        assert "data-eu-west-2a" not in self.vpc.internet_routes
+        assert "app-eu-west-2a" in self.vpc.internet_routes
+
+    @pulumi.runtime.test
+    def test_db_subnet_group_uses_data_tier(self):
+        def check_subnets(args):
+            subnet_ids, *data_subnet_ids = args
+            assert subnet_ids == data_subnet_ids
+
+        return pulumi.Output.all(
+            self.vpc.db_subnet_group.subnet_ids,
+            *self.vpc.get_tier_subnet_ids("data"),
+        ).apply(check_subnets)
+
+
+class TestDTVpcWithoutInternetGateway(object):
+    @classmethod
+    def setup_class(cls):
+        cls.vpc = DTVpc(
+            DTVPCConfig(
+                name="educate-private",
+                cidr_block=IPv4Network("10.2.0.0/16"),
+                rds_network=True,
+                nat_strategy=DTNatStrategy.none,
+                subnet_tiers=[DTSubnetTierConfig(name="private")],
+                internet_gateway=False,
+            )
+        )
+
+    def test_no_route_to_the_internet(self):
+        assert self.vpc.igw is None
+        assert self.vpc.internet_routes == {}
+        assert self.vpc.get_public_subnet_ids() == []
+        assert len(self.vpc.get_private_subnet_ids()) == 2
+
+    def test_public_tiers_need_a_gateway(self):
+        with pytest.raises(ValueError):
+            DTVPCConfig(
+                name="educate-private",
+                cidr_block=IPv4Network("10.2.0.0/16"),
+                internet_gateway=False,
+            )
+
+
 class TestDTVPCPeeringConnection(object):
-    # TODO
+    @classmethod
+    def setup_class(cls):
+        cls.source_vpc = DTVpc(
+            DTVPCConfig(
+                name="educate-peer-source", cidr_block=IPv4Network("10.20.0.0/16")
+            )
+        )
+        cls.destination_vpc = DTVpc(
+            DTVPCConfig(
+                name="educate-peer-destination", cidr_block=IPv4Network("10.21.0.0/16")
+            )
+        )
+        cls.peering = DTVPCPeeringConnection(
+            "educate-peer", cls.source_vpc, cls.destination_vpc
+        )
+
     @pulumi.runtime.test
     def test_has_required_tags(self):
-        pass
+        def check_tags(tags):
+            assert tags["pulumi_managed"] == "True"
+
+        return self.peering.peering_connection.tags.apply(check_tags)
+
+    def test_every_route_table_routes_to_the_peer(self):
+        # A public and two private route tables on each side
+        assert len(self.peering.routes) == 6
+
+    @pulumi.runtime.test
+    def test_private_route_tables_are_routed(self):
+        def check_route_tables(args):
+            route_table_ids = args[: len(args) // 2]
+            expected_ids = args[len(args) // 2 :]
+            assert sorted(route_table_ids) == sorted(expected_ids)
+
+        route_tables = [
+            *self.source_vpc.get_route_tables().values(),
+            *self.destination_vpc.get_route_tables().values(),
+        ]
+        return pulumi.Output.all(
+            *[route.route_table_id for route in self.peering.routes],
+            *[route_table.id for route_table in route_tables],
+        ).apply(check_route_tables)
@@ -2,25 +2,53 @@
 
 This includes:
 - Create the named VPC with appropriate tags
-- Create a public and private subnet for each select Availability Zones
-- Create an internet gateway
+- Create the subnets of each tier (public, app, data...) planned in the CIDR block
+- Create an internet gateway, unless the VPC has no route to the internet
+- Create NAT gateways following the NAT strategy (single, one per AZ or none)
+- Create an S3 gateway endpoint on every route table and interface endpoints in the
+  private subnets
 - Create a route table and associate the created subnets with it
 - Create a routing table to include the relevant peers and their networks
 - Create an RDS subnet group
+- Describe the NAT gateway metrics to monitor
 """
-from itertools import cycle
+from enum import Enum
 from typing import List, Text, Dict, Optional
 from ipaddress import IPv4Network
 
-from pulumi import ComponentResource, ResourceOptions, info
-from pulumi_aws import ec2, get_availability_zones, rds
-from pydantic import BaseModel, PositiveInt
+from pulumi import ResourceOptions, info
+from pulumi_aws import ec2, rds
+from pydantic import BaseModel, PositiveInt, validator
 
-SUBNET_PREFIX_V4 = (
-    24  # A CIDR block of prefix length 24 allows for up to 255 individual IP addresses
+from educate_infrastructure.infra.network.subnets import (
+    DEFAULT_SUBNET_TIERS,
+    SUBNET_PREFIX_V4,  # noqa: F401
+    DTSubnetPlan,
+    DTSubnetTierConfig,
+    plan_subnets,
 )
+from educate_infrastructure.lib.component import DTComponent
+from educate_infrastructure.lib.lookups import lookup_availability_zones
+from educate_infrastructure.lib.monitoring import DTMetric
+
 # TODO Remove private routes update
 
+# Interface endpoints keeping the AWS API traffic of the instances off the NAT gateways
+DEFAULT_INTERFACE_ENDPOINTS = [
+    "ssm",
+    "ssmmessages",
+    "ec2messages",
+    "logs",
+    "sts",
+    "secretsmanager",
+]
+
+
+class DTNatStrategy(str, Enum):
+    single = "single"  # One NAT gateway shared by every private subnet
+    per_az = "per_az"  # One NAT gateway per zone for the private subnets in it
+    none = "none"  # No outbound internet access from the private subnets
+
 
 class DTVPCConfig(BaseModel):
     """
@@ -31,12 +59,46 @@ class DTVPCConfig(BaseModel):
     az_count: Optional[PositiveInt] = 2
     cidr_block: IPv4Network
     rds_network: Optional[bool] = False
+    nat_strategy: DTNatStrategy = DTNatStrategy.single
+    region: Text = "eu-west-2"
+    interface_endpoints: List[Text] = []  # e.g. DEFAULT_INTERFACE_ENDPOINTS
+    subnet_tiers: List[DTSubnetTierConfig] = DEFAULT_SUBNET_TIERS
+    # Tier of the RDS subnet group, defaults to the first private tier
+    db_subnet_tier: Optional[Text] = None
+    # Without it the VPC has no route to the internet, only to the VPCs peered with it
+    internet_gateway: bool = True
+    # Default routes to import instead of creating them, keyed like get_route_tables(),
+    # e.g. {"public": "rtb-0123456789_0.0.0.0/0"} for those declared inline before
+    import_route_ids: Dict[Text, Text] = {}
 
     class Config:
         arbitrary_types_allowed = True
 
+    @validator("db_subnet_tier")
+    def db_tier_exists(cls, db_subnet_tier, values):
+        tiers = [tier.name for tier in values.get("subnet_tiers", [])]
+        if db_subnet_tier is not None and db_subnet_tier not in tiers:
+            raise ValueError(f"Unknown subnet tier {db_subnet_tier}")
+        return db_subnet_tier
+
+    @validator("internet_gateway")
+    def public_tiers_need_a_gateway(cls, internet_gateway, values):
+        public = [tier.name for tier in values.get("subnet_tiers", []) if tier.public]
+        if not internet_gateway and public:
+            raise ValueError(
+                f"Public tiers {', '.join(public)} need an internet gateway"
+            )
+        return internet_gateway
+
+    @property
+    def private_tier(self) -> Optional[Text]:
+        """The first tier of private subnets with outbound internet access."""
+        for tier in self.subnet_tiers:
+            if not tier.public and not tier.isolated:
+                return tier.name
+
 
-class DTVpc(ComponentResource):
+class DTVpc(DTComponent):
     """Pulumi component for building all of the necessary pieces of an AWS VPC.
 
     A component resource that encapsulates all of the standard practices of how the Dicey Tech
@@ -57,7 +119,10 @@ class DTVpc(ComponentResource):
 
         """
         self.name = network_config.name
+        self.cidr_block = network_config.cidr_block
         self.rds_network = network_config.rds_network
+        self.nat_strategy = network_config.nat_strategy
+        self.import_route_ids = network_config.import_route_ids
 
         super().__init__("diceytech:infrastruture:aws:VPC", f"{self.name}-vpc", opts)
 
@@ -72,52 +137,85 @@ class DTVpc(ComponentResource):
             opts=ResourceOptions(parent=self),
         )
 
-        self.s3_gateway_endpoint = ec2.VpcEndpoint(
-            f"{self.name}-s3-gateway-endpoint",
-            vpc_id=self.vpc.id,
-            service_name="com.amazonaws.eu-west-2.s3",
-            opts=ResourceOptions(parent=self),
-        )
-
-        self.igw = ec2.InternetGateway(
-            f"{self.name}-igw",
-            vpc_id=self.vpc.id,
-            opts=ResourceOptions(parent=self),
-        )
-
+        # Every route is a standalone Route, the provider does not support mixing them
+        # with inline routes and the peering routes are added to the same tables
         self.public_route_table = ec2.RouteTable(
             f"{self.name}-public-rt",
-            routes=[
-                ec2.RouteTableRouteArgs(cidr_block="0.0.0.0/0", gateway_id=self.igw.id)
-            ],
             vpc_id=self.vpc.id,
             opts=ResourceOptions(parent=self),
         )
 
+        # Default routes to the internet, keyed like get_route_tables()
+        self.internet_routes: Dict[Text, ec2.Route] = {}
+        self.igw = None
+        if network_config.internet_gateway:
+            self.igw = ec2.InternetGateway(
+                f"{self.name}-igw",
+                vpc_id=self.vpc.id,
+                opts=ResourceOptions(parent=self),
+            )
+            self.internet_routes["public"] = ec2.Route(
+                f"{self.name}-public-internet-route",
+                route_table_id=self.public_route_table.id,
+                destination_cidr_block="0.0.0.0/0",
+                gateway_id=self.igw.id,
+                opts=ResourceOptions(
+                    parent=self, import_=self.import_route_ids.get("public")
+                ),
+            )
+
         self.public_subnet_ids: List[ec2.Subnet] = []
         self.nat_gateway_ids: Dict[Text, Text] = {}
-        self.has_nat_gateway = False  # TODO temporary fix to only use one NAT gateway
-        self.private_subnet_ids: List[ec2.Subnet] = []
-        zones: List[Text] = get_availability_zones().names[: network_config.az_count]
-
-        subnet_iterator = zip(
-            range(network_config.az_count * 2),
-            cycle(zones),
-            network_config.cidr_block.subnets(new_prefix=SUBNET_PREFIX_V4),
+        self.tier_subnet_ids: Dict[Text, List[Text]] = {
+            tier.name: [] for tier in network_config.subnet_tiers
+        }
+        # Keyed by tier and zone, e.g. private-eu-west-2a
+        self.private_route_tables: Dict[Text, ec2.RouteTable] = {}
+        zones: List[Text] = lookup_availability_zones().names[: network_config.az_count]
+
+        # Public tiers come first so that the NAT gateways exist for the private ones
+        self.subnet_plan = plan_subnets(
+            network_config.cidr_block, network_config.subnet_tiers, zones
+        )
+        for subnet_plan in sorted(
+            self.subnet_plan, key=lambda subnet_plan: not subnet_plan.tier.public
+        ):
+            self.create_subnet(subnet_plan)
+
+        unknown_routes = set(self.import_route_ids) - set(self.internet_routes)
+        if unknown_routes:
+            raise ValueError(
+                f"{self.name} has no default route for {', '.join(sorted(unknown_routes))}"
+            )
+
+        private_tier = network_config.private_tier
+        self.private_subnet_ids: List[Text] = (
+            self.tier_subnet_ids[private_tier] if private_tier else []
+        )
+
+        self.s3_gateway_endpoint = ec2.VpcEndpoint(
+            f"{self.name}-s3-gateway-endpoint",
+            vpc_id=self.vpc.id,
+            service_name=f"com.amazonaws.{network_config.region}.s3",
+            route_table_ids=[
+                self.public_route_table.id,
+                *[route_table.id for route_table in self.private_route_tables.values()],
+            ],
+            opts=ResourceOptions(parent=self),
         )
 
-        for index, zone, subnet_v4 in subnet_iterator:
-            if index < network_config.az_count:
-                self.create_subnet(zone, subnet_v4, is_public=True)
-            else:
-                self.create_subnet(zone, subnet_v4, is_public=False)
+        self.interface_endpoints: Dict[Text, ec2.VpcEndpoint] = {}
+        if network_config.interface_endpoints:
+            self.create_interface_endpoints(network_config)
 
         if self.rds_network:
             self.db_subnet_group = rds.SubnetGroup(
                 f"{self.name}-db-subnet-group",
                 description=f"RDS subnet group for {self.name}",
                 name=f"{self.name}-db-subnet-group",
-                subnet_ids=[net_id for net_id in self.private_subnet_ids],
+                subnet_ids=self.tier_subnet_ids[
+                    network_config.db_subnet_tier or private_tier
+                ],
                 tags=self.tags,
                 opts=ResourceOptions(parent=self),
             )
@@ -126,7 +224,7 @@ class DTVpc(ComponentResource):
             {
                 "public_subnet_ids": self.public_subnet_ids,
                 "private_subnet_ids": self.private_subnet_ids,
-                "db_subnet_group_name": self.db_subnet_group.name,
+                "db_subnet_group_name": self.get_db_subnet_group_name(),
             }
         )
 
@@ -135,32 +233,82 @@ class DTVpc(ComponentResource):
     def get_id(self) -> Text:
         return self.vpc.id
 
+    def get_cidr_block(self) -> IPv4Network:
+        return self.cidr_block
+
+    def get_route_tables(self) -> Dict[Text, ec2.RouteTable]:
+        """Every route table of the VPC, keyed by "public" or tier and zone."""
+        return {"public": self.public_route_table, **self.private_route_tables}
+
     def get_public_subnet_ids(self) -> List[Text]:
         return self.public_subnet_ids
 
     def get_private_subnet_ids(self) -> List[Text]:
         return self.private_subnet_ids
 
+    def get_tier_subnet_ids(self, tier: Text) -> List[Text]:
+        return self.tier_subnet_ids[tier]
+
     def get_db_subnet_group_name(self) -> Text:
         if self.rds_network:
             return self.db_subnet_group.name
 
-    def create_subnet(self, zone: Text, subnet_v4, is_public):
-        if is_public:
-            name_pre = f"{self.name}-public"
-        else:
-            name_pre = f"{self.name}-private"
+    def monitoring_metrics(self) -> List[DTMetric]:
+        """Traffic and errors of every NAT gateway of the VPC."""
+        metrics = []
+        for zone, nat_gateway_id in self.nat_gateway_ids.items():
+            dimensions = {"NatGatewayId": nat_gateway_id}
+            metrics += [
+                DTMetric(
+                    key="nat_bytes_out",
+                    label=zone,
+                    title=f"NAT {zone} bytes out",
+                    namespace="AWS/NATGateway",
+                    metric_name="BytesOutToDestination",
+                    dimensions=dimensions,
+                    statistic="Sum",
+                ),
+                DTMetric(
+                    key="nat_port_allocation_errors",
+                    label=zone,
+                    title=f"NAT {zone} port allocation errors",
+                    namespace="AWS/NATGateway",
+                    metric_name="ErrorPortAllocation",
+                    dimensions=dimensions,
+                    statistic="Sum",
+                    threshold=1,
+                    evaluation_periods=1,
+                ),
+                DTMetric(
+                    key="nat_packets_dropped",
+                    label=zone,
+                    title=f"NAT {zone} packets dropped",
+                    namespace="AWS/NATGateway",
+                    metric_name="PacketsDropCount",
+                    dimensions=dimensions,
+                    statistic="Sum",
+                    threshold=1000,
+                ),
+            ]
+        return metrics
+
+    def create_subnet(self, subnet_plan: DTSubnetPlan):
+        tier = subnet_plan.tier
+        zone = subnet_plan.zone
+        is_public = tier.public
+        name_pre = f"{self.name}-{tier.name}"
 
         subnet = ec2.Subnet(
             f"{name_pre}-subnet-{zone}",
             assign_ipv6_address_on_creation=False,
             vpc_id=self.vpc.id,
             map_public_ip_on_launch=is_public,
-            cidr_block=str(subnet_v4),
+            cidr_block=str(subnet_plan.cidr_block),
             availability_zone=zone,
-            tags=self.tags,
+            tags={**self.tags, "Tier": tier.name},
             opts=ResourceOptions(parent=self),
         )
+        self.tier_subnet_ids[tier.name].append(subnet.id)
 
         if is_public:
             ec2.RouteTableAssociation(
@@ -172,49 +320,97 @@ class DTVpc(ComponentResource):
 
             self.public_subnet_ids.append(subnet.id)
 
-            eip = ec2.Eip(
-                f"{self.name}-eip-{zone}",
+            if zone not in self.nat_gateway_ids and (
+                self.nat_strategy == DTNatStrategy.per_az
+                or (
+                    self.nat_strategy == DTNatStrategy.single
+                    and not self.nat_gateway_ids
+                )
+            ):
+                self.create_nat_gateway(zone, subnet)
+        else:
+            private_rt = ec2.RouteTable(
+                f"{name_pre}-rt-{zone}",
+                vpc_id=self.vpc.id,
                 tags=self.tags,
                 opts=ResourceOptions(parent=self),
             )
+            self.private_route_tables[f"{tier.name}-{zone}"] = private_rt
 
-            if not self.has_nat_gateway:
-                nat_gateway = ec2.NatGateway(
-                    f"{self.name}-natgw-{zone}",
-                    subnet_id=subnet.id,
-                    allocation_id=eip.id,
-                    tags=self.tags,
-                    opts=ResourceOptions(parent=self),
-                )
-                self.nat_gateway_ids[f"{zone}"] = nat_gateway.id
-                self.has_nat_gateway = True
-        # Temporary fix removing any routing from the unused private subnet
-        else:
-            if f"{zone}" in self.nat_gateway_ids:
-                route_args = ec2.RouteTableRouteArgs(
-                    cidr_block="0.0.0.0/0",
-                    gateway_id=self.nat_gateway_ids[f"{zone}"],
+            nat_gateway_id = self.get_nat_gateway_id(zone)
+            if nat_gateway_id and not tier.isolated:
+                self.internet_routes[f"{tier.name}-{zone}"] = ec2.Route(
+                    f"{name_pre}-nat-route-{zone}",
+                    route_table_id=private_rt.id,
+                    destination_cidr_block="0.0.0.0/0",
+                    nat_gateway_id=nat_gateway_id,
+                    opts=ResourceOptions(
+                        parent=self,
+                        import_=self.import_route_ids.get(f"{tier.name}-{zone}"),
+                    ),
                 )
 
-                private_rt = ec2.RouteTable(
-                    f"{name_pre}-rt-{zone}",
-                    vpc_id=self.vpc.id,
-                    routes=[route_args],
-                    tags=self.tags,
-                    opts=ResourceOptions(parent=self),
-                )
+            ec2.RouteTableAssociation(
+                f"{name_pre}-rta-{zone}",
+                route_table_id=private_rt.id,
+                subnet_id=subnet.id,
+                opts=ResourceOptions(parent=self),
+            )
 
-                ec2.RouteTableAssociation(
-                    f"{name_pre}-rta-{zone}",
-                    route_table_id=private_rt.id,
-                    subnet_id=subnet.id,
-                    opts=ResourceOptions(parent=self),
+    def create_interface_endpoints(self, network_config: DTVPCConfig):
+        self.endpoints_security_group = ec2.SecurityGroup(
+            f"{self.name}-endpoints-sg",
+            vpc_id=self.vpc.id,
+            description="HTTPS access to the interface VPC endpoints",
+            ingress=[
+                ec2.SecurityGroupIngressArgs(
+                    protocol="tcp",
+                    from_port=443,
+                    to_port=443,
+                    cidr_blocks=[str(network_config.cidr_block)],
                 )
+            ],
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
 
-            self.private_subnet_ids.append(subnet.id)
+        for service in network_config.interface_endpoints:
+            self.interface_endpoints[service] = ec2.VpcEndpoint(
+                f"{self.name}-{service}-endpoint",
+                vpc_id=self.vpc.id,
+                service_name=f"com.amazonaws.{network_config.region}.{service}",
+                vpc_endpoint_type="Interface",
+                private_dns_enabled=True,
+                subnet_ids=self.private_subnet_ids,
+                security_group_ids=[self.endpoints_security_group.id],
+                tags={**self.tags, "Name": f"{self.name}-{service}"},
+                opts=ResourceOptions(parent=self),
+            )
 
+    def create_nat_gateway(self, zone: Text, public_subnet: ec2.Subnet):
+        eip = ec2.Eip(
+            f"{self.name}-eip-{zone}",
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+        nat_gateway = ec2.NatGateway(
+            f"{self.name}-natgw-{zone}",
+            subnet_id=public_subnet.id,
+            allocation_id=eip.id,
+            tags=self.tags,
+            opts=ResourceOptions(parent=self),
+        )
+        self.nat_gateway_ids[zone] = nat_gateway.id
 
-class DTVPCPeeringConnection(ComponentResource):
+    def get_nat_gateway_id(self, zone: Text) -> Optional[Text]:
+        """NAT gateway the private subnets of a zone route their internet traffic to."""
+        if self.nat_strategy == DTNatStrategy.single and self.nat_gateway_ids:
+            return next(iter(self.nat_gateway_ids.values()))
+        return self.nat_gateway_ids.get(zone)
+
+
+class DTVPCPeeringConnection(DTComponent):
     """A Pulumi component for creating a VPC peering connection and populating bidirectional routes."""
 
     def __init__(
@@ -222,21 +418,25 @@ class DTVPCPeeringConnection(ComponentResource):
         vpc_peer_name: Text,
         source_vpc: DTVpc,
         destination_vpc: DTVpc,
+        opts: ResourceOptions = None,
     ):
         """Create a peering connection and associated routes between two managed VPCs.
+
+        Every route table of each VPC, public and private, gets a route to the other.
+
         :param vpc_peer_name: The name of the peering connection
         :type vpc_peer_name: Text
         :param source_vpc: The source VPC object to be used as one end of the peering
             connection.
-        :type source_vpc: OLVPC
+        :type source_vpc: DTVpc
         :param destination_vpc: The destination VPC object to be used as the other end
             of the peering connection
-        :type destination_vpc: OLVPC
+        :type destination_vpc: DTVpc
         :param opts: Resource option definitions to propagate to the child resources
         :type opts: Optional[ResourceOptions]
         """
         super().__init__(
-            "dt:infrastructure:aws:VPCPeeringConnection", vpc_peer_name, None
+            "dt:infrastructure:aws:VPCPeeringConnection", vpc_peer_name, opts
         )
 
         self.peering_connection = ec2.VpcPeeringConnection(
@@ -248,20 +448,27 @@ class DTVPCPeeringConnection(ComponentResource):
             opts=ResourceOptions(parent=self),
         )
 
-        self.source_to_dest_route = ec2.Route(
-            f"{source_vpc.name}-to-{destination_vpc.name}-route",
-            route_table_id=source_vpc.public_route_table.id,
-            destination_cidr_block=destination_vpc.vpc.cidr_block,
-            vpc_peering_connection_id=self.peering_connection.id,
-            opts=ResourceOptions(parent=self),
-        )
-
-        self.dest_to_source_route = ec2.Route(
-            f"{destination_vpc.name}-to-{source_vpc.name}-route",
-            route_table_id=destination_vpc.public_route_table.id,
-            destination_cidr_block=source_vpc.vpc.cidr_block,
-            vpc_peering_connection_id=self.peering_connection.id,
-            opts=ResourceOptions(parent=self),
-        )
+        self.routes: List[ec2.Route] = []
+        for from_vpc, to_vpc in (
+            (source_vpc, destination_vpc),
+            (destination_vpc, source_vpc),
+        ):
+            for key, route_table in from_vpc.get_route_tables().items():
+                self.create_route(from_vpc, to_vpc, key, route_table)
 
         self.register_outputs({})
+
+    def create_route(
+        self, from_vpc: DTVpc, to_vpc: DTVpc, key: Text, route_table: ec2.RouteTable
+    ):
+        # The public routes keep the names they had before private routes were added
+        suffix = "route" if key == "public" else f"{key}-route"
+        self.routes.append(
+            ec2.Route(
+                f"{from_vpc.name}-to-{to_vpc.name}-{suffix}",
+                route_table_id=route_table.id,
+                destination_cidr_block=to_vpc.vpc.cidr_block,
+                vpc_peering_connection_id=self.peering_connection.id,
+                opts=ResourceOptions(parent=self),
+            )
+        )
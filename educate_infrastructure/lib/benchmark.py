@@ -0,0 +1,333 @@
+"""Benchmark how long our programs and components take to build their resource graphs.
+
+Every scenario (a project __main__ program or a single component) runs under the
+fixture-driven mock engine of lib/testing.py, so no cloud call is made and the numbers
+only reflect our own code and the Pulumi SDK. For each scenario we record:
+- the wall time of the fastest of --repeat runs
+- the peak memory allocated while building the graph (tracemalloc)
+- the number of resources registered and invokes made
+
+The results are compared with the baselines in lib/fixtures/benchmark_baselines.json. A
+scenario regresses when it registers more resources or makes more invokes than its
+baseline, or when its time or memory exceed the baseline by more than --tolerance.
+
+Usage:
+    python -m educate_infrastructure.lib.benchmark [--only vpc] [--repeat 5]
+    python -m educate_infrastructure.lib.benchmark --save  # record new baselines
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from ipaddress import IPv4Network
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Text
+
+import pulumi
+from pydantic import BaseModel
+
+from educate_infrastructure.lib.component import clear_component_timings
+from educate_infrastructure.lib.orchestrator import EDUCATE_PROJECTS
+from educate_infrastructure.lib.stack_references import clear_stack_references
+from educate_infrastructure.lib.testing import use_mock_engine
+
+BASELINES_PATH = Path(__file__).parent / "fixtures" / "benchmark_baselines.json"
+BENCHMARK_STACK = "benchmark"
+PROJECT_DIRS = {project.name: project.work_dir for project in EDUCATE_PROJECTS}
+
+
+class DTBenchmarkResult(BaseModel):
+    """Measurements of a scenario."""
+
+    name: Text
+    wall_time: float  # Seconds
+    peak_memory: int  # Bytes
+    resource_count: int
+    invoke_count: int
+
+
+class DTScenario(BaseModel):
+    """Something building a resource graph, run inside a project directory."""
+
+    name: Text
+    project: Text
+    build: Callable[[], None]
+    config: Dict[Text, Text] = {}
+
+
+@contextmanager
+def _project_dir(project: Text):
+    # Pulumi runs every program from its project directory
+    cwd = os.getcwd()
+    os.chdir(PROJECT_DIRS[project])
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def _program(project: Text) -> Callable[[], None]:
+    def build():
+        runpy.run_path(str(PROJECT_DIRS[project] / "__main__.py"), run_name="__main__")
+
+    return build
+
+
+def _vpc():
+    from educate_infrastructure.infra.network.vpc import (
+        DEFAULT_INTERFACE_ENDPOINTS,
+        DTNatStrategy,
+        DTVpc,
+        DTVPCConfig,
+    )
+
+    DTVpc(
+        DTVPCConfig(
+            name="benchmark",
+            cidr_block=IPv4Network("10.12.0.0/16"),
+            az_count=3,
+            rds_network=True,
+            nat_strategy=DTNatStrategy.per_az,
+            interface_endpoints=DEFAULT_INTERFACE_ENDPOINTS,
+        )
+    )
+
+
+def _aurora():
+    from pulumi_aws import ec2
+
+    from educate_infrastructure.databases.database import (
+        DTAuroraCluster,
+        DTAuroraConfig,
+        DTAuroraReaderScalingConfig,
+    )
+
+    DTAuroraCluster(
+        db_config=DTAuroraConfig(
+            instance_name="benchmark-sql",
+            subnet_group_name="benchmark-db-subnet-group",
+            security_groups=[ec2.SecurityGroup("benchmark-sql-sg")],
+            tags={"Name": "benchmark-sql"},
+            instance_count=3,
+            tuning_profile="oltp",
+            reader_scaling=DTAuroraReaderScalingConfig(max_capacity=4),
+        )
+    )
+
+
+def _mongodb():
+    from pulumi_aws import ec2
+
+    from educate_infrastructure.databases.mongodb import DTMongoDB, DTMongoDBConfig
+
+    DTMongoDB(
+        DTMongoDBConfig(
+            name="benchmark-mongodb",
+            vpc_id=pulumi.Output.from_input("vpc-0d905953c8537847c"),
+            subnet_id=pulumi.Output.from_input("subnet-0a1b2c3d4e5f60718"),
+            subnet_ids=pulumi.Output.from_input(
+                ["subnet-0a1b2c3d4e5f60718", "subnet-0d06af077da3e1c6f"]
+            ),
+            ingress_cidr_blocks=["10.12.0.0/16"],
+            instance_type=ec2.InstanceType.T3A_MICRO,
+            replica_set_name="rs0",
+            member_count=3,
+            attach_user_data=True,
+            admin_password=pulumi.Output.from_input("benchmark-password"),
+            key_file=pulumi.Output.from_input("benchmark-key-file"),
+        )
+    )
+
+
+def _ec2():
+    from educate_infrastructure.applications.educate.ec2 import (
+        DTEc2,
+        DTEducateConfig,
+    )
+
+    DTEc2(
+        DTEducateConfig(
+            name="benchmark-educate",
+            app_vpc_id=pulumi.Output.from_input("vpc-0d905953c8537847c"),
+            app_subnet_id=pulumi.Output.from_input("subnet-0a1b2c3d4e5f60718"),
+            iam_instance_profile_id=pulumi.Output.from_input("benchmark-profile"),
+            security_group_id=pulumi.Output.from_input("sg-0123456789"),
+            instance_type="t3a.large",
+        )
+    )
+
+
+SCENARIOS = [
+    DTScenario(
+        name="networking",
+        project="networking",
+        build=_program("networking"),
+        config={
+            "aws:region": "eu-west-2",
+            "apps_vpc:cidr_block": "10.12.0.0/16",
+            "db_vpc:enabled": "true",
+            "db_vpc:cidr_block": "10.2.0.0/16",
+        },
+    ),
+    DTScenario(
+        name="databases",
+        project="databases",
+        build=_program("databases"),
+        config={
+            "aws:region": "eu-west-2",
+            "cache:enabled": "true",
+            "cache:auth_token": "benchmark-auth-token",
+        },
+    ),
+    DTScenario(
+        name="educate",
+        project="educate",
+        build=_program("educate"),
+        config={"aws:region": "eu-west-2"},
+    ),
+    DTScenario(name="vpc", project="networking", build=_vpc),
+    DTScenario(name="aurora", project="databases", build=_aurora),
+    DTScenario(name="mongodb", project="databases", build=_mongodb),
+    DTScenario(name="ec2", project="educate", build=_ec2),
+]
+
+
+def _run_once(scenario: DTScenario, trace_memory: bool) -> DTBenchmarkResult:
+    engine = use_mock_engine()
+    # The engine may be shared with a test session, count from where it is
+    resources_before = sum(engine.resource_counts.values())
+    invokes_before = sum(engine.invoke_counts.values())
+    pulumi.runtime.set_mocks(
+        engine, project=scenario.project, stack=BENCHMARK_STACK, preview=False
+    )
+    pulumi.runtime.set_all_config(scenario.config)
+    clear_stack_references()
+    clear_component_timings()
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with _project_dir(scenario.project):
+            # Waits until every resource is registered and every output resolved
+            pulumi.runtime.test(scenario.build)()
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        pulumi.runtime.set_all_config({})
+        clear_stack_references()
+        clear_component_timings()
+        pulumi.runtime.set_mocks(engine, preview=False)
+
+    return DTBenchmarkResult(
+        name=scenario.name,
+        wall_time=wall_time,
+        peak_memory=peak_memory,
+        resource_count=sum(engine.resource_counts.values()) - resources_before,
+        invoke_count=sum(engine.invoke_counts.values()) - invokes_before,
+    )
+
+
+def run_scenario(scenario: DTScenario, repeat: int = 3) -> DTBenchmarkResult:
+    """Measure a scenario, keeping the fastest run.
+
+    Memory is traced in a run of its own as tracemalloc slows the interpreter down.
+    """
+    runs = [_run_once(scenario, trace_memory=False) for _ in range(repeat)]
+    traced = _run_once(scenario, trace_memory=True)
+    fastest = min(runs, key=lambda run: run.wall_time)
+    return fastest.copy(update={"peak_memory": traced.peak_memory})
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Dict[Text, DTBenchmarkResult]:
+    if not path.exists():
+        return {}
+    with open(path) as baselines_file:
+        return {
+            name: DTBenchmarkResult(**result)
+            for name, result in json.load(baselines_file).items()
+        }
+
+
+def save_baselines(
+    results: List[DTBenchmarkResult], path: Path = BASELINES_PATH
+) -> None:
+    baselines = load_baselines(path)
+    baselines.update({result.name: result for result in results})
+    with open(path, "w") as baselines_file:
+        json.dump(
+            {name: result.dict() for name, result in sorted(baselines.items())},
+            baselines_file,
+            indent=2,
+        )
+        baselines_file.write("\n")
+
+
+def regressions(
+    result: DTBenchmarkResult, baseline: DTBenchmarkResult, tolerance: float
+) -> List[Text]:
+    """Describe how a result regressed from its baseline, empty when it did not."""
+    found = []
+    for count in ("resource_count", "invoke_count"):
+        if getattr(result, count) > getattr(baseline, count):
+            found.append(
+                f"{count} {getattr(result, count)} > {getattr(baseline, count)}"
+            )
+    for measure in ("wall_time", "peak_memory"):
+        limit = getattr(baseline, measure) * (1 + tolerance)
+        if getattr(baseline, measure) and getattr(result, measure) > limit:
+            found.append(
+                f"{measure} {getattr(result, measure):.3f} > {limit:.3f} "
+                f"(baseline {getattr(baseline, measure):.3f} +{tolerance:.0%})"
+            )
+    return found
+
+
+def main(argv: Optional[List[Text]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", action="append", help="scenario to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--save", action="store_true", help="record new baselines")
+    parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    args = parser.parse_args(argv)
+
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.only or scenario.name in args.only
+    ]
+    baselines = load_baselines(args.baselines)
+
+    results = []
+    failed = False
+    for scenario in scenarios:
+        result = run_scenario(scenario, repeat=args.repeat)
+        results.append(result)
+        print(
+            f"{result.name:<12} {result.wall_time * 1000:8.1f} ms "
+            f"{result.peak_memory / 1024 ** 2:7.1f} MiB "
+            f"{result.resource_count:4} resources {result.invoke_count:3} invokes"
+        )
+        if not args.save and result.name in baselines:
+            for regression in regressions(
+                result, baselines[result.name], args.tolerance
+            ):
+                failed = True
+                print(f"  REGRESSION {regression}")
+
+    if args.save:
+        save_baselines(results, args.baselines)
+        print(f"Baselines saved to {args.baselines}")
+
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
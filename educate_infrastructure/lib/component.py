@@ -0,0 +1,231 @@
+"""Base class of our component resources, timing how long each takes to build.
+
+A DTComponent records:
+- its construction time, from the start of its __init__ to its register_outputs call
+- every child resource registered under it, with how long the engine took to resolve
+  the child URN after the child was constructed. During an update this includes the
+  time the provider took to create or update the resource.
+- every data-source invoke made while it was being constructed, with its duration
+
+The records of every component of the program form a per-stack report. Call
+export_component_report() at the end of a __main__ program and set DT_COMPONENT_REPORT to
+get it:
+- DT_COMPONENT_REPORT=output exports it as the `component_report` stack output
+- any other value is the path of a JSON file to write it to, where {project} and
+  {stack} are replaced by the project and stack names
+
+The invokes are timed by wrapping pulumi.runtime.invoke, only while DT_COMPONENT_REPORT
+is set: from the first component constructed until export_component_report().
+"""
+import functools
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Text
+
+import pulumi
+from pulumi import ComponentResource, Output, ResourceOptions
+from pydantic import BaseModel
+
+REPORT_ENV = "DT_COMPONENT_REPORT"
+REPORT_OUTPUT = "output"
+
+
+class DTChildTiming(BaseModel):
+    type: Text
+    name: Text
+    constructed_at: float  # Seconds since the component started
+    latency: Optional[float] = None  # Seconds until the URN resolved
+
+
+class DTInvokeTiming(BaseModel):
+    token: Text
+    duration: float  # Seconds
+
+
+class DTComponentTiming(BaseModel):
+    """Timings of a component."""
+
+    type: Text
+    name: Text
+    construction: float = 0  # Seconds
+    children: List[DTChildTiming] = []
+    invokes: List[DTInvokeTiming] = []
+
+    @property
+    def invoke_time(self) -> float:
+        return sum(invoke.duration for invoke in self.invokes)
+
+    @property
+    def registration_time(self) -> float:
+        """Time until the last child resolved, from the start of the component."""
+        return max(
+            (
+                child.constructed_at + child.latency
+                for child in self.children
+                if child.latency is not None
+            ),
+            default=0,
+        )
+
+    def summary(self) -> dict:
+        return {
+            **self.dict(),
+            "invoke_time": self.invoke_time,
+            "registration_time": self.registration_time,
+        }
+
+
+# Components in construction order, and the ones being constructed (innermost last)
+_components: List["DTComponent"] = []
+_constructing: List["DTComponent"] = []
+_invoke = pulumi.runtime.invoke
+
+
+@functools.wraps(pulumi.runtime.invoke)
+def _timed_invoke(tok, props, opts=None, typ=None, **kwargs):
+    start = time.perf_counter()
+    try:
+        return _invoke(tok, props, opts=opts, typ=typ, **kwargs)
+    finally:
+        if _constructing:
+            _constructing[-1].timing.invokes.append(
+                DTInvokeTiming(token=tok, duration=time.perf_counter() - start)
+            )
+
+
+def enable_invoke_timing():
+    """Record the invokes of the components until disable_invoke_timing() is called."""
+    global _invoke
+    # The providers look invoke up on pulumi.runtime on every call
+    if pulumi.runtime.invoke is not _timed_invoke:
+        _invoke = pulumi.runtime.invoke
+        pulumi.runtime.invoke = _timed_invoke
+
+
+def disable_invoke_timing():
+    """Put back the pulumi.runtime.invoke that enable_invoke_timing() wrapped."""
+    if pulumi.runtime.invoke is _timed_invoke:
+        pulumi.runtime.invoke = _invoke
+
+
+class DTComponent(ComponentResource):
+    """A ComponentResource timing its construction, children and invokes."""
+
+    def __init__(self, t: Text, name: Text, opts: Optional[ResourceOptions] = None):
+        self._started = time.perf_counter()
+        self.timing = DTComponentTiming(type=t, name=name)
+        self._child_resources: List[pulumi.Resource] = []
+        self._children_resolved: Output = Output.from_input([])
+        _components.append(self)
+        _constructing.append(self)
+        if os.environ.get(REPORT_ENV):
+            enable_invoke_timing()
+
+        # Children inherit the transformations of their parent
+        opts = ResourceOptions.merge(
+            opts, ResourceOptions(transformations=[self._record_child])
+        )
+        super().__init__(t, name, opts=opts)
+
+    def _record_child(self, args: pulumi.ResourceTransformationArgs):
+        # Only the direct children, the grandchildren belong to a nested component
+        if args.opts is not None and args.opts.parent is self:
+            self.timing.children.append(
+                DTChildTiming(
+                    type=args.type_,
+                    name=args.name,
+                    constructed_at=time.perf_counter() - self._started,
+                )
+            )
+            self._child_resources.append(args.resource)
+        return None
+
+    def _record_latency(self, child: DTChildTiming, resource: pulumi.Resource):
+        def resolved(urn):
+            child.latency = time.perf_counter() - self._started - child.constructed_at
+            return urn
+
+        return resource.urn.apply(resolved)
+
+    def register_outputs(self, outputs):
+        self.timing.construction = time.perf_counter() - self._started
+        if self in _constructing:
+            _constructing.remove(self)
+        self._children_resolved = Output.all(
+            *[
+                self._record_latency(child, resource)
+                for child, resource in zip(self.timing.children, self._child_resources)
+            ]
+        )
+        super().register_outputs(outputs)
+
+
+def get_component_timings() -> List[DTComponentTiming]:
+    return [component.timing for component in _components]
+
+
+def clear_component_timings():
+    """Forget the components recorded so far, e.g. before running a program again."""
+    _components.clear()
+    _constructing.clear()
+
+
+def build_component_report(timings: List[DTComponentTiming]) -> dict:
+    """Report the components slowest first.
+
+    :param timings: The timings of the components of a stack.
+    :type timings: List[DTComponentTiming]
+
+    :rtype: dict
+    """
+    components = sorted(
+        timings,
+        key=lambda timing: timing.construction + timing.registration_time,
+        reverse=True,
+    )
+    return {
+        "project": pulumi.get_project(),
+        "stack": pulumi.get_stack(),
+        "construction": sum(timing.construction for timing in timings),
+        "invoke_time": sum(timing.invoke_time for timing in timings),
+        "components": [timing.summary() for timing in components],
+    }
+
+
+def _write_report(path: Text, report: dict) -> Text:
+    report_path = Path(
+        path.format(project=report["project"], stack=report["stack"])
+    ).expanduser()
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    return str(report_path)
+
+
+def export_component_report(destination: Optional[Text] = None) -> Optional[Output]:
+    """Publish the report of the components of the program once every child resolved.
+
+    :param destination: `output` or a JSON file path, defaults to DT_COMPONENT_REPORT.
+        Nothing is published when neither is set.
+    :type destination: Optional[Text]
+
+    :rtype: Optional[Output]
+    """
+    # The components are all constructed, stop wrapping the invokes of the program
+    disable_invoke_timing()
+    destination = destination or os.environ.get(REPORT_ENV)
+    if not destination:
+        return None
+
+    report: Any = Output.all(
+        *[component._children_resolved for component in _components]
+    ).apply(lambda _: build_component_report(get_component_timings()))
+
+    if destination == REPORT_OUTPUT:
+        pulumi.export("component_report", report)
+    else:
+        report = report.apply(lambda content: _write_report(destination, content))
+        pulumi.export("component_report_path", report)
+    return report
@@ -0,0 +1,149 @@
+"""Profile the import time of each project entry point.
+
+The imports of a project __main__.py are run in a fresh interpreter with `-X importtime`,
+so nothing already imported by the caller hides their cost. The report groups the time
+spent by package, with pulumi_aws split by service, and lists the slowest modules.
+
+Usage:
+    python -m educate_infrastructure.lib.import_profile [networking databases] [--top 15]
+    python -m educate_infrastructure.lib.import_profile --json import_profile.json
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Text
+
+from pydantic import BaseModel
+
+from educate_infrastructure.lib.orchestrator import EDUCATE_PROJECTS, ROOT_DIR
+
+IMPORT_TIME_PREFIX = "import time:"
+
+
+class DTImportTiming(BaseModel):
+    module: Text
+    self_time: float  # Seconds
+    cumulative: float  # Seconds
+
+
+class DTImportProfile(BaseModel):
+    """Import time of a project entry point."""
+
+    project: Text
+    modules: List[Text]  # The modules imported by the entry point
+    total: float  # Seconds
+    packages: Dict[Text, float]  # Self time by package, slowest first
+    slowest: List[DTImportTiming]
+
+
+def entry_point_imports(path: Path) -> List[Text]:
+    """The absolute modules imported at the top level of a program.
+
+    :param path: Path of the program.
+    :type path: Path
+
+    :rtype: List[Text]
+    """
+    modules: List[Text] = []
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def package_of(module: Text) -> Text:
+    """Group a module by top level package, pulumi_aws modules by service."""
+    parts = module.split(".")
+    if parts[0] == "pulumi_aws" and len(parts) > 1 and not parts[1].startswith("_"):
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+def parse_import_times(stderr: Text) -> List[DTImportTiming]:
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        self_time, cumulative, module = line[len(IMPORT_TIME_PREFIX) :].split("|")
+        if not self_time.strip().isdigit():  # The header line
+            continue
+        timings.append(
+            DTImportTiming(
+                module=module.strip(),
+                self_time=int(self_time) / 1e6,
+                cumulative=int(cumulative) / 1e6,
+            )
+        )
+    return timings
+
+
+def build_profile(
+    project: Text, modules: List[Text], timings: List[DTImportTiming], top: int = 15
+) -> DTImportProfile:
+    packages: Counter = Counter()
+    for timing in timings:
+        packages[package_of(timing.module)] += timing.self_time
+    return DTImportProfile(
+        project=project,
+        modules=modules,
+        total=sum(timing.self_time for timing in timings),
+        packages=dict(packages.most_common()),
+        slowest=sorted(timings, key=lambda timing: timing.self_time, reverse=True)[
+            :top
+        ],
+    )
+
+
+def profile_project(project: Text, work_dir: Path, top: int = 15) -> DTImportProfile:
+    modules = entry_point_imports(work_dir / "__main__.py")
+    env = {**os.environ, "PYTHONPATH": str(ROOT_DIR.parent)}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=str(work_dir),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return build_profile(project, modules, parse_import_times(completed.stderr), top)
+
+
+def main(argv: Optional[List[Text]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "projects", nargs="*", help="projects to profile, all by default"
+    )
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--json", type=Path, help="also write the profiles to a file")
+    args = parser.parse_args(argv)
+
+    profiles = [
+        profile_project(project.name, project.work_dir, args.top)
+        for project in EDUCATE_PROJECTS
+        if not args.projects or project.name in args.projects
+    ]
+
+    for profile in profiles:
+        print(f"{profile.project}: {profile.total * 1000:.0f} ms")
+        for package, self_time in list(profile.packages.items())[: args.top]:
+            print(f"  {package:<40} {self_time * 1000:8.1f} ms")
+        print("  slowest modules:")
+        for timing in profile.slowest:
+            print(f"  {timing.module:<40} {timing.self_time * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as profile_file:
+            json.dump([profile.dict() for profile in profiles], profile_file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
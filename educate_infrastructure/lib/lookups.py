@@ -0,0 +1,248 @@
+"""Shared, on-disk memoization of the provider data-source lookups our programs make.
+
+Every preview or update re-runs the blocking invokes (AMI, availability zone and hosted
+zone lookups) at construction time. This module keeps their results in a small JSON cache
+keyed by lookup kind, region and arguments so that repeated runs stop paying a round trip
+per lookup.
+
+The behaviour is controlled through environment variables:
+- DT_LOOKUP_CACHE: path of the cache file
+  (default: ~/.cache/educate_infrastructure/lookups.json)
+- DT_LOOKUP_CACHE_TTL: lifetime of an entry in seconds (default: 3600)
+- DT_LOOKUP_CACHE_MODE: one of
+    - cached: serve entries younger than the TTL, refresh the others (default)
+    - pinned: serve any recorded entry regardless of age, only fetch missing ones.
+      Point DT_LOOKUP_CACHE at a committed file to get reproducible runs.
+    - refresh: always fetch and overwrite the recorded entries
+    - off: bypass the cache entirely
+
+Lookups made while the Pulumi mocks are active are never cached. Programs running at the
+same time share the file: updates are merged into it under an exclusive lock.
+"""
+import fcntl
+import json
+import os
+import sys
+import tempfile
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Text
+
+from pulumi import Config
+from pulumi.runtime.mocks import MockMonitor
+from pulumi.runtime.settings import get_monitor
+from pulumi_aws import ec2, get_availability_zones, route53
+from pydantic import BaseModel
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "educate_infrastructure" / "lookups.json"
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_REGION = "eu-west-2"
+
+
+class CacheMode(str, Enum):
+    cached = "cached"
+    pinned = "pinned"
+    refresh = "refresh"
+    off = "off"
+
+
+class AmiLookup(BaseModel):
+    """Subset of the AMI lookup result used by our components."""
+
+    id: Text
+    name: Optional[Text] = None
+    architecture: Optional[Text] = None
+
+
+class AvailabilityZonesLookup(BaseModel):
+    """Subset of the availability zones lookup result used by our components."""
+
+    names: List[Text]
+    zone_ids: List[Text] = []
+
+
+class HostedZoneLookup(BaseModel):
+    """Subset of the Route53 hosted zone lookup result used by our components."""
+
+    zone_id: Text
+    name: Text
+
+
+class LookupCache(object):
+    """JSON file backed cache of lookup results with a TTL and a pinned mode."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: Optional[int] = None,
+        mode: Optional[CacheMode] = None,
+    ):
+        self.path = Path(path or os.environ.get("DT_LOOKUP_CACHE", DEFAULT_CACHE_PATH))
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+        self.ttl = int(
+            ttl
+            if ttl is not None
+            else os.environ.get("DT_LOOKUP_CACHE_TTL", DEFAULT_TTL_SECONDS)
+        )
+        self.mode = CacheMode(
+            mode or os.environ.get("DT_LOOKUP_CACHE_MODE", CacheMode.cached)
+        )
+        self._entries: Optional[Dict[Text, Dict[Text, Any]]] = None
+
+    @staticmethod
+    def make_key(kind: Text, region: Text, params: Dict[Text, Any]) -> Text:
+        return f"{kind}:{region}:{json.dumps(params, sort_keys=True)}"
+
+    def get_or_fetch(
+        self,
+        kind: Text,
+        region: Text,
+        params: Dict[Text, Any],
+        fetch: Callable[[], Dict[Text, Any]],
+    ) -> Dict[Text, Any]:
+        """Return the recorded value for the lookup or call `fetch` and record it."""
+        if self.mode == CacheMode.off:
+            return fetch()
+
+        key = self.make_key(kind, region, params)
+        entry = self._load().get(key)
+        if entry is not None and self._is_fresh(entry):
+            return entry["value"]
+
+        value = fetch()
+        entry = {"kind": kind, "fetched_at": time.time(), "value": value}
+        self._update(lambda entries: entries.update({key: entry}))
+        return value
+
+    def invalidate(self, kind: Optional[Text] = None) -> int:
+        """Drop every entry, or only the entries of one lookup kind.
+
+        :returns: The number of entries removed.
+        """
+
+        def remove(entries: Dict[Text, Dict[Text, Any]]) -> int:
+            stale = [
+                key for key, entry in entries.items() if kind in (None, entry["kind"])
+            ]
+            for key in stale:
+                del entries[key]
+            return len(stale)
+
+        return self._update(remove)
+
+    def _is_fresh(self, entry: Dict[Text, Any]) -> bool:
+        if self.mode == CacheMode.pinned:
+            return True
+        if self.mode == CacheMode.refresh:
+            return False
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def _load(self) -> Dict[Text, Dict[Text, Any]]:
+        if self._entries is None:
+            try:
+                with self.path.open() as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _update(self, change: Callable[[Dict[Text, Dict[Text, Any]]], Any]) -> Any:
+        # Re-read the file under the lock, so that the entries other programs recorded
+        # since this one loaded it are kept.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._entries = None
+            result = change(self._load())
+            self._save()
+        return result
+
+    def _save(self):
+        # Write to a temporary file first so that concurrent programs never read a
+        # partially written cache.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, str(self.path))
+
+
+_cache: Optional[LookupCache] = None
+
+
+def get_cache() -> LookupCache:
+    global _cache
+    if _cache is None:
+        _cache = LookupCache()
+    return _cache
+
+
+def _cached_lookup(
+    kind: Text, params: Dict[Text, Any], fetch: Callable[[], Dict[Text, Any]]
+) -> Dict[Text, Any]:
+    if isinstance(get_monitor(), MockMonitor):
+        return fetch()
+    # The lookups go through the default provider, so they run in the stack region
+    region = Config("aws").get("region") or DEFAULT_REGION
+    return get_cache().get_or_fetch(kind, region, params, fetch)
+
+
+def lookup_ami(
+    owners: List[Text],
+    filters: Dict[Text, List[Text]],
+    most_recent: bool = True,
+) -> AmiLookup:
+    """Find an AMI, going through the lookup cache.
+
+    :param owners: AWS account IDs or aliases owning the image.
+    :type owners: List[Text]
+
+    :param filters: Mapping of filter name to the accepted values.
+    :type filters: Dict[Text, List[Text]]
+    """
+
+    def fetch():
+        ami = ec2.get_ami(
+            most_recent=most_recent,
+            owners=owners,
+            filters=[
+                ec2.GetAmiFilterArgs(name=name, values=values)
+                for name, values in filters.items()
+            ],
+        )
+        return {"id": ami.id, "name": ami.name, "architecture": ami.architecture}
+
+    params = {"owners": owners, "filters": filters, "most_recent": most_recent}
+    return AmiLookup(**_cached_lookup("ami", params, fetch))
+
+
+def lookup_availability_zones(state: Text = "available") -> AvailabilityZonesLookup:
+    """List the availability zones of the region, going through the lookup cache."""
+
+    def fetch():
+        zones = get_availability_zones(state=state)
+        return {"names": zones.names, "zone_ids": zones.zone_ids or []}
+
+    return AvailabilityZonesLookup(
+        **_cached_lookup("availability_zones", {"state": state}, fetch)
+    )
+
+
+def lookup_hosted_zone(name: Text, private_zone: bool = False) -> HostedZoneLookup:
+    """Find a Route53 hosted zone by name, going through the lookup cache."""
+
+    def fetch():
+        zone = route53.get_zone(name=name, private_zone=private_zone)
+        return {"zone_id": zone.zone_id, "name": zone.name}
+
+    params = {"name": name, "private_zone": private_zone}
+    return HostedZoneLookup(**_cached_lookup("hosted_zone", params, fetch))
+
+
+if __name__ == "__main__":
+    # python -m educate_infrastructure.lib.lookups clear [kind]
+    if len(sys.argv) < 2 or sys.argv[1] != "clear":
+        sys.exit("usage: python -m educate_infrastructure.lib.lookups clear [kind]")
+    removed = get_cache().invalidate(sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Removed {removed} cached lookup(s) from {get_cache().path}")
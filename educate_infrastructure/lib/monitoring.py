@@ -0,0 +1,253 @@
+"""Standard CloudWatch dashboard and alarms of our components.
+
+A component describes what to watch by returning DTMetric objects from its
+monitoring_metrics() method: the CloudWatch metric, how to aggregate it and the default
+alarm threshold, None meaning the metric is only graphed. attach_monitoring() then builds,
+under the component, a dashboard graphing every metric and an alarm per metric with a
+threshold:
+
+    vpc_monitoring = attach_monitoring(
+        apps_vpc, stack_monitoring_config(f"educate-app-vpc-{env}", "vpc")
+    )
+
+The thresholds are overridden by metric key from the `monitoring` stack configuration,
+keyed by component, e.g.
+
+    monitoring:enabled: "true"
+    monitoring:alarm_actions: '["arn:aws:sns:eu-west-2:198538058567:ops"]'
+    monitoring:thresholds: '{"aurora": {"cpu": 70, "connections": 80}}'
+
+where setting a key to null turns its alarm off.
+"""
+import json
+from typing import Any, Dict, List, Optional, Text
+
+from pulumi import Config, Output, ResourceOptions, info
+from pulumi_aws import cloudwatch
+from pydantic import BaseModel, PositiveInt
+
+from educate_infrastructure.lib.component import DTComponent
+
+DEFAULT_REGION = "eu-west-2"
+
+# Widgets laid out two per row, CloudWatch dashboards are 24 units wide
+WIDGET_WIDTH = 12
+WIDGET_HEIGHT = 6
+
+
+class DTMetric(BaseModel):
+    """A metric of a component, graphed and optionally alarmed on."""
+
+    key: Text  # Identifies the threshold in the configuration, e.g. cpu
+    title: Text
+    namespace: Text
+    metric_name: Text
+    dimensions: Dict[Text, Any]  # Values may be outputs
+    # Distinguishes the metrics sharing a key, e.g. one per instance
+    label: Optional[Text] = None
+    statistic: Text = "Average"  # Or a percentile such as p99
+    period: PositiveInt = 300  # Seconds
+    comparison_operator: Text = "GreaterThanOrEqualToThreshold"
+    threshold: Optional[float] = None  # Only graphed when None
+    evaluation_periods: PositiveInt = 3
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def suffix(self) -> Text:
+        return f"{self.key}-{self.label}" if self.label else self.key
+
+    @property
+    def is_percentile(self) -> bool:
+        return self.statistic.startswith("p")
+
+
+class DTMonitoringConfig(BaseModel):
+    """Configuration object for the dashboard and alarms of a component."""
+
+    name: Text
+    thresholds: Dict[Text, Optional[float]] = {}  # By metric key, None disables
+    alarm_actions: List[Text] = []  # SNS topics notified on alarm and on recovery
+    region: Text = DEFAULT_REGION
+    dashboard: bool = True
+    tags: Dict = {"pulumi_managed": "true"}
+
+
+def stack_monitoring_config(name: Text, key: Text) -> Optional[DTMonitoringConfig]:
+    """Read the monitoring of a component from the `monitoring` stack configuration.
+
+    :param name: Name of the dashboard and prefix of the alarms.
+    :type name: Text
+
+    :param key: Key of the component thresholds in monitoring:thresholds.
+    :type key: Text
+
+    :returns: None unless monitoring:enabled is set.
+
+    :rtype: Optional[DTMonitoringConfig]
+    """
+    monitoring_config = Config("monitoring")
+    if not monitoring_config.get_bool("enabled"):
+        return None
+    thresholds = monitoring_config.get_object("thresholds") or {}
+    return DTMonitoringConfig(
+        name=name,
+        thresholds=thresholds.get(key, {}),
+        alarm_actions=monitoring_config.get_object("alarm_actions") or [],
+        region=Config("aws").get("region") or DEFAULT_REGION,
+    )
+
+
+class DTMonitoring(DTComponent):
+    """
+    Dashboard and alarms watching the metrics of a component
+
+    """
+
+    def __init__(
+        self,
+        monitoring_config: DTMonitoringConfig,
+        metrics: List[DTMetric],
+        opts: ResourceOptions = None,
+    ):
+        """Create the dashboard and the alarms of the metrics.
+
+        :param monitoring_config: Configuration object for customizing the thresholds.
+        :type monitoring_config: DTMonitoringConfig
+
+        :param metrics: The metrics of the component.
+        :type metrics: List[DTMetric]
+
+        :raises ValueError: When a configured threshold matches no metric.
+
+        :returns: The constructed component resource object.
+
+        :rtype: DTMonitoring
+        """
+        unknown = set(monitoring_config.thresholds) - {metric.key for metric in metrics}
+        if unknown:
+            raise ValueError(
+                f"{monitoring_config.name} has no metric named {', '.join(sorted(unknown))}"
+            )
+
+        super().__init__(
+            "diceytech:infrastructure:aws:DTMonitoring",
+            f"{monitoring_config.name}-monitoring",
+            opts,
+        )
+
+        self.name = monitoring_config.name
+        self.metrics = metrics
+        self.alarms: Dict[Text, cloudwatch.MetricAlarm] = {}
+
+        for metric in metrics:
+            threshold = monitoring_config.thresholds.get(metric.key, metric.threshold)
+            if threshold is not None:
+                self.create_alarm(monitoring_config, metric, threshold)
+
+        self.dashboard = None
+        if monitoring_config.dashboard:
+            self.dashboard = cloudwatch.Dashboard(
+                f"{self.name}-dashboard",
+                dashboard_name=self.name,
+                dashboard_body=self.build_dashboard_body(monitoring_config),
+                opts=ResourceOptions(parent=self),
+            )
+
+        self.register_outputs(
+            {
+                "dashboard_name": self.get_dashboard_name(),
+                "alarm_arns": self.get_alarm_arns(),
+            }
+        )
+
+        info(msg=f"{self.name} monitoring created.", resource=self)
+
+    def create_alarm(
+        self, monitoring_config: DTMonitoringConfig, metric: DTMetric, threshold: float
+    ):
+        self.alarms[metric.suffix] = cloudwatch.MetricAlarm(
+            f"{self.name}-{metric.suffix}-alarm",
+            alarm_description=f"{metric.title} of {self.name}",
+            namespace=metric.namespace,
+            metric_name=metric.metric_name,
+            dimensions=metric.dimensions,
+            statistic=None if metric.is_percentile else metric.statistic,
+            extended_statistic=metric.statistic if metric.is_percentile else None,
+            period=metric.period,
+            evaluation_periods=metric.evaluation_periods,
+            comparison_operator=metric.comparison_operator,
+            threshold=threshold,
+            treat_missing_data="notBreaching",
+            alarm_actions=monitoring_config.alarm_actions,
+            ok_actions=monitoring_config.alarm_actions,
+            tags=monitoring_config.tags,
+            opts=ResourceOptions(parent=self),
+        )
+
+    def build_dashboard_body(self, monitoring_config: DTMonitoringConfig) -> Output:
+        widgets = []
+        for index, metric in enumerate(self.metrics):
+            threshold = monitoring_config.thresholds.get(metric.key, metric.threshold)
+            dimensions = [
+                item
+                for name, value in metric.dimensions.items()
+                for item in (name, value)
+            ]
+            widgets.append(
+                {
+                    "type": "metric",
+                    "x": (index % 2) * WIDGET_WIDTH,
+                    "y": (index // 2) * WIDGET_HEIGHT,
+                    "width": WIDGET_WIDTH,
+                    "height": WIDGET_HEIGHT,
+                    "properties": {
+                        "title": metric.title,
+                        "region": monitoring_config.region,
+                        "metrics": [
+                            [metric.namespace, metric.metric_name, *dimensions]
+                        ],
+                        "stat": metric.statistic,
+                        "period": metric.period,
+                        "annotations": {
+                            "horizontal": (
+                                []
+                                if threshold is None
+                                else [{"label": "Alarm", "value": threshold}]
+                            )
+                        },
+                    },
+                }
+            )
+        return Output.from_input({"widgets": widgets}).apply(json.dumps)
+
+    def get_dashboard_name(self) -> Optional[Text]:
+        if self.dashboard is not None:
+            return self.dashboard.dashboard_name
+
+    def get_alarm_arns(self) -> Dict[Text, Text]:
+        return {suffix: alarm.arn for suffix, alarm in self.alarms.items()}
+
+
+def attach_monitoring(
+    component: Any, monitoring_config: Optional[DTMonitoringConfig]
+) -> Optional[DTMonitoring]:
+    """Watch a component exposing monitoring_metrics() with the standard dashboard.
+
+    :param component: The component to watch.
+    :type component: DTComponent
+
+    :param monitoring_config: Configuration of the dashboard and alarms, nothing is
+        created when None.
+    :type monitoring_config: Optional[DTMonitoringConfig]
+
+    :rtype: Optional[DTMonitoring]
+    """
+    if monitoring_config is None:
+        return None
+    return DTMonitoring(
+        monitoring_config,
+        component.monitoring_metrics(),
+        opts=ResourceOptions(parent=component),
+    )
@@ -0,0 +1,209 @@
+"""Deploy the Educate projects as a dependency graph using the Pulumi Automation API.
+
+The databases program only consumes the outputs of the networking stack. The educate
+program also reads the cache of the databases stack for its Celery workers, so it is
+deployed once both are up. Destroy walks the graph in reverse: every dependent stack is
+removed before the stacks it reads from. Previews do not change any state, so every
+project is previewed at once.
+
+Usage:
+    python -m educate_infrastructure.lib.orchestrator up --stack prod --concurrency 2
+"""
+import argparse
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Text
+
+from pydantic import BaseModel, PositiveInt
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+class DTProject(BaseModel):
+    """A Pulumi project and the outputs it needs from the projects it depends on."""
+
+    name: Text
+    work_dir: Path
+    depends_on: Dict[Text, List[Text]] = {}  # Project name -> required output keys
+
+
+EDUCATE_PROJECTS = [
+    DTProject(name="networking", work_dir=ROOT_DIR / "infra" / "network"),
+    DTProject(
+        name="databases",
+        work_dir=ROOT_DIR / "databases",
+        depends_on={
+            "networking": [
+                "apps_vpc_id",
+                "apps_vpc_cidr_block",
+                "apps_private_subnet_ids",
+                "db_subnet_group_name",
+            ]
+        },
+    ),
+    DTProject(
+        name="educate",
+        work_dir=ROOT_DIR / "applications" / "educate",
+        depends_on={
+            "networking": [
+                "apps_vpc_id",
+                "apps_public_subnet_ids",
+                "apps_private_subnet_ids",
+            ],
+            # The cache outputs are only read with workers:enabled
+            "databases": [],
+        },
+    ),
+]
+
+
+class MissingStackOutputError(Exception):
+    """Raised when a stack does not export an output one of its dependents requires."""
+
+
+def reverse_dependencies(projects: List[DTProject]) -> Dict[Text, Set[Text]]:
+    """Map each project name to the names of the projects depending on it."""
+    dependents: Dict[Text, Set[Text]] = {project.name: set() for project in projects}
+    for project in projects:
+        for dependency in project.depends_on:
+            dependents[dependency].add(project.name)
+    return dependents
+
+
+def run_graph(
+    dependencies: Dict[Text, Set[Text]],
+    run: Callable[[Text], None],
+    concurrency: int = 2,
+) -> Dict[Text, Optional[BaseException]]:
+    """Call `run` for every node once all of its dependencies completed successfully.
+
+    Independent nodes run at the same time, up to `concurrency` at once. Nodes whose
+    dependencies failed are never started.
+
+    :param dependencies: Mapping of node name to the names of the nodes it waits for.
+    :type dependencies: Dict[Text, Set[Text]]
+
+    :returns: Mapping of every started node to the exception it raised, or None.
+    :rtype: Dict[Text, Optional[BaseException]]
+    """
+    unknown = {dep for deps in dependencies.values() for dep in deps} - set(
+        dependencies
+    )
+    if unknown:
+        raise ValueError(f"Unknown dependencies: {sorted(unknown)}")
+
+    results: Dict[Text, Optional[BaseException]] = {}
+    skipped: Set[Text] = set()
+    pending = dict(dependencies)
+    running: Dict[Future, Text] = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while pending or running:
+            for name, deps in list(pending.items()):
+                if any(dep in skipped or results.get(dep) for dep in deps):
+                    skipped.add(name)
+                    del pending[name]
+                elif all(dep in results for dep in deps):
+                    running[executor.submit(run, name)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between {sorted(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.exception()
+
+    return results
+
+
+class DTOrchestrator(object):
+    """Run Pulumi operations across the Educate projects respecting their dependencies."""
+
+    def __init__(
+        self,
+        stack_name: Text,
+        projects: List[DTProject] = EDUCATE_PROJECTS,
+        concurrency: PositiveInt = 2,
+    ):
+        self.stack_name = stack_name
+        self.projects = {project.name: project for project in projects}
+        self.concurrency = concurrency
+
+    def up(self) -> Dict[Text, Optional[BaseException]]:
+        def deploy(name: Text):
+            self._check_required_outputs(name)
+            self._select(name).up(on_output=self._printer(name))
+
+        return run_graph(self._dependencies(), deploy, self.concurrency)
+
+    def preview(self) -> Dict[Text, Optional[BaseException]]:
+        def preview(name: Text):
+            self._select(name).preview(on_output=self._printer(name))
+
+        independent = {name: set() for name in self.projects}
+        return run_graph(independent, preview, self.concurrency)
+
+    def destroy(self) -> Dict[Text, Optional[BaseException]]:
+        def destroy(name: Text):
+            self._select(name).destroy(on_output=self._printer(name))
+
+        dependents = reverse_dependencies(list(self.projects.values()))
+        return run_graph(dependents, destroy, self.concurrency)
+
+    def _dependencies(self) -> Dict[Text, Set[Text]]:
+        return {
+            name: set(project.depends_on) for name, project in self.projects.items()
+        }
+
+    def _select(self, name: Text):
+        # Imported here so that the component modules never pay for the automation API.
+        from pulumi import automation
+
+        return automation.select_stack(
+            stack_name=self.stack_name, work_dir=str(self.projects[name].work_dir)
+        )
+
+    def _check_required_outputs(self, name: Text):
+        for dependency, keys in self.projects[name].depends_on.items():
+            outputs = self._select(dependency).outputs()
+            missing = [key for key in keys if key not in outputs]
+            if missing:
+                raise MissingStackOutputError(
+                    f"{dependency} does not export {missing} required by {name}"
+                )
+
+    @staticmethod
+    def _printer(name: Text) -> Callable[[Text], None]:
+        def print_line(line: Text):
+            print(f"[{name}] {line}", flush=True)
+
+        return print_line
+
+
+def main(argv: Optional[List[Text]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("operation", choices=["up", "preview", "destroy"])
+    parser.add_argument("--stack", default="prod")
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    orchestrator = DTOrchestrator(args.stack, concurrency=args.concurrency)
+    results = getattr(orchestrator, args.operation)()
+
+    for name in orchestrator.projects:
+        if name not in results:
+            print(f"{name}: skipped")
+        elif results[name] is None:
+            print(f"{name}: {args.operation} succeeded")
+        else:
+            print(f"{name}: {args.operation} failed: {results[name]}")
+
+    return int(len(results) != len(orchestrator.projects) or any(results.values()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Resolve the stacks our programs reference once per process, with typed outputs.
+
+Each referenced stack is read from the state backend a single time, however many programs
+or components in the process ask for it. Its outputs are exposed through a pydantic model
+so that a mistyped key fails as soon as it is accessed and a missing or malformed output
+fails validation instead of flowing into resources.
+"""
+from typing import Dict, List, Text, Tuple, Type
+
+from pulumi import Output, StackReference
+from pydantic import BaseModel
+
+NETWORKING_STACK = "BbrSofiane/networking/prod"
+DATABASES_STACK = "BbrSofiane/databases/prod"
+
+
+class NetworkingOutputs(BaseModel):
+    """Outputs exported by the networking project (infra/network/__main__.py)."""
+
+    apps_vpc_id: Text
+    apps_vpc_cidr_block: Text
+    apps_public_subnet_ids: List[Text]
+    apps_private_subnet_ids: List[Text]
+    db_subnet_group_name: Text
+
+
+class DatabasesOutputs(BaseModel):
+    """Outputs of the databases project (databases/__main__.py) read by the workers."""
+
+    # Only exported with cache:enabled
+    cache_primary_endpoint: Text
+    cache_auth_token_secret_arn: Text
+
+
+class DTStackOutputs(object):
+    """Typed view of the outputs of a referenced stack.
+
+    Every field of the model is available as an attribute returning an `Output` of the
+    validated value.
+    """
+
+    def __init__(self, reference: StackReference, model: Type[BaseModel]):
+        self.reference = reference
+        self.model = model
+        self._validated = reference.outputs.apply(
+            lambda outputs: model(**{key: outputs.get(key) for key in model.__fields__})
+        )
+
+    def __getattr__(self, key: Text) -> Output:
+        if key not in self.model.__fields__:
+            raise AttributeError(f"{self.model.__name__} has no output named {key}")
+        return self._validated.apply(lambda outputs: getattr(outputs, key))
+
+
+_references: Dict[Text, StackReference] = {}
+_outputs: Dict[Tuple[Text, Type[BaseModel]], DTStackOutputs] = {}
+
+
+def get_stack_reference(stack_name: Text) -> StackReference:
+    """Return the process-wide StackReference for a fully qualified stack name."""
+    if stack_name not in _references:
+        _references[stack_name] = StackReference(stack_name)
+    return _references[stack_name]
+
+
+def get_stack_outputs(stack_name: Text, model: Type[BaseModel]) -> DTStackOutputs:
+    """Return the typed outputs of a stack, resolving the stack at most once."""
+    key = (stack_name, model)
+    if key not in _outputs:
+        _outputs[key] = DTStackOutputs(get_stack_reference(stack_name), model)
+    return _outputs[key]
+
+
+def clear_stack_references():
+    """Forget the resolved stacks, e.g. before running a program again in the process."""
+    _references.clear()
+    _outputs.clear()
+
+
+def networking_outputs(stack_name: Text = NETWORKING_STACK) -> DTStackOutputs:
+    """Typed outputs of the networking stack.
+
+    :param stack_name: Fully qualified name of the networking stack.
+    :type stack_name: Text
+
+    :rtype: DTStackOutputs
+    """
+    return get_stack_outputs(stack_name, NetworkingOutputs)
+
+
+def databases_outputs(stack_name: Text = DATABASES_STACK) -> DTStackOutputs:
+    """Typed outputs of the databases stack.
+
+    :param stack_name: Fully qualified name of the databases stack.
+    :type stack_name: Text
+
+    :rtype: DTStackOutputs
+    """
+    return get_stack_outputs(stack_name, DatabasesOutputs)
@@ -0,0 +1,121 @@
+"""Shared Pulumi mock engine for the component test suites.
+
+A single engine is registered once per test session (and so once per pytest-xdist
+worker process) by the autouse fixture in educate_infrastructure/conftest.py. It answers
+from the recorded fixtures in lib/fixtures/aws_mocks.json:
+- invokes: the result returned for a data source token
+- resources: the extra outputs of a resource type, merged over its inputs. String values
+  are templates where {name} is the resource name and any other {key} an input of the
+  resource, falling back to the resource name when the input is not set.
+- stack_references: the outputs of every referenced stack
+
+Every resource gets a generic arn, imported resources keep the ID they are imported with,
+and the engine counts the resources and invokes it served. Set DT_MOCK_RECORD to a directory to have the tokens missing from the fixtures
+written there at the end of the session, one file per xdist worker, to extend the
+fixtures with.
+"""
+import json
+import os
+import string
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Text
+
+import pulumi
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures" / "aws_mocks.json"
+
+
+class _Template(dict):
+    def __init__(self, name: Text, inputs: Dict[Text, Any]):
+        super().__init__(inputs, name=name)
+        self.name = name
+
+    def __missing__(self, key: Text) -> Text:
+        return self.name
+
+
+def _render(value: Any, context: _Template) -> Any:
+    if isinstance(value, str):
+        return string.Formatter().vformat(value, (), context)
+    if isinstance(value, list):
+        return [_render(item, context) for item in value]
+    if isinstance(value, dict):
+        return {key: _render(item, context) for key, item in value.items()}
+    return value
+
+
+class DTMockEngine(pulumi.runtime.Mocks):
+    """Pulumi mocks answering from recorded fixtures."""
+
+    def __init__(self, fixtures_path: Path = FIXTURES_PATH):
+        with open(fixtures_path) as fixtures_file:
+            fixtures = json.load(fixtures_file)
+        self.region = fixtures["region"]
+        self.account_id = fixtures["account_id"]
+        self.invoke_fixtures: Dict[Text, Dict] = fixtures["invokes"]
+        self.resource_fixtures: Dict[Text, Dict] = fixtures["resources"]
+        self.stack_reference_outputs: Dict[Text, Any] = fixtures["stack_references"]
+        self.reset_counts()
+
+    def reset_counts(self):
+        self.resource_counts: Counter = Counter()
+        self.invoke_counts: Counter = Counter()
+        self.unmatched_invokes: Dict[Text, Dict] = {}
+        self.unmatched_resources: Dict[Text, Dict] = {}
+
+    def call(self, args: pulumi.runtime.MockCallArgs):
+        self.invoke_counts[args.token] += 1
+        if args.token not in self.invoke_fixtures:
+            self.unmatched_invokes[args.token] = args.args
+            return {}
+        return self.invoke_fixtures[args.token]
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        self.resource_counts[args.typ] += 1
+
+        if args.typ == "pulumi:pulumi:StackReference":
+            outputs = {**args.inputs, "outputs": self.stack_reference_outputs}
+            return [args.name + "_id", outputs]
+
+        service = args.typ.split(":")[1].split("/")[0]
+        outputs = {
+            "arn": f"arn:aws:{service}:{self.region}:{self.account_id}:{args.name}",
+            **args.inputs,
+        }
+        if args.typ in self.resource_fixtures:
+            context = _Template(args.name, args.inputs)
+            outputs.update(_render(self.resource_fixtures[args.typ], context))
+        elif args.typ.startswith("aws:"):
+            self.unmatched_resources[args.typ] = args.inputs
+
+        return [args.resource_id or args.name + "_id", outputs]
+
+    def dump_unmatched(self, directory: Text):
+        """Write the tokens missing from the fixtures, one file per xdist worker."""
+        worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+        path = Path(directory) / f"unmatched-{worker}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as unmatched_file:
+            json.dump(
+                {
+                    "invokes": self.unmatched_invokes,
+                    "resources": self.unmatched_resources,
+                },
+                unmatched_file,
+                indent=2,
+                sort_keys=True,
+                default=str,
+            )
+
+
+_engine: Optional[DTMockEngine] = None
+
+
+def use_mock_engine() -> DTMockEngine:
+    """Register the process-wide mock engine with the Pulumi runtime."""
+    global _engine
+    if _engine is None:
+        _engine = DTMockEngine()
+        pulumi.runtime.set_mocks(_engine, preview=False)
+    return _engine
@@ -0,0 +1,49 @@
+from educate_infrastructure.lib.benchmark import (
+    SCENARIOS,
+    DTBenchmarkResult,
+    load_baselines,
+    regressions,
+    run_scenario,
+    save_baselines,
+)
+
+BASELINE = DTBenchmarkResult(
+    name="vpc", wall_time=0.1, peak_memory=1000, resource_count=30, invoke_count=1
+)
+
+
+def test_within_tolerance_is_not_a_regression():
+    result = BASELINE.copy(update={"wall_time": 0.14, "resource_count": 28})
+    assert regressions(result, BASELINE, tolerance=0.5) == []
+
+
+def test_slower_run_is_a_regression():
+    result = BASELINE.copy(update={"wall_time": 0.2})
+    found = regressions(result, BASELINE, tolerance=0.5)
+    assert len(found) == 1
+    assert found[0].startswith("wall_time")
+
+
+def test_extra_resources_are_a_regression():
+    result = BASELINE.copy(update={"resource_count": 31, "invoke_count": 2})
+    found = regressions(result, BASELINE, tolerance=0.5)
+    assert [regression.split()[0] for regression in found] == [
+        "resource_count",
+        "invoke_count",
+    ]
+
+
+def test_baselines_round_trip(tmp_path):
+    path = tmp_path / "baselines.json"
+    assert load_baselines(path) == {}
+    save_baselines([BASELINE], path)
+    assert load_baselines(path) == {"vpc": BASELINE}
+
+
+def test_component_scenario_is_measured():
+    scenario = next(scenario for scenario in SCENARIOS if scenario.name == "ec2")
+    result = run_scenario(scenario, repeat=1)
+    assert result.resource_count == 2
+    assert result.invoke_count == 1
+    assert result.wall_time > 0
+    assert result.peak_memory > 0
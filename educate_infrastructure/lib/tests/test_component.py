@@ -0,0 +1,114 @@
+import json
+
+import pulumi
+from pulumi import ResourceOptions
+from pulumi_aws import iam, s3
+
+from educate_infrastructure.lib.component import (
+    REPORT_ENV,
+    DTComponent,
+    build_component_report,
+    disable_invoke_timing,
+    enable_invoke_timing,
+    export_component_report,
+)
+
+
+class DTTimedBucket(DTComponent):
+    def __init__(self, name, opts=None):
+        super().__init__("diceytech:infrastructure:aws:DTTimedBucket", name, opts)
+        self.policy = iam.get_policy_document(
+            statements=[
+                iam.GetPolicyDocumentStatementArgs(
+                    actions=["s3:GetObject"], resources=["*"]
+                )
+            ]
+        )
+        self.bucket = s3.Bucket(f"{name}-bucket", opts=ResourceOptions(parent=self))
+        self.nested = DTNestedBucket(
+            f"{name}-nested", opts=ResourceOptions(parent=self)
+        )
+        self.register_outputs({})
+
+
+class DTNestedBucket(DTComponent):
+    def __init__(self, name, opts=None):
+        super().__init__("diceytech:infrastructure:aws:DTNestedBucket", name, opts)
+        self.bucket = s3.Bucket(f"{name}-bucket", opts=ResourceOptions(parent=self))
+        self.register_outputs({})
+
+
+class TestDTComponent(object):
+    @classmethod
+    def setup_class(cls):
+        enable_invoke_timing()
+        cls.component = DTTimedBucket("timed")
+        disable_invoke_timing()
+
+    def test_construction_is_timed(self):
+        assert self.component.timing.construction > 0
+        assert self.component.nested.timing.construction > 0
+
+    def test_only_direct_children_are_recorded(self):
+        assert [child.name for child in self.component.timing.children] == [
+            "timed-bucket",
+            "timed-nested",
+        ]
+        assert [child.name for child in self.component.nested.timing.children] == [
+            "timed-nested-bucket"
+        ]
+
+    def test_invokes_are_recorded(self):
+        assert [invoke.token for invoke in self.component.timing.invokes] == [
+            "aws:iam/getPolicyDocument:getPolicyDocument"
+        ]
+        assert self.component.nested.timing.invokes == []
+
+    @pulumi.runtime.test
+    def test_child_latency_is_recorded(self):
+        def check_latency(_):
+            assert all(
+                child.latency is not None for child in self.component.timing.children
+            )
+            assert self.component.timing.registration_time > 0
+
+        return self.component._children_resolved.apply(check_latency)
+
+    def test_report_is_sorted_slowest_first(self):
+        report = build_component_report(
+            [self.component.nested.timing, self.component.timing]
+        )
+        assert report["components"][0]["name"] == "timed"
+        assert report["invoke_time"] == self.component.timing.invoke_time
+
+    @pulumi.runtime.test
+    def test_report_is_written(self, tmp_path):
+        path = tmp_path / "{project}-{stack}.json"
+
+        def check_report(report_path):
+            with open(report_path) as report_file:
+                report = json.load(report_file)
+            names = [component["name"] for component in report["components"]]
+            assert "timed" in names
+
+        return export_component_report(str(path)).apply(check_report)
+
+
+def test_report_is_opt_in(monkeypatch):
+    monkeypatch.delenv("DT_COMPONENT_REPORT", raising=False)
+    assert export_component_report() is None
+
+
+def test_invokes_are_only_timed_for_a_report(monkeypatch, tmp_path):
+    invoke = pulumi.runtime.invoke
+    monkeypatch.delenv(REPORT_ENV, raising=False)
+    untimed = DTTimedBucket("untimed")
+    assert pulumi.runtime.invoke is invoke
+    assert untimed.timing.invokes == []
+
+    monkeypatch.setenv(REPORT_ENV, str(tmp_path / "report.json"))
+    reported = DTTimedBucket("reported")
+    assert pulumi.runtime.invoke is not invoke
+    assert len(reported.timing.invokes) == 1
+    export_component_report()
+    assert pulumi.runtime.invoke is invoke
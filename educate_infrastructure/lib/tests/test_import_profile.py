@@ -0,0 +1,37 @@
+import pytest
+
+from educate_infrastructure.lib.import_profile import (
+    build_profile,
+    entry_point_imports,
+    package_of,
+    parse_import_times,
+)
+from educate_infrastructure.lib.orchestrator import ROOT_DIR
+
+IMPORT_TIMES = """import time: self [us] | cumulative | imported package
+import time:      1200 |       1200 |     pulumi_aws._utilities
+import time:       300 |        300 |       pulumi_aws.ec2._inputs
+import time:       500 |        800 |     pulumi_aws.ec2
+import time:       100 |       2100 |   pulumi_aws
+"""
+
+
+def test_import_times_are_grouped_by_service():
+    timings = parse_import_times(IMPORT_TIMES)
+    profile = build_profile("networking", ["pulumi_aws"], timings, top=2)
+    assert package_of("pulumi_aws.ec2._inputs") == "pulumi_aws.ec2"
+    assert package_of("pulumi_aws._utilities") == "pulumi_aws"
+    assert profile.packages == pytest.approx(
+        {"pulumi_aws": 0.0013, "pulumi_aws.ec2": 0.0008}
+    )
+    assert [timing.module for timing in profile.slowest] == [
+        "pulumi_aws._utilities",
+        "pulumi_aws.ec2",
+    ]
+    assert profile.total == pytest.approx(0.0021)
+
+
+def test_entry_point_imports():
+    modules = entry_point_imports(ROOT_DIR / "infra" / "network" / "__main__.py")
+    assert "pulumi" in modules
+    assert "educate_infrastructure.infra.network.vpc" in modules
@@ -0,0 +1,96 @@
+from educate_infrastructure.lib.lookups import CacheMode, LookupCache
+
+
+class FakeFetch(object):
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_lookup_is_fetched_once(tmp_path):
+    cache = LookupCache(path=tmp_path / "lookups.json", ttl=60, mode=CacheMode.cached)
+    fetch = FakeFetch({"id": "ami-123"})
+
+    assert cache.get_or_fetch("ami", "eu-west-2", {"owners": ["1"]}, fetch) == {
+        "id": "ami-123"
+    }
+    cache.get_or_fetch("ami", "eu-west-2", {"owners": ["1"]}, fetch)
+
+    assert fetch.calls == 1
+
+
+def test_lookup_is_persisted_across_instances(tmp_path):
+    path = tmp_path / "lookups.json"
+    fetch = FakeFetch({"names": ["eu-west-2a"]})
+
+    LookupCache(path=path, ttl=60).get_or_fetch("zones", "eu-west-2", {}, fetch)
+    LookupCache(path=path, ttl=60).get_or_fetch("zones", "eu-west-2", {}, fetch)
+
+    assert fetch.calls == 1
+
+
+def test_concurrent_lookups_are_merged(tmp_path):
+    path = tmp_path / "lookups.json"
+    first = LookupCache(path=path, ttl=60)
+    second = LookupCache(path=path, ttl=60)
+    zones = FakeFetch({"names": ["eu-west-2a"]})
+    ami = FakeFetch({"id": "ami-123"})
+
+    first.get_or_fetch("zones", "eu-west-2", {}, zones)
+    second.get_or_fetch("zones", "eu-west-2", {}, zones)
+    second.get_or_fetch("ami", "eu-west-2", {}, ami)
+    # first loaded the file before second recorded the AMI
+    first.get_or_fetch("zones", "eu-west-1", {}, zones)
+    third = LookupCache(path=path, ttl=60)
+    third.get_or_fetch("ami", "eu-west-2", {}, ami)
+    third.get_or_fetch("zones", "eu-west-1", {}, zones)
+
+    assert zones.calls == 2
+    assert ami.calls == 1
+    assert sorted(path.parent.iterdir()) == [path, path.with_name("lookups.json.lock")]
+
+
+def test_lookup_key_includes_region(tmp_path):
+    cache = LookupCache(path=tmp_path / "lookups.json", ttl=60)
+    fetch = FakeFetch({"names": ["eu-west-2a"]})
+
+    cache.get_or_fetch("zones", "eu-west-2", {}, fetch)
+    cache.get_or_fetch("zones", "eu-west-1", {}, fetch)
+
+    assert fetch.calls == 2
+
+
+def test_expired_lookup_is_refetched(tmp_path):
+    cache = LookupCache(path=tmp_path / "lookups.json", ttl=0)
+    fetch = FakeFetch({"id": "ami-123"})
+
+    cache.get_or_fetch("ami", "eu-west-2", {}, fetch)
+    cache.get_or_fetch("ami", "eu-west-2", {}, fetch)
+
+    assert fetch.calls == 2
+
+
+def test_pinned_lookup_ignores_ttl(tmp_path):
+    path = tmp_path / "lookups.json"
+    LookupCache(path=path, ttl=0).get_or_fetch(
+        "ami", "eu-west-2", {}, FakeFetch({"id": "ami-old"})
+    )
+    fetch = FakeFetch({"id": "ami-new"})
+
+    pinned = LookupCache(path=path, ttl=0, mode=CacheMode.pinned)
+
+    assert pinned.get_or_fetch("ami", "eu-west-2", {}, fetch) == {"id": "ami-old"}
+    assert fetch.calls == 0
+
+
+def test_invalidate_by_kind(tmp_path):
+    cache = LookupCache(path=tmp_path / "lookups.json", ttl=60)
+    cache.get_or_fetch("ami", "eu-west-2", {}, FakeFetch({"id": "ami-123"}))
+    cache.get_or_fetch("zones", "eu-west-2", {}, FakeFetch({"names": []}))
+
+    assert cache.invalidate("ami") == 1
+    assert cache.invalidate() == 1
@@ -0,0 +1,120 @@
+import json
+
+import pulumi
+import pytest
+
+from educate_infrastructure.lib.monitoring import (
+    DTMetric,
+    DTMonitoring,
+    DTMonitoringConfig,
+)
+
+DIMENSIONS = {"DBClusterIdentifier": pulumi.Output.from_input("educate-sql-db-test")}
+
+
+def metrics():
+    return [
+        DTMetric(
+            key="cpu",
+            title="CPU utilization",
+            namespace="AWS/RDS",
+            metric_name="CPUUtilization",
+            dimensions=DIMENSIONS,
+            threshold=80,
+        ),
+        DTMetric(
+            key="connections",
+            title="Connections",
+            namespace="AWS/RDS",
+            metric_name="DatabaseConnections",
+            dimensions=DIMENSIONS,
+        ),
+        DTMetric(
+            key="latency",
+            title="Latency",
+            namespace="AWS/RDS",
+            metric_name="ReadLatency",
+            dimensions=DIMENSIONS,
+            statistic="p99",
+            threshold=0.05,
+        ),
+    ]
+
+
+class TestDTMonitoring(object):
+    @classmethod
+    def setup_class(cls):
+        cls.monitoring = DTMonitoring(
+            DTMonitoringConfig(
+                name="educate-monitoring-test",
+                thresholds={"connections": 60, "latency": None},
+                alarm_actions=["arn:aws:sns:eu-west-2:0:ops"],
+            ),
+            metrics(),
+        )
+
+    def test_configured_thresholds_select_alarms(self):
+        assert sorted(self.monitoring.alarms) == ["connections", "cpu"]
+
+    @pulumi.runtime.test
+    def test_alarm_uses_configured_threshold(self):
+        alarm = self.monitoring.alarms["connections"]
+
+        def check_alarm(args):
+            threshold, dimensions, actions = args
+            assert threshold == 60
+            assert dimensions == {"DBClusterIdentifier": "educate-sql-db-test"}
+            assert actions == ["arn:aws:sns:eu-west-2:0:ops"]
+
+        return pulumi.Output.all(
+            alarm.threshold, alarm.dimensions, alarm.alarm_actions
+        ).apply(check_alarm)
+
+    @pulumi.runtime.test
+    def test_dashboard_graphs_every_metric(self):
+        def check_body(body):
+            widgets = json.loads(body)["widgets"]
+            assert [widget["properties"]["title"] for widget in widgets] == [
+                "CPU utilization",
+                "Connections",
+                "Latency",
+            ]
+            assert widgets[0]["properties"]["metrics"] == [
+                [
+                    "AWS/RDS",
+                    "CPUUtilization",
+                    "DBClusterIdentifier",
+                    "educate-sql-db-test",
+                ]
+            ]
+            assert widgets[2]["properties"]["stat"] == "p99"
+            assert (widgets[1]["x"], widgets[2]["y"]) == (12, 6)
+
+        return self.monitoring.dashboard.dashboard_body.apply(check_body)
+
+
+@pulumi.runtime.test
+def test_percentile_alarm_uses_extended_statistic():
+    monitoring = DTMonitoring(
+        DTMonitoringConfig(name="educate-percentile-test", dashboard=False),
+        metrics(),
+    )
+    alarm = monitoring.alarms["latency"]
+
+    def check_statistic(args):
+        statistic, extended_statistic = args
+        assert statistic is None
+        assert extended_statistic == "p99"
+
+    assert monitoring.dashboard is None
+    return pulumi.Output.all(alarm.statistic, alarm.extended_statistic).apply(
+        check_statistic
+    )
+
+
+def test_unknown_threshold_is_rejected():
+    with pytest.raises(ValueError):
+        DTMonitoring(
+            DTMonitoringConfig(name="educate-typo-test", thresholds={"cpus": 70}),
+            metrics(),
+        )
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from educate_infrastructure.lib.orchestrator import (
+    EDUCATE_PROJECTS,
+    reverse_dependencies,
+    run_graph,
+)
+
+
+def test_dependents_wait_for_their_dependency():
+    order = []
+    lock = threading.Lock()
+
+    def run(name):
+        with lock:
+            order.append(name)
+
+    graph = {"networking": set(), "databases": {"networking"}, "educate": {"networking"}}
+    results = run_graph(graph, run, concurrency=2)
+
+    assert order[0] == "networking"
+    assert set(results) == {"networking", "databases", "educate"}
+    assert not any(results.values())
+
+
+def test_independent_projects_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    results = run_graph({"databases": set(), "educate": set()}, lambda _: barrier.wait())
+
+    assert results == {"databases": None, "educate": None}
+
+
+def test_failure_skips_dependents():
+    def run(name):
+        if name == "networking":
+            raise RuntimeError("boom")
+
+    graph = {"networking": set(), "databases": {"networking"}, "dns": {"databases"}}
+    results = run_graph(graph, run)
+
+    assert list(results) == ["networking"]
+    assert isinstance(results["networking"], RuntimeError)
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        run_graph({"a": {"b"}, "b": {"a"}}, lambda _: None)
+
+
+def test_destroy_removes_leaf_stacks_first():
+    assert reverse_dependencies(EDUCATE_PROJECTS) == {
+        "networking": {"databases", "educate"},
+        "databases": {"educate"},
+        "educate": set(),
+    }
@@ -0,0 +1,34 @@
+import pulumi
+import pytest
+
+from educate_infrastructure.lib.stack_references import (
+    get_stack_reference,
+    networking_outputs,
+)
+
+NETWORKING_STACK = "org/networking/test"
+
+
+class TestNetworkingOutputs(object):
+    @classmethod
+    def setup_class(cls):
+        cls.networking = networking_outputs(NETWORKING_STACK)
+
+    def test_stack_is_referenced_once(self):
+        assert networking_outputs(NETWORKING_STACK) is self.networking
+        assert get_stack_reference(NETWORKING_STACK) is self.networking.reference
+
+    def test_unknown_output_fails_immediately(self):
+        with pytest.raises(AttributeError):
+            self.networking.apps_vpc
+
+    @pulumi.runtime.test
+    def test_outputs_are_typed(self):
+        def check_outputs(args):
+            vpc_id, private_subnet_ids = args
+            assert vpc_id == "vpc-0d905953c8537847c"
+            assert private_subnet_ids == ["subnet-0a1b2c3d4e5f60718"]
+
+        return pulumi.Output.all(
+            self.networking.apps_vpc_id, self.networking.apps_private_subnet_ids
+        ).apply(check_outputs)
@@ -0,0 +1,61 @@
+import json
+
+import pulumi
+from pulumi_aws import ec2, lb, rds
+
+from educate_infrastructure.lib.testing import DTMockEngine, use_mock_engine
+
+
+def test_engine_is_shared():
+    assert use_mock_engine() is use_mock_engine()
+
+
+def test_unmatched_tokens_are_dumped(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw3")
+    engine = DTMockEngine()
+    engine.unmatched_invokes["aws:s3/getBucket:getBucket"] = {"bucket": "educate"}
+    engine.dump_unmatched(str(tmp_path))
+
+    with open(tmp_path / "unmatched-gw3.json") as unmatched_file:
+        unmatched = json.load(unmatched_file)
+    assert unmatched["invokes"] == {"aws:s3/getBucket:getBucket": {"bucket": "educate"}}
+
+
+class TestDTMockEngine(object):
+    @classmethod
+    def setup_class(cls):
+        cls.engine = use_mock_engine()
+        cls.alb = lb.LoadBalancer("educate-fixture-alb")
+        cls.db = rds.Instance(
+            "educate-fixture-db",
+            identifier="educate-fixture",
+            instance_class="db.t3.micro",
+        )
+        cls.untemplated = rds.Instance(
+            "educate-fixture-default", instance_class="db.t3.micro"
+        )
+
+    def test_resources_are_counted(self):
+        assert self.engine.resource_counts["aws:lb/loadBalancer:LoadBalancer"] >= 1
+
+    @pulumi.runtime.test
+    def test_outputs_are_rendered_from_inputs(self):
+        def check_outputs(args):
+            arn, arn_suffix, endpoint, default_endpoint = args
+            assert arn == "arn:aws:lb:eu-west-2:000000000000:educate-fixture-alb"
+            assert arn_suffix == "app/educate-fixture-alb/0123456789abcdef"
+            assert endpoint == "educate-fixture.eu-west-2.rds.amazonaws.com:3306"
+            # Missing inputs fall back to the resource name
+            assert default_endpoint.startswith("educate-fixture-default.")
+
+        return pulumi.Output.all(
+            self.alb.arn,
+            self.alb.arn_suffix,
+            self.db.endpoint,
+            self.untemplated.endpoint,
+        ).apply(check_outputs)
+
+    def test_invokes_come_from_fixtures(self):
+        ami = ec2.get_ami(owners=["679593333241"], most_recent=True)
+        assert ami.id == "ami-0eb1f3cdeeb8eed2a"
+        assert self.engine.invoke_counts["aws:ec2/getAmi:getAmi"] >= 1
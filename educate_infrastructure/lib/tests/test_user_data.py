@@ -0,0 +1,64 @@
+import gzip
+
+import pytest
+
+from educate_infrastructure.lib.user_data import (
+    MAX_USER_DATA_BYTES,
+    DTUserDataPart,
+    DTUserDataPartType,
+    build_user_data,
+)
+
+BOOT_SCRIPT = DTUserDataPart(
+    filename="boot.sh",
+    template="#!/bin/bash\necho {{ greeting }} $HOME\nENABLED={{ enabled }}\n",
+    variables={"greeting": "hello", "enabled": True},
+)
+CLOUD_CONFIG = DTUserDataPart(
+    filename="cloud.cfg",
+    template="#cloud-config\npackage_upgrade: {{ upgrade }}\n",
+    variables={"upgrade": False},
+    content_type=DTUserDataPartType.cloud_config,
+)
+
+
+def test_parts_are_rendered():
+    assert BOOT_SCRIPT.render() == "#!/bin/bash\necho hello $HOME\nENABLED=true\n"
+
+
+def test_missing_variable_fails():
+    part = DTUserDataPart(filename="boot.sh", template="echo {{ greeting }}")
+    with pytest.raises(ValueError, match="greeting"):
+        part.render()
+
+
+def test_document_is_a_compressed_multipart():
+    document = gzip.decompress(build_user_data([BOOT_SCRIPT, CLOUD_CONFIG]).payload)
+    assert document.startswith(b"Content-Type: multipart/mixed")
+    assert b"Content-Type: text/x-shellscript" in document
+    assert b"Content-Type: text/cloud-config" in document
+    assert document.index(b"echo hello") < document.index(b"package_upgrade: false")
+
+
+def test_document_is_reproducible():
+    user_data = build_user_data([BOOT_SCRIPT, CLOUD_CONFIG])
+    rebuilt = build_user_data(
+        [BOOT_SCRIPT.copy(deep=True), CLOUD_CONFIG.copy(deep=True)]
+    )
+    assert rebuilt is user_data
+    uncached = build_user_data([BOOT_SCRIPT, CLOUD_CONFIG], compress=False)
+    assert gzip.decompress(user_data.payload) == uncached.payload
+
+
+def test_document_changes_with_its_parts():
+    changed = BOOT_SCRIPT.copy(
+        update={"variables": {"greeting": "hi", "enabled": True}}
+    )
+    assert build_user_data([changed]).digest != build_user_data([BOOT_SCRIPT]).digest
+
+
+def test_oversized_document_fails():
+    noise = "".join(f"{index:x}\n" for index in range(MAX_USER_DATA_BYTES))
+    part = DTUserDataPart(filename="noise.sh", template=noise)
+    with pytest.raises(ValueError, match="bytes"):
+        build_user_data([part], compress=False)
@@ -0,0 +1,126 @@
+"""Build the cloud-init user data of our instances from templated parts.
+
+Each component describes its boot configuration as parts: a template file or string with
+`{{ name }}` placeholders (shell variables are left alone), the typed variables it is
+rendered with and its cloud-init content type (shell script,
+cloud-config...). The parts are merged into a single multi-part MIME document, gzip
+compressed, which cloud-init unpacks at boot.
+
+The document only depends on the rendered parts: the MIME boundary is derived from their
+hash and the gzip header carries no timestamp, so the same parts always produce the same
+bytes and a preview never reports a spurious user data change. Documents are cached by
+that hash, so components rendering the same parts share the work. Templates are looked up
+relative to the module declaring them, never to the working directory.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import re
+from email.charset import Charset
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Text, Union
+
+from pydantic import BaseModel, StrictBool, StrictInt
+
+# EC2 rejects user data larger than 16KB, before base64 encoding
+MAX_USER_DATA_BYTES = 16 * 1024
+
+PLACEHOLDER = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+class DTUserDataPartType(str, Enum):
+    shell_script = "x-shellscript"
+    cloud_config = "cloud-config"
+    boothook = "cloud-boothook"
+
+
+class DTUserDataPart(BaseModel):
+    """A part of the user data, its template rendered with the variables."""
+
+    filename: Text
+    template: Text
+    variables: Dict[Text, Union[StrictBool, StrictInt, Text]] = {}
+    content_type: DTUserDataPartType = DTUserDataPartType.shell_script
+
+    def render(self) -> Text:
+        def substitute(match) -> Text:
+            name = match.group(1)
+            if name not in self.variables:
+                raise ValueError(f"{self.filename} needs a value for {name}")
+            value = self.variables[name]
+            return str(value).lower() if isinstance(value, bool) else str(value)
+
+        return PLACEHOLDER.sub(substitute, self.template)
+
+
+class DTUserData(BaseModel):
+    """A rendered user data document."""
+
+    payload: bytes
+    digest: Text  # sha256 of the rendered parts
+
+    def base64(self) -> Text:
+        return base64.b64encode(self.payload).decode()
+
+
+def load_template(path: Path) -> Text:
+    """Read a template, e.g. `load_template(Path(__file__).parent / "boot.sh")`."""
+    return path.read_text()
+
+
+_rendered: Dict[Text, DTUserData] = {}
+
+# Plain 8bit bodies, base64 encoding them would defeat the compression
+_UTF8 = Charset("utf-8")
+_UTF8.body_encoding = None
+
+
+def build_user_data(parts: List[DTUserDataPart], compress: bool = True) -> DTUserData:
+    """Render the parts into a multi-part cloud-init document.
+
+    :param parts: The parts, run by cloud-init in this order.
+    :type parts: List[DTUserDataPart]
+
+    :param compress: Whether to gzip the document.
+    :type compress: bool
+
+    :raises ValueError: When a template variable is missing or the document is larger
+        than EC2 accepts.
+
+    :rtype: DTUserData
+    """
+    rendered = [(part, part.render()) for part in parts]
+    digest = hashlib.sha256(
+        json.dumps(
+            [
+                [part.filename, part.content_type.value, content]
+                for part, content in rendered
+            ]
+        ).encode()
+    ).hexdigest()
+    key = f"{digest}-{compress}"
+    if key in _rendered:
+        return _rendered[key]
+
+    document = MIMEMultipart(boundary=f"==DT-{digest[:32]}==")
+    for part, content in rendered:
+        mime_part = MIMEText(content, part.content_type.value, _UTF8)
+        mime_part.add_header(
+            "Content-Disposition", "attachment", filename=part.filename
+        )
+        document.attach(mime_part)
+
+    payload = document.as_bytes()
+    if compress:
+        payload = gzip.compress(payload, mtime=0)
+    if len(payload) > MAX_USER_DATA_BYTES:
+        raise ValueError(
+            f"User data is {len(payload)} bytes, EC2 accepts {MAX_USER_DATA_BYTES}"
+        )
+
+    _rendered[key] = DTUserData(payload=payload, digest=digest)
+    return _rendered[key]